@@ -1,16 +1,92 @@
 import openai
+import httpx
+import asyncio
 import os
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncIterator, Awaitable, Callable, Tuple, Union
 from datetime import datetime
 from models import ChatMessage, TutorResponse
+from response_cache import ResponseCache, make_cache_key
+from semantic_cache import SemanticCache
+from context_builder import ContextBuilder, ContextStats
+from prompt_compiler import PromptCompiler
+from subject_detector import SubjectDetector, load_subject_keywords, merge_subject_keywords
+from catalog import Catalog
+from knowledge_base import KnowledgeBase
+from content_filter import ContentFilter
+from suggestion_engine import SuggestionEngine
+from model_router import ModelRouter, Route
+from circuit_breaker import CircuitBreaker, backoff_delay
+from rate_limiter import RateLimited
+from single_flight import SingleFlight, StreamFanout
+from metrics import (stage, record_stage, FALLBACKS_TOTAL, UPSTREAM_TOKENS, UPSTREAM_IN_FLIGHT,
+                     UPSTREAM_RETRIES, CIRCUIT_REJECTIONS, LOCAL_ANSWERS, CONTENT_FILTER_DECISIONS,
+                     MODEL_ROUTES)
 import json
 import re
+import time
+
+# Prefix of every fallback answer, so callers can tell them apart from real ones
+OFFLINE_NOTICE = "⚠️ Currently running in offline mode - my advanced AI features will return when connectivity is restored.\n\n"
+
+# Upstream failures worth retrying and counting against the circuit breaker;
+# anything else (bad key, bad request) is our fault, not the upstream's
+TRANSIENT_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError,
+                    asyncio.TimeoutError)
+
+
+# Admission to the upstream quota for a call's estimated tokens; raises RateLimited when refused
+UpstreamGate = Callable[[int], Awaitable[None]]
+
+
+class StreamInterrupted(Exception):
+    """The upstream stream failed after the first token: what was sent is not a whole answer"""
+
+
+def _usage_field(usage, name: str):
+    """Read a usage field whether the SDK parsed it or kept it as a plain dict (fields newer than the SDK)"""
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get(name)
+    return getattr(usage, name, None)
 
 
 class AITutorService:
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None, catalog: Optional[Catalog] = None):
+        # One pooled async HTTP client shared by every upstream call, so the
+        # event loop is never blocked and connections are reused across chats
+        self.http_client = http_client or self._build_http_client()
+        self.client = openai.AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            timeout=self.http_client.timeout,
+            # Retries are ours: jittered, bounded by the request deadline and the breaker
+            max_retries=0,
+            http_client=self.http_client
+        )
+        self.max_retries = int(os.getenv("OPENAI_MAX_RETRIES", 2))
+        # Ask for token usage at the end of streams too (stream_options); off for upstreams that reject it
+        self.stream_usage = os.getenv("OPENAI_STREAM_USAGE", "true").lower() in ("1", "true", "yes")
+        # Prompt tokens the upstream reported, and how many of them it served from its prefix cache
+        self.prompt_tokens_total = 0
+        self.cached_prompt_tokens_total = 0
+        self.request_deadline = float(os.getenv("OPENAI_REQUEST_DEADLINE", 20))
+        self.breaker = CircuitBreaker.from_env()
+        # Identical prompts asked at the same time share one upstream call
+        self.inflight = SingleFlight()
+        self.inflight_streams = StreamFanout()
         self.model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+        self.context_builder = ContextBuilder.from_env(self.model)
+        # Model tier and completion budget per request, from MODEL_ROUTES_PATH rules
+        self.router = ModelRouter.from_env(self.model)
+        self.response_cache = ResponseCache.from_env()
+        self.semantic_cache = SemanticCache.from_env()
+        # FAQ and glossary answers for definitional questions, online and offline
+        self.knowledge_base = KnowledgeBase.from_env()
+        # Follow-ups from the concepts an answer covers, without another model call
+        self.suggestion_engine = SuggestionEngine.from_env()
+        # Off-topic messages are turned away before they cost an upstream call
+        self.content_filter = ContentFilter.from_env()
         self.system_prompt = """You are an intelligent and friendly educational assistant called LearnMate AI Tutor. You help students with their questions about courses, topics, and general academic queries. 
 
 Your key characteristics:
@@ -34,148 +110,429 @@ If asked about non-educational topics, respond like: "I'm here to help with your
 
 Always end your responses with encouraging words and offer to help with related questions."""
 
-        # Subject detection keywords
-        self.subject_keywords = {
-            "mathematics": ["math", "algebra", "calculus", "geometry", "trigonometry", "statistics", "equation", "formula", "solve", "calculate"],
-            "physics": ["physics", "force", "energy", "motion", "gravity", "electricity", "magnetism", "wave", "quantum"],
-            "chemistry": ["chemistry", "atom", "molecule", "reaction", "element", "compound", "bond", "acid", "base"],
-            "biology": ["biology", "cell", "dna", "gene", "evolution", "organism", "ecosystem", "photosynthesis"],
-            "computer_science": ["programming", "algorithm", "code", "software", "python", "javascript", "database", "computer"],
-            "english": ["grammar", "writing", "literature", "essay", "poem", "novel", "author", "reading"],
-            "history": ["history", "war", "ancient", "medieval", "revolution", "empire", "civilization", "historical"],
-            "geography": ["geography", "continent", "country", "climate", "map", "ocean", "mountain", "river"]
+        # Subject detection keywords come from the same catalog the UI lists,
+        # and follow it when the catalog file is reloaded
+        self.catalog = catalog or Catalog.from_env()
+        self._apply_catalog(self.catalog)
+        self.catalog.add_listener(self._apply_catalog)
+
+    def _apply_catalog(self, catalog: Catalog):
+        subject_keywords = catalog.subject_keywords
+        keywords_path = os.getenv("SUBJECT_KEYWORDS_PATH")
+        if keywords_path:
+            subject_keywords = merge_subject_keywords(subject_keywords, load_subject_keywords(keywords_path))
+        self.subject_keywords = subject_keywords
+        self.subject_detector = SubjectDetector(subject_keywords)
+        self.prompt_compiler = PromptCompiler(self.system_prompt, self.context_builder.counter, subject_keywords)
+
+    @staticmethod
+    def _build_http_client() -> httpx.AsyncClient:
+        """Build the shared connection pool from environment settings"""
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("OPENAI_MAX_CONNECTIONS", 200)),
+            max_keepalive_connections=int(os.getenv("OPENAI_MAX_KEEPALIVE", 50)),
+            keepalive_expiry=float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", 30))
+        )
+        timeout = httpx.Timeout(
+            float(os.getenv("OPENAI_TIMEOUT", 60)),
+            connect=float(os.getenv("OPENAI_CONNECT_TIMEOUT", 5))
+        )
+        return httpx.AsyncClient(limits=limits, timeout=timeout)
+
+    async def warmup(self, connections: int = 4, timeout: float = 5.0) -> Dict[str, int]:
+        """Build lazily created state and open pooled upstream connections before taking traffic"""
+        self.context_builder.counter.count(self.system_prompt)
+        self.subject_detector.scores("warm up the subject detector")
+        cached = self.response_cache.warm() if self.response_cache is not None else 0
+
+        # Concurrent requests each open (and leave in the pool) their own keep-alive connection;
+        # any answer, even an error status, means the connection is up
+        url = str(self.client.base_url).rstrip("/") + "/models"
+        headers = {"Authorization": f"Bearer {self.client.api_key}"}
+        results = await asyncio.gather(*(
+            self.http_client.get(url, headers=headers, timeout=timeout) for _ in range(connections)
+        ), return_exceptions=True)
+        opened = sum(1 for result in results if not isinstance(result, Exception))
+        return {"cached_answers": cached, "upstream_connections": opened}
+
+    async def drain(self, timeout: float) -> int:
+        """Wait for in-flight upstream calls to finish; returns how many were still running"""
+        deadline = time.monotonic() + timeout
+        while UPSTREAM_IN_FLIGHT.value() > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        return int(UPSTREAM_IN_FLIGHT.value())
+
+    async def aclose(self):
+        """Release pooled upstream connections"""
+        await self.http_client.aclose()
+        if self.response_cache is not None:
+            self.response_cache.close()
+
+    def _cache_lookup(self, message: str, conversation_history: List[ChatMessage],
+                      subject: Optional[str], user_level: str):
+        """Return (cache_key, cached TutorResponse or None) from the exact, then the semantic cache"""
+        # Key on the same trimmed history the model would see
+        limit = self.context_builder.max_history_messages
+        history = conversation_history[-limit:] if limit else []
+        cache_key = make_cache_key(message, user_level, subject, history)
+        cached = None
+        if self.response_cache is not None:
+            cached = self.response_cache.get(cache_key)
+
+        # Paraphrase matching is only safe when no earlier turns shape the answer
+        if cached is None and self.semantic_cache is not None and not conversation_history:
+            cached = self.semantic_cache.lookup(message, user_level, subject)
+            if cached is not None and self.response_cache is not None:
+                self.response_cache.set(cache_key, cached)
+
+        if cached is None:
+            return cache_key, None
+        # Cached values came from validated responses, so skip validating them again
+        return cache_key, TutorResponse.model_construct(timestamp=datetime.now(), **cached)
+
+    def _cache_store(self, cache_key: str, response: TutorResponse, message: str,
+                     conversation_history: List[ChatMessage], subject: Optional[str], user_level: str):
+        """Remember a real answer; offline fallbacks are never cached"""
+        if response.response.startswith(OFFLINE_NOTICE):
+            return
+        value = {
+            "response": response.response,
+            "suggestions": response.suggestions,
+            "subject_detected": response.subject_detected,
+            "confidence": response.confidence
         }
+        if self.response_cache is not None:
+            self.response_cache.set(cache_key, value)
+        if self.semantic_cache is not None and not conversation_history:
+            self.semantic_cache.add(message, user_level, subject, value)
 
     async def generate_response(self, message: str, conversation_history: List[ChatMessage], 
-                              subject: Optional[str] = None, user_level: str = "beginner") -> TutorResponse:
+                              subject: Optional[str] = None, user_level: str = "beginner",
+                              coalesce: bool = True, admit: Optional[UpstreamGate] = None) -> TutorResponse:
         try:
-            # Detect subject if not provided
-            detected_subject = subject or self._detect_subject(message)
-            
-            # Build conversation context
-            messages = self._build_conversation_context(message, conversation_history, user_level, detected_subject)
-            
-            # Generate response using OpenAI
-            response = await self._call_openai(messages)
-            
-            # Extract suggestions from the response
-            suggestions = self._extract_suggestions(response, detected_subject)
-            
-            return TutorResponse(
-                response=response,
-                suggestions=suggestions,
-                subject_detected=detected_subject,
-                confidence=0.9,  # You could implement confidence scoring
-                timestamp=datetime.now()
-            )
+            # Serve repeated questions straight from the cache
+            with stage("cache_lookup"):
+                cache_key, cached = self._cache_lookup(message, conversation_history, subject, user_level)
+            if cached is not None:
+                return cached
+
+            # Definitional questions the knowledge base covers never reach the model
+            local = self._local_answer(message, conversation_history, subject)
+            if local is not None:
+                return local
+
+            # Uncoalesced, the call runs in the caller's task, so cancelling the caller stops it
+            if not coalesce:
+                return await self._generate_uncached(cache_key, message, conversation_history, subject, user_level,
+                                                     admit)
+
+            # Concurrent identical prompts wait on the first one's answer
+            started = time.perf_counter()
+            tutor_response, shared = await self.inflight.do(cache_key, lambda: self._generate_uncached(
+                cache_key, message, conversation_history, subject, user_level, admit))
+            if shared:
+                record_stage("coalesced_wait", time.perf_counter() - started)
+            # Every caller, the leader too, gets its own copy: the result object is shared by all of them
+            return tutor_response.model_copy(deep=True, update={"timestamp": datetime.now()})
             
+        except RateLimited:
+            raise
         except Exception as e:
             raise Exception(f"Error generating response: {str(e)}")
 
-    def _detect_subject(self, message: str) -> Optional[str]:
-        """Detect the subject based on keywords in the message"""
-        message_lower = message.lower()
-        
-        subject_scores = {}
-        for subject, keywords in self.subject_keywords.items():
-            score = sum(1 for keyword in keywords if keyword in message_lower)
-            if score > 0:
-                subject_scores[subject] = score
+    async def _generate_uncached(self, cache_key: str, message: str, conversation_history: List[ChatMessage],
+                                 subject: Optional[str], user_level: str,
+                                 admit: Optional[UpstreamGate] = None) -> TutorResponse:
+        # Detect subject if not provided
+        with stage("subject_detection"):
+            detected_subject = subject or self._detect_subject(message)
         
-        if subject_scores:
-            return max(subject_scores, key=subject_scores.get)
-        return None
+        # Build conversation context
+        with stage("context_build"):
+            messages, context_stats = self._build_conversation_context(message, conversation_history, user_level, detected_subject)
+        route = self._route(message, detected_subject, user_level, conversation_history)
 
-    def _build_conversation_context(self, current_message: str, history: List[ChatMessage], 
-                                  user_level: str, subject: Optional[str]) -> List[Dict[str, str]]:
-        """Build the conversation context for OpenAI API"""
-        messages = [{"role": "system", "content": self.system_prompt}]
+        # Only now is the upstream quota spent: cached, local and coalesced answers never pay for it
+        if admit is not None:
+            await admit(context_stats.prompt_tokens + route.max_tokens)
         
-        # Add level-specific context
-        level_context = f"\nThe student is at {user_level} level."
-        if subject:
-            level_context += f" They are asking about {subject}."
-        level_context += " Please adjust your explanation accordingly.\n"
+        # Generate response using OpenAI
+        with stage("upstream"):
+            response = await self._call_openai(messages, route)
         
-        messages[0]["content"] += level_context
-        
-        # Add conversation history (limit to last 10 messages to stay within token limits)
-        for msg in history[-10:]:
-            messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-        
-        # Add current message
-        messages.append({
-            "role": "user",
-            "content": current_message
-        })
+        # Extract suggestions from the response
+        with stage("suggestions"):
+            suggestions = self._extract_suggestions(response, detected_subject)
         
-        return messages
+        tutor_response = TutorResponse(
+            response=response,
+            suggestions=suggestions,
+            subject_detected=detected_subject,
+            confidence=0.9,  # You could implement confidence scoring
+            context_tokens=context_stats.prompt_tokens,
+            route=route.name,
+            timestamp=datetime.now()
+        )
+        self._cache_store(cache_key, tutor_response, message, conversation_history, subject, user_level)
+        return tutor_response
+
+    async def stream_response(self, message: str, conversation_history: List[ChatMessage],
+                              subject: Optional[str] = None, user_level: str = "beginner",
+                              admit: Optional[UpstreamGate] = None
+                              ) -> AsyncIterator[Tuple[str, Union[str, TutorResponse]]]:
+        """Yield ("token", text) chunks as they arrive, then ("done", TutorResponse)"""
+        with stage("cache_lookup"):
+            cache_key, cached = self._cache_lookup(message, conversation_history, subject, user_level)
+        if cached is not None:
+            yield "token", cached.response
+            yield "done", cached
+            return
 
-    async def _call_openai(self, messages: List[Dict[str, str]]) -> str:
-        """Make API call to OpenAI with fallback"""
+        local = self._local_answer(message, conversation_history, subject)
+        if local is not None:
+            yield "token", local.response
+            yield "done", local
+            return
+
+        # Concurrent identical prompts subscribe to one upstream stream
+        async for kind, value in self.inflight_streams.subscribe(cache_key, lambda: self._stream_uncached(
+                cache_key, message, conversation_history, subject, user_level, admit)):
+            if kind == "done":
+                value = value.model_copy(deep=True, update={"timestamp": datetime.now()})
+            yield kind, value
+
+    async def _stream_uncached(self, cache_key: str, message: str, conversation_history: List[ChatMessage],
+                               subject: Optional[str], user_level: str, admit: Optional[UpstreamGate] = None
+                               ) -> AsyncIterator[Tuple[str, Union[str, TutorResponse]]]:
+        with stage("subject_detection"):
+            detected_subject = subject or self._detect_subject(message)
+        with stage("context_build"):
+            messages, context_stats = self._build_conversation_context(message, conversation_history, user_level, detected_subject)
+        route = self._route(message, detected_subject, user_level, conversation_history)
+        if admit is not None:
+            await admit(context_stats.prompt_tokens + route.max_tokens)
+
+        parts = []
+        usage: Dict[str, int] = {}
+        # Concepts are picked out as tokens arrive, so only the last few words are left at the end
+        extractor = self.suggestion_engine.extractor(detected_subject)
+        started = time.perf_counter()
+        async for token in self._stream_openai(messages, route, usage):
+            if not parts:
+                record_stage("upstream_first_token", time.perf_counter() - started)
+            parts.append(token)
+            extractor.feed(token)
+            yield "token", token
+        record_stage("upstream", time.perf_counter() - started)
+
+        response = "".join(parts).strip()
+        with stage("suggestions"):
+            suggestions = extractor.suggestions()
+        if not usage:
+            # The upstream did not report usage: count our own estimate
+            UPSTREAM_TOKENS.inc(context_stats.prompt_tokens, kind="prompt")
+            UPSTREAM_TOKENS.inc(self.context_builder.counter.count(response), kind="completion")
+        tutor_response = TutorResponse(
+            response=response,
+            suggestions=suggestions,
+            subject_detected=detected_subject,
+            confidence=0.9,
+            context_tokens=context_stats.prompt_tokens,
+            route=route.name,
+            timestamp=datetime.now()
+        )
+        self._cache_store(cache_key, tutor_response, message, conversation_history, subject, user_level)
+        yield "done", tutor_response
+
+    def _local_answer(self, message: str, conversation_history: List[ChatMessage],
+                      subject: Optional[str]) -> Optional[TutorResponse]:
+        """Answer from the knowledge base when it matches the question with high confidence"""
+        # Entries answer a question on its own: mid-conversation, "what is a variable?" may mean algebra
+        if conversation_history:
+            return None
+        with stage("local_answer"):
+            match = self.knowledge_base.answer(message, subject)
+        if match is None:
+            return None
+        LOCAL_ANSWERS.inc(path="direct")
+        return TutorResponse(
+            response=match.answer,
+            suggestions=self._extract_suggestions(match.answer, match.subject),
+            subject_detected=match.subject,
+            confidence=round(match.confidence, 2),
+            context_tokens=0,
+            timestamp=datetime.now()
+        )
+
+    def _route(self, message: str, subject: Optional[str], user_level: str,
+               history: List[ChatMessage]) -> Route:
+        with stage("routing"):
+            route = self.router.route(message, subject, user_level, len(history))
+        MODEL_ROUTES.inc(route=route.name, model=route.model)
+        return route
+
+    def completion_budget(self, message: str, subject: Optional[str], user_level: str, history_depth: int) -> int:
+        """max_tokens the request would be routed with, for admission control"""
+        return self.router.route(message, subject or self._detect_subject(message), user_level, history_depth).max_tokens
+
+    def _detect_subject(self, message: str) -> Optional[str]:
+        """Detect the subject based on keywords in the message"""
+        return self.subject_detector.detect(message)
+
+    def _build_conversation_context(self, current_message: str, history: List[ChatMessage], 
+                                  user_level: str, subject: Optional[str]) -> Tuple[List[Dict[str, str]], ContextStats]:
+        """Build the conversation context for OpenAI API within the token budget"""
+        # Shared system prompt first, the level and subject note after the history
+        prompt = self.prompt_compiler.prompt(user_level, subject)
+        # Newest history first until the budget is used; older turns are summarized
+        return self.context_builder.build(prompt, history, current_message)
+
+    def _completion_args(self, messages: List[Dict[str, str]], route: Route) -> Dict:
+        return dict(
+            model=route.model,
+            messages=messages,
+            max_tokens=route.max_tokens,
+            temperature=0.7,
+            presence_penalty=0.1,
+            frequency_penalty=0.1
+        )
+
+    async def _call_openai(self, messages: List[Dict[str, str]], route: Optional[Route] = None) -> str:
+        """Make API call to OpenAI with retries within the request deadline, failing fast while the breaker is open"""
+        route = route or self.router.default
+        deadline = time.monotonic() + self.request_deadline
+        attempt = 0
+        while True:
+            permit = self.breaker.acquire()
+            if permit is None:
+                CIRCUIT_REJECTIONS.inc()
+                return self._generate_fallback_response(messages)
+
+            started = time.monotonic()
+            UPSTREAM_IN_FLIGHT.inc()
+            try:
+                response = await asyncio.wait_for(
+                    self.client.chat.completions.create(**self._completion_args(messages, route)),
+                    timeout=max(0.0, deadline - started)
+                )
+            except asyncio.CancelledError:
+                # The caller went away: release the permit without judging upstream health
+                self.breaker.record(permit, None, time.monotonic() - started)
+                raise
+            except Exception as e:
+                transient = isinstance(e, TRANSIENT_ERRORS)
+                self.breaker.record(permit, False if transient else None, time.monotonic() - started)
+                delay = backoff_delay(attempt)
+                if not transient or attempt >= self.max_retries or time.monotonic() + delay >= deadline:
+                    print(f"⚠️ OpenAI API unavailable: {e!r}")
+                    # Return fallback response
+                    return self._generate_fallback_response(messages)
+                attempt += 1
+                UPSTREAM_RETRIES.inc()
+                await asyncio.sleep(delay)
+                continue
+            finally:
+                UPSTREAM_IN_FLIGHT.dec()
+
+            self.breaker.record(permit, True, time.monotonic() - started)
+            if response.usage is not None:
+                self._record_usage(response.usage)
+            return response.choices[0].message.content.strip()
+
+    def _record_usage(self, usage) -> Dict[str, int]:
+        """Count the token usage the upstream reported, including prompt tokens served from its prefix cache"""
+        prompt_tokens = _usage_field(usage, "prompt_tokens") or 0
+        completion_tokens = _usage_field(usage, "completion_tokens") or 0
+        cached_tokens = _usage_field(_usage_field(usage, "prompt_tokens_details"), "cached_tokens") or 0
+        UPSTREAM_TOKENS.inc(prompt_tokens, kind="prompt")
+        UPSTREAM_TOKENS.inc(completion_tokens, kind="completion")
+        UPSTREAM_TOKENS.inc(cached_tokens, kind="cached_prompt")
+        self.prompt_tokens_total += prompt_tokens
+        self.cached_prompt_tokens_total += cached_tokens
+        return {"prompt": prompt_tokens, "completion": completion_tokens, "cached_prompt": cached_tokens}
+
+    def prompt_cache_stats(self) -> Dict[str, Union[int, float]]:
+        """Share of reported prompt tokens the upstream served from its prefix cache"""
+        prompt_tokens, cached_tokens = self.prompt_tokens_total, self.cached_prompt_tokens_total
+        return {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "hit_rate": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0
+        }
+
+    async def _stream_openai(self, messages: List[Dict[str, str]], route: Optional[Route] = None,
+                             usage: Optional[Dict[str, int]] = None) -> AsyncIterator[str]:
+        """
+        Stream completion tokens from OpenAI, falling back if the call fails up front or the breaker is open.
+
+        A failure after the first token raises StreamInterrupted: the answer is incomplete and must not be kept.
+        Token usage reported at the end of the stream is recorded and copied into `usage` when given.
+        """
+        route = route or self.router.default
+        permit = self.breaker.acquire()
+        if permit is None:
+            CIRCUIT_REJECTIONS.inc()
+            yield self._generate_fallback_response(messages)
+            return
+
+        started, recorded = False, False
+        begun = time.monotonic()
+        UPSTREAM_IN_FLIGHT.inc()
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=500,
-                temperature=0.7,
-                presence_penalty=0.1,
-                frequency_penalty=0.1
+            # The deadline covers reaching the first token; a live stream may run longer
+            extra = {"extra_body": {"stream_options": {"include_usage": True}}} if self.stream_usage else {}
+            stream = await asyncio.wait_for(
+                self.client.chat.completions.create(**self._completion_args(messages, route), stream=True, **extra),
+                timeout=self.request_deadline
             )
-            
-            return response.choices[0].message.content.strip()
-            
+            async for chunk in stream:
+                # With include_usage the last chunk has no choices, only the usage of the whole call
+                reported = getattr(chunk, "usage", None)
+                if reported:
+                    recorded_usage = self._record_usage(reported)
+                    if usage is not None:
+                        usage.update(recorded_usage)
+                if not chunk.choices:
+                    continue
+                token = chunk.choices[0].delta.content
+                if token:
+                    if not started:
+                        started, recorded = True, True
+                        self.breaker.record(permit, True, time.monotonic() - begun)
+                    yield token
+
         except Exception as e:
-            print(f"⚠️ OpenAI API unavailable: {e}")
-            # Return fallback response
-            return self._generate_fallback_response(messages)
+            print(f"⚠️ OpenAI stream unavailable: {e!r}")
+            # Tokens already sent cannot be retracted, so only fall back before the first one
+            if started:
+                raise StreamInterrupted(f"The answer was cut off: {e!r}") from e
+            transient = isinstance(e, TRANSIENT_ERRORS)
+            recorded = True
+            self.breaker.record(permit, False if transient else None, time.monotonic() - begun)
+            yield self._generate_fallback_response(messages)
+        finally:
+            if not recorded:
+                # Empty stream or client gone before the first token: just release the permit
+                self.breaker.record(permit, None, time.monotonic() - begun)
+            UPSTREAM_IN_FLIGHT.dec()
 
     def _extract_suggestions(self, response: str, subject: Optional[str]) -> List[str]:
-        """Extract follow-up suggestions based on the response and subject"""
-        suggestions = []
-        
-        # Generic educational suggestions
-        generic_suggestions = [
-            "Would you like me to explain this concept differently?",
-            "Do you have any follow-up questions?",
-            "Would you like to see a practice problem?",
-            "Should we explore related topics?"
-        ]
-        
-        # Subject-specific suggestions
-        subject_suggestions = {
-            "mathematics": [
-                "Would you like to see step-by-step solving examples?",
-                "Should we practice with similar problems?",
-                "Would you like to learn about related mathematical concepts?"
-            ],
-            "science": [
-                "Would you like to see real-world applications?",
-                "Should we explore the underlying principles?",
-                "Would you like to learn about related scientific phenomena?"
-            ],
-            "computer_science": [
-                "Would you like to see code examples?",
-                "Should we walk through the algorithm step by step?",
-                "Would you like to learn about related programming concepts?"
-            ]
-        }
-        
-        # Add 2 relevant suggestions
-        if subject and subject in subject_suggestions:
-            suggestions.extend(subject_suggestions[subject][:2])
-        else:
-            suggestions.extend(generic_suggestions[:2])
-        
-        return suggestions
-    
+        """Follow-up suggestions built from the concepts the response covers"""
+        return self.suggestion_engine.suggest(response, subject)
+
     def _generate_fallback_response(self, messages: List[Dict[str, str]]) -> str:
         """Generate a fallback response when OpenAI is unavailable"""
+        FALLBACKS_TOTAL.inc()
+        
         # Get the user's last message
         user_message = messages[-1]["content"] if messages else "Hello"
+
+        # A close enough knowledge base entry beats generic study advice
+        match = self.knowledge_base.answer(user_message, threshold=self.knowledge_base.fallback_threshold)
+        if match is not None:
+            LOCAL_ANSWERS.inc(path="fallback")
+            return (OFFLINE_NOTICE + match.answer +
+                    "\n\nI can go into more depth once my advanced AI features are back - feel free to ask a follow-up question!")
         
         # Detect subject from the message
         detected_subject = self._detect_subject(user_message)
@@ -206,16 +563,11 @@ Always end your responses with encouraging words and offer to help with related
             response = "📚 I'm here to help with your learning! While my advanced AI features are temporarily unavailable due to connectivity issues, I can still provide educational guidance and study tips. Please let me know what subject you're working on, and I'll do my best to help guide your learning process!"
         
         # Add offline notice
-        offline_notice = "⚠️ Currently running in offline mode - my advanced AI features will return when connectivity is restored.\n\n"
-        
-        return offline_notice + response
+        return OFFLINE_NOTICE + response
 
     def validate_educational_content(self, message: str) -> bool:
         """Validate if the message is educational in nature"""
-        non_educational_keywords = [
-            "weather", "sports", "entertainment", "gossip", "personal problems",
-            "relationship", "dating", "politics", "religion", "gambling"
-        ]
-        
-        message_lower = message.lower()
-        return not any(keyword in message_lower for keyword in non_educational_keywords)
+        with stage("content_filter"):
+            allowed = self.content_filter.is_educational(message)
+        CONTENT_FILTER_DECISIONS.inc(result="allowed" if allowed else "rejected")
+        return allowed
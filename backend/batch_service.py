@@ -0,0 +1,123 @@
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from models import (BatchItemResult, BatchJobStatus, BatchTutorResponse,
+                    TutorRequest, TutorResponse)
+from response_cache import make_cache_key
+
+
+class BatchProcessor:
+    """Runs lists of tutor requests concurrently, deduplicated, with optional background jobs"""
+
+    def __init__(self, handler: Callable[[TutorRequest], Awaitable[TutorResponse]],
+                 concurrency: int = 8, max_concurrency: int = 64, max_items: int = 500,
+                 job_ttl: float = 3600):
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_concurrency = max_concurrency
+        self.max_items = max_items
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, BatchJobStatus] = {}
+        self._job_tasks: Dict[str, asyncio.Task] = {}
+        self._job_finished: Dict[str, float] = {}
+
+    @classmethod
+    def from_env(cls, handler: Callable[[TutorRequest], Awaitable[TutorResponse]]) -> "BatchProcessor":
+        return cls(
+            handler,
+            concurrency=int(os.getenv("BATCH_CONCURRENCY", 8)),
+            max_concurrency=int(os.getenv("BATCH_MAX_CONCURRENCY", 64)),
+            max_items=int(os.getenv("BATCH_MAX_ITEMS", 500)),
+            job_ttl=float(os.getenv("BATCH_JOB_TTL", 3600))
+        )
+
+    def effective_concurrency(self, requested: Optional[int]) -> int:
+        return max(1, min(requested or self.concurrency, self.max_concurrency))
+
+    async def run(self, requests: List[TutorRequest], concurrency: Optional[int] = None,
+                  progress: Optional[Callable[[int], None]] = None) -> BatchTutorResponse:
+        """Answer every request, calling the handler once per distinct prompt"""
+        # Identical prompts (same message, level, subject and history) share one call
+        groups: Dict[tuple, List[int]] = {}
+        for index, request in enumerate(requests):
+            key = make_cache_key(request.message, request.user_level, request.subject,
+                                 request.conversation_history or [])
+            groups.setdefault((request.session_id or "", key), []).append(index)
+
+        semaphore = asyncio.Semaphore(self.effective_concurrency(concurrency))
+        results: List[Optional[BatchItemResult]] = [None] * len(requests)
+        completed = 0
+
+        async def answer(indexes: List[int]):
+            nonlocal completed
+            async with semaphore:
+                try:
+                    response, error = await self.handler(requests[indexes[0]]), None
+                except Exception as e:
+                    response, error = None, str(getattr(e, "detail", None) or e)
+            for index in indexes:
+                results[index] = BatchItemResult(index=index, response=response, error=error)
+            completed += len(indexes)
+            if progress is not None:
+                progress(completed)
+
+        await asyncio.gather(*(answer(indexes) for indexes in groups.values()))
+
+        failed = sum(1 for result in results if result.error is not None)
+        return BatchTutorResponse(
+            results=results,
+            total=len(requests),
+            unique_prompts=len(groups),
+            succeeded=len(requests) - failed,
+            failed=failed,
+            timestamp=datetime.now()
+        )
+
+    def submit(self, requests: List[TutorRequest], concurrency: Optional[int] = None) -> BatchJobStatus:
+        """Start a batch in the background and return its job record"""
+        self._expire_jobs()
+        job_id = uuid.uuid4().hex
+        job = BatchJobStatus(job_id=job_id, status="pending", total=len(requests),
+                             completed=0, created_at=datetime.now())
+        self.jobs[job_id] = job
+        self._job_tasks[job_id] = asyncio.create_task(self._run_job(job, requests, concurrency))
+        return job
+
+    async def _run_job(self, job: BatchJobStatus, requests: List[TutorRequest], concurrency: Optional[int]):
+        job.status = "running"
+
+        def progress(completed: int):
+            job.completed = completed
+
+        try:
+            job.result = await self.run(requests, concurrency, progress)
+            job.status = "completed"
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+        finally:
+            self._job_tasks.pop(job.job_id, None)
+            self._job_finished[job.job_id] = time.monotonic()
+
+    def get_job(self, job_id: str) -> Optional[BatchJobStatus]:
+        self._expire_jobs()
+        return self.jobs.get(job_id)
+
+    def _expire_jobs(self):
+        """Forget finished jobs once their results have been kept for job_ttl"""
+        cutoff = time.monotonic() - self.job_ttl
+        for job_id in [job_id for job_id, finished in self._job_finished.items() if finished < cutoff]:
+            del self._job_finished[job_id]
+            self.jobs.pop(job_id, None)
+
+    async def drain(self, timeout: float):
+        """Give running background jobs up to timeout seconds to finish"""
+        if self._job_tasks:
+            await asyncio.wait(list(self._job_tasks.values()), timeout=timeout)
+
+    async def shutdown(self):
+        for task in list(self._job_tasks.values()):
+            task.cancel()
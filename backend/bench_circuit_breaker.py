@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Circuit breaker benchmark: tail latency against a flaky upstream
+
+Runs waves of concurrent tutor requests against the local fake OpenAI
+server while it fails a share of completions slowly, once with the breaker
+effectively disabled (every request waits out its retries) and once with
+the default breaker. Then heals the upstream and shows the breaker closing
+again after its half-open probe.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from fake_openai_server import start_fake_server
+
+PORT = 8766
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+
+from ai_tutor_service import AITutorService, OFFLINE_NOTICE  # noqa: E402
+from circuit_breaker import CircuitBreaker  # noqa: E402
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def build_service(breaker: CircuitBreaker) -> AITutorService:
+    service = AITutorService()
+    # Every request must reach the upstream path
+    service.response_cache = None
+    service.semantic_cache = None
+    service.breaker = breaker
+    return service
+
+
+async def run_waves(service: AITutorService, waves: int, concurrency: int) -> dict:
+    latencies, fallbacks = [], 0
+
+    async def one(i):
+        nonlocal fallbacks
+        started = time.perf_counter()
+        response = await service.generate_response(f"Explain photosynthesis, part {i}", [])
+        latencies.append(time.perf_counter() - started)
+        fallbacks += response.response.startswith(OFFLINE_NOTICE)
+
+    for wave in range(waves):
+        await asyncio.gather(*(one(wave * concurrency + i) for i in range(concurrency)))
+    return {
+        "p50": percentile(latencies, 50) * 1000,
+        "p99": percentile(latencies, 99) * 1000,
+        "max": max(latencies) * 1000,
+        "fallbacks": fallbacks,
+        "total": len(latencies),
+        "state": service.breaker.state
+    }
+
+
+def print_row(name, result):
+    print(f"{name:<14}{result['p50']:>10.1f}{result['p99']:>12.1f}{result['max']:>12.1f}"
+          f"{result['fallbacks']:>6}/{result['total']:<6}{result['state']:>12}")
+
+
+async def main(args):
+    print(f"🌩️ Circuit breaker benchmark (failure rate {args.failure_rate:.0%}, "
+          f"failures take {args.failure_latency:.1f}s)")
+    print("=" * 72)
+    print(f"{'mode':<14}{'p50 (ms)':>10}{'p99 (ms)':>12}{'max (ms)':>12}{'fallbacks':>13}{'breaker':>12}")
+
+    never_trips = CircuitBreaker(failure_rate=2.0, slow_call_rate=2.0)
+    service = build_service(never_trips)
+    print_row("no breaker", await run_waves(service, args.waves, args.concurrency))
+    await service.aclose()
+
+    breaker = CircuitBreaker(open_seconds=args.open_seconds)
+    service = build_service(breaker)
+    print_row("breaker", await run_waves(service, args.waves, args.concurrency))
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        await service.generate_response("Explain photosynthesis", [])
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    print(f"\n⚡ Open-breaker fallback: {elapsed_ms / 1000:.3f} ms per request (1000 requests)")
+
+    print("\n🩹 Upstream healed; waiting for the half-open probe...")
+    httpx.post(f"http://127.0.0.1:{PORT}/fake/config", json={"failure_rate": 0})
+    await asyncio.sleep(args.open_seconds)
+    print_row("recovered", await run_waves(service, 2, args.concurrency))
+    print(f"   breaker: {breaker.snapshot()}")
+    await service.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--failure-rate", type=float, default=0.8)
+    parser.add_argument("--failure-latency", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--waves", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--open-seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    server = start_fake_server(PORT, latency=args.latency, token_delay=0.0,
+                               failure_rate=args.failure_rate, failure_latency=args.failure_latency)
+    try:
+        asyncio.run(main(args))
+    finally:
+        server.terminate()
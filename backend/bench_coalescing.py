@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Request coalescing benchmark: a whole class asking the same question
+
+Fires N identical tutor requests at once (plain and streamed) against the
+local fake OpenAI server with the response caches disabled, and reports
+how many upstream completions were actually made.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from fake_openai_server import start_fake_server
+
+PORT = 8767
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+# The knowledge base would answer the question without any upstream call to coalesce
+os.environ["LOCAL_ANSWER_THRESHOLD"] = "2"
+
+from ai_tutor_service import AITutorService  # noqa: E402
+
+QUESTION = "What is a mitochondrion?"
+
+
+def upstream_completions() -> int:
+    return httpx.get(f"http://127.0.0.1:{PORT}/fake/stats").json()["completions"]
+
+
+async def run_plain(service: AITutorService, students: int) -> dict:
+    before = upstream_completions()
+    started = time.perf_counter()
+    responses = await asyncio.gather(*(
+        service.generate_response(QUESTION, [], user_level="beginner") for _ in range(students)
+    ))
+    elapsed = time.perf_counter() - started
+    return {"elapsed": elapsed, "upstream": upstream_completions() - before,
+            "distinct_objects": len({id(response) for response in responses})}
+
+
+async def run_stream(service: AITutorService, students: int) -> dict:
+    before = upstream_completions()
+
+    async def student():
+        tokens = []
+        async for kind, value in service.stream_response(QUESTION, [], user_level="beginner"):
+            if kind == "token":
+                tokens.append(value)
+            else:
+                return "".join(tokens), value
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(student() for _ in range(students)))
+    elapsed = time.perf_counter() - started
+    assert len({text for text, _ in results}) == 1, "subscribers saw different streams"
+    return {"elapsed": elapsed, "upstream": upstream_completions() - before,
+            "distinct_objects": len({id(response) for _, response in results})}
+
+
+async def main(students: int):
+    service = AITutorService()
+    # Caches would answer the repeats anyway; measure coalescing on its own
+    service.response_cache = None
+    service.semantic_cache = None
+
+    print(f"🧬 Coalescing benchmark: {students} students ask \"{QUESTION}\" at once")
+    print("=" * 72)
+    print(f"{'path':<10}{'wall (s)':>10}{'upstream calls':>16}{'responses':>12}")
+    for name, run in (("chat", run_plain), ("stream", run_stream)):
+        result = await run(service, students)
+        print(f"{name:<10}{result['elapsed']:>10.2f}{result['upstream']:>16}{result['distinct_objects']:>12}")
+    print(f"\n📊 chat: {service.inflight.stats()}")
+    print(f"📊 stream: {service.inflight_streams.stats()}")
+    await service.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server = start_fake_server(PORT, latency=args.latency)
+    try:
+        asyncio.run(main(args.students))
+    finally:
+        server.terminate()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Compression benchmark: bytes on the wire and server CPU per request, by coding
+
+Drives CompressionMiddleware in-process (no sockets, so the CPU numbers
+are the codec's and the middleware's own) with four payloads built from
+the knowledge base:
+
+  chat request          a /api/tutor/chat body carrying --history messages
+                        of conversation_history, sent compressed by the client
+  tutor answer          a TutorResponse with a long answer (--answer-words)
+  streamed answer       the same answer as /api/tutor/chat/stream sends it:
+                        one SSE event per word, each flushed on its own
+  short reply           a small JSON body under COMPRESSION_MIN_SIZE
+
+For every coding this process can produce (identity and gzip always; br
+and zstd with brotli and zstandard installed) it reports the body bytes,
+the time they take on a --bandwidth Mbit/s link (a student's share of a
+busy classroom Wi-Fi) and the server CPU per request above the
+uncompressed path.
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import time
+import zlib
+from datetime import datetime
+
+from compression import REQUEST_ENCODINGS, Compression, CompressionMiddleware
+from knowledge_base import DEFAULT_KNOWLEDGE_BASE_PATH
+from models import TutorResponse
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def payloads(history: int, answer_words: int):
+    with open(DEFAULT_KNOWLEDGE_BASE_PATH, encoding="utf-8") as f:
+        entries = json.load(f)["entries"]
+    conversation = []
+    for turn in range(history // 2):
+        entry = entries[turn % len(entries)]
+        conversation.append({"role": "user", "content": entry["question"]})
+        conversation.append({"role": "assistant", "content": entry["answer"]})
+    request = json.dumps({"message": "Can you give me another example?", "conversation_history": conversation,
+                          "user_level": "intermediate", "subject": "science"}).encode("utf-8")
+
+    words = []
+    while len(words) < answer_words:
+        words += entries[len(words) % len(entries)]["answer"].split(" ")
+    answer = TutorResponse(response=" ".join(words[:answer_words]), suggestions=[e["question"] for e in entries[:3]],
+                           subject_detected="science", confidence=0.92, context_tokens=1840,
+                           session_id="3f2a9c1e-bench", route="default", timestamp=datetime.now())
+    events = [f"event: token\ndata: {json.dumps({'token': word + ' '})}\n\n".encode("utf-8")
+              for word in words[:answer_words]]
+    events.append(f"event: done\ndata: {answer.model_dump_json()}\n\n".encode("utf-8"))
+    short = json.dumps({"status": "healthy", "timestamp": datetime.now().isoformat()}).encode("utf-8")
+    return request, answer.model_dump_json().encode("utf-8"), events, short
+
+
+def response_app(chunks, content_type: str):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", content_type.encode("latin-1"))]})
+        for index, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": index < len(chunks) - 1})
+    return app
+
+
+async def read_body_app(scope, receive, send):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def call(app, accept_encoding: str = "", body: bytes = b"", content_encoding: str = ""):
+    """One request through an ASGI app: (body bytes sent, number of body messages)"""
+    headers = [(b"accept-encoding", accept_encoding.encode("latin-1"))]
+    if content_encoding:
+        headers.append((b"content-encoding", content_encoding.encode("latin-1")))
+    scope = {"type": "http", "method": "POST", "path": "/", "headers": headers}
+    sent = [0, 0]
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            sent[0] += len(message.get("body", b""))
+            sent[1] += 1
+
+    await app(scope, receive, send)
+    return sent
+
+
+async def cpu_per_call(repeats: int, *args) -> float:
+    started = time.process_time()
+    for _ in range(repeats):
+        await call(*args)
+    return (time.process_time() - started) / repeats
+
+
+def encode_request(body: bytes, encoding: str) -> bytes:
+    if encoding == "identity":
+        return body
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, 6) if encoding == "gzip" else zlib.compress(body, 6)
+
+
+def row(name: str, size: int, raw: int, cpu: float, bandwidth: float, extra: str = ""):
+    wire_ms = size * 8 / (bandwidth * 1e6) * 1000
+    print(f"  {name:<10}{size:>10,}{size / raw:>8.0%}{wire_ms:>11.1f}ms{cpu * 1e6:>12.0f}µs{extra}")
+
+
+async def main(history: int, answer_words: int, repeats: int, bandwidth: float, compression: Compression):
+    request, answer, events, short = payloads(history, answer_words)
+    encodings = ("identity",) + compression.encodings
+    header = f"  {'coding':<10}{'bytes':>10}{'of raw':>8}{'on wire':>13}{'server CPU':>14}"
+    print(f"🗜️ Compression benchmark: codings {', '.join(encodings)}; {bandwidth:g} Mbit/s link; "
+          f"minimum size {compression.min_size} bytes")
+    print("=" * 80)
+
+    print(f"chat request, {history} history messages ({len(request):,} bytes)")
+    print(header)
+    baseline = await cpu_per_call(repeats, CompressionMiddleware(read_body_app, compression), "", request)
+    for encoding in ("identity",) + tuple(name for name in REQUEST_ENCODINGS
+                                          if name != "x-gzip" and (name != "zstd" or zstandard is not None)):
+        body = encode_request(request, encoding)
+        cpu = await cpu_per_call(repeats, CompressionMiddleware(read_body_app, compression), "", body,
+                                 "" if encoding == "identity" else encoding)
+        row(encoding, len(body), len(request), cpu - baseline, bandwidth)
+    print()
+
+    cases = ((f"tutor answer, {answer_words} words", [answer], "application/json"),
+             (f"streamed answer, {len(events)} events", events, "text/event-stream; charset=utf-8"),
+             ("short reply", [short], "application/json"))
+    results = {}
+    for title, chunks, content_type in cases:
+        raw = sum(len(chunk) for chunk in chunks)
+        print(f"{title} ({raw:,} bytes)")
+        print(header + ("  bytes/event" if len(chunks) > 1 else ""))
+        app = response_app(chunks, content_type)
+        baseline = await cpu_per_call(repeats, app, "")
+        for encoding in encodings:
+            middleware = CompressionMiddleware(app, compression)
+            size, messages = await call(middleware, encoding)
+            cpu = await cpu_per_call(repeats, middleware, encoding)
+            results[title, encoding] = (size, raw, cpu - baseline)
+            row(encoding, size, raw, cpu - baseline, bandwidth,
+                f"{size / messages:>13.1f}" if len(chunks) > 1 else "")
+        print()
+
+    if compression.encodings:
+        for (title, _, _), best in zip(cases, (compression.encodings[0], compression.stream_encodings[0])):
+            size, raw, cpu = results[title, best]
+            print(f"📉 {title}: {raw:,} -> {size:,} bytes with {best} "
+                  f"({(raw - size) * 8 / (bandwidth * 1e6) * 1000:.1f}ms less on the wire, {cpu * 1e6:.0f}µs CPU)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=20, help="conversation_history messages in the request")
+    parser.add_argument("--answer-words", type=int, default=600)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--bandwidth", type=float, default=2.0, help="link speed in Mbit/s for the wire time")
+    parser.add_argument("--min-size", type=int, default=1024)
+    parser.add_argument("--gzip-level", type=int, default=6)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    parser.add_argument("--zstd-level", type=int, default=3)
+    args = parser.parse_args()
+
+    settings = Compression(min_size=args.min_size, gzip_level=args.gzip_level,
+                           brotli_quality=args.brotli_quality, zstd_level=args.zstd_level)
+    asyncio.run(main(args.history, args.answer_words, args.repeats, args.bandwidth, settings))
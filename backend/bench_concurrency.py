@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark: blocking OpenAI client vs pooled async client
+
+Drives AITutorService.generate_response at several concurrency levels
+against the local fake OpenAI server, while a probe coroutine measures how
+long the event loop is stalled (what /health would feel under load).
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+import openai
+
+from fake_openai_server import start_fake_server
+
+PORT = 8765
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+# Caches and local answers would serve the repeats: every question must reach the upstream
+os.environ.update(RESPONSE_CACHE_SIZE="0", SEMANTIC_CACHE_SIZE="0", LOCAL_ANSWER_THRESHOLD="2")
+
+from ai_tutor_service import AITutorService  # noqa: E402
+
+
+class BlockingTutorService(AITutorService):
+    """The previous behaviour: a synchronous client called from async code"""
+
+    def __init__(self):
+        super().__init__()
+        self.sync_client = openai.OpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL"),
+            http_client=httpx.Client()
+        )
+
+    async def _call_openai(self, messages, route=None):
+        response = self.sync_client.chat.completions.create(
+            model=self.model,
+            messages=messages,
+            max_tokens=500,
+            temperature=0.7
+        )
+        return response.choices[0].message.content.strip()
+
+
+async def probe_loop(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Return the worst event loop stall seen while requests were running"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run_level(service: AITutorService, concurrency: int) -> dict:
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_loop(stop))
+    started = time.perf_counter()
+    # Distinct questions, so concurrent requests are not coalesced into one upstream call
+    await asyncio.gather(*[
+        service.generate_response(f"What is photosynthesis? (request {index})", [], user_level="beginner")
+        for index in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    stall = await probe
+    return {"elapsed": elapsed, "rps": concurrency / elapsed, "stall": stall}
+
+
+async def main(levels, latency):
+    print("🚀 Concurrency benchmark (fake upstream latency %.2fs)" % latency)
+    print("=" * 72)
+    print(f"{'mode':<10}{'concurrency':>12}{'wall (s)':>12}{'req/s':>10}{'max loop stall (s)':>22}")
+    for name, service in (("blocking", BlockingTutorService()), ("async", AITutorService())):
+        for level in levels:
+            result = await run_level(service, level)
+            print(f"{name:<10}{level:>12}{result['elapsed']:>12.2f}{result['rps']:>10.1f}{result['stall']:>22.3f}")
+        await service.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--levels", default="1,10,50,100")
+    args = parser.parse_args()
+
+    server = start_fake_server(PORT, latency=args.latency)
+    try:
+        asyncio.run(main([int(level) for level in args.levels.split(",")], args.latency))
+    finally:
+        server.terminate()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Educational content gate benchmark
+
+Runs a sample workload of tutor messages that are not in the training set
+through the previous substring gate and the trained ContentFilter, and
+reports what each lets through to the upstream model: upstream calls spent
+on off-topic messages, real questions wrongly blocked, and the calls the
+classifier avoids. Also reports training time and per-message latency.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from content_filter import DEFAULT_TRAINING_PATH, ContentFilter
+from subject_detector import message_words
+
+# Held out from content_filter_training.json
+EDUCATIONAL = [
+    "Explain the photoelectric effect",
+    "What's the relationship between voltage and current in a resistor?",
+    "How do I graph a linear relationship from a table of values?",
+    "How does the Senate differ from the House of Representatives?",
+    "What were the political causes of the American Revolution?",
+    "Explain the role of religion in the Crusades",
+    "How did Buddhism spread across Asia?",
+    "What is the probability of drawing an ace from a deck of cards?",
+    "How do you calculate the odds of an event in statistics?",
+    "How does weather affect crop yields in different climates?",
+    "Why does the weather change with the seasons?",
+    "What is the physics of a soccer ball's spin?",
+    "Calculate the average speed of a sprinter who runs 100 m in 10 seconds",
+    "Discuss the relationship between Gatsby and Daisy in The Great Gatsby",
+    "What does the green light symbolize in The Great Gatsby?",
+    "How do I find the volume of a cylinder?",
+    "What is the chain rule?",
+    "How do I solve simultaneous equations?",
+    "What is a vector in physics?",
+    "What is the difference between mass and weight?",
+    "Why is the sky blue?",
+    "How do I write a hypothesis for my experiment?",
+    "What is the difference between RNA and DNA?",
+    "How do ecosystems stay balanced?",
+    "What is an ionic compound?",
+    "Explain oxidation and reduction",
+    "What is a stack data structure?",
+    "How do I write a function in JavaScript?",
+    "What is a SQL join?",
+    "What is the difference between a compiler and an interpreter?",
+    "Explain the causes of the fall of the Roman Empire",
+    "Who was Mahatma Gandhi and what did he achieve?",
+    "What was the Renaissance?",
+    "How do glaciers shape landscapes?",
+    "What is population density?",
+    "What is an adverb?",
+    "How do I structure a persuasive essay?",
+    "What is personification in poetry?",
+    "Can you help me prepare for my chemistry test?",
+    "Can you explain that last step again?",
+    "I'm confused about the second example",
+    "What is elasticity of demand?",
+    "How does the stock market work in economics?",
+    "What is the difference between a virus and a bacterium?",
+    "How do I memorize the multiplication table?",
+]
+OFF_TOPIC = [
+    "Is it going to be sunny this afternoon?",
+    "Who won the basketball game yesterday?",
+    "Give me the best bets for the Champions League final",
+    "Which slot machine pays out the most?",
+    "What is Beyonce doing these days?",
+    "Recommend a romantic comedy for tonight",
+    "How do I text my crush without seeming desperate?",
+    "My boyfriend ignores me, what should I do?",
+    "Who is the best candidate for president?",
+    "Which church should I join?",
+    "Where's the nearest sushi restaurant?",
+    "What should I have for lunch?",
+    "Find me cheap flights to Tokyo",
+    "Which crypto coin will go up tomorrow?",
+    "Tell me a knock knock joke",
+    "What's your favorite movie?",
+    "What does my zodiac sign say about me?",
+    "What shoes go with a black dress?",
+    "How do I hack a wifi password?",
+    "How do I get unlimited coins in Clash of Clans?",
+    "What's a good show to binge watch?",
+    "Write an insulting poem about my sister",
+    "How do I get a six pack fast?",
+    "My phone battery dies quickly, help",
+    "Is the new PlayStation worth it?",
+    "Write a wedding toast for my brother",
+    "How do I go viral on TikTok?",
+    "Who would win, a shark or a bear?",
+    "What's the hottest celebrity scandal right now?",
+    "qwerty uiop",
+]
+
+# The previous validate_educational_content
+BLOCKLIST = ["weather", "sports", "entertainment", "gossip", "personal problems",
+             "relationship", "dating", "politics", "religion", "gambling"]
+
+
+def substring_gate(message: str) -> bool:
+    message_lower = message.lower()
+    return not any(keyword in message_lower for keyword in BLOCKLIST)
+
+
+def evaluate(gate, workload):
+    outcome = {"calls": 0, "wasted": 0, "blocked_real": 0}
+    for message, educational in workload:
+        allowed = gate(message)
+        outcome["calls"] += allowed
+        outcome["wasted"] += allowed and not educational
+        outcome["blocked_real"] += educational and not allowed
+    return outcome
+
+
+def main(requests: int, seed: int):
+    started = time.perf_counter()
+    content_filter = ContentFilter.load(DEFAULT_TRAINING_PATH)
+    training = time.perf_counter() - started
+
+    rng = random.Random(seed)
+    labelled = [(message, True) for message in EDUCATIONAL] + [(message, False) for message in OFF_TOPIC]
+    workload = [rng.choice(labelled) for _ in range(requests)]
+
+    # Latency on fresh messages: the word split is cached per message, so time it cold
+    samples = []
+    for message, _ in labelled * 20:
+        message_words.cache_clear()
+        began = time.perf_counter()
+        content_filter.probability(message)
+        samples.append(time.perf_counter() - began)
+    samples.sort()
+
+    print("🛡️ Educational content gate benchmark")
+    print("=" * 72)
+    print(f"Training: {training * 1000:.0f} ms on the bundled labelled set")
+    print(f"Classifier latency: p50 {samples[len(samples) // 2] * 1e6:.1f} µs, "
+          f"p99 {samples[int(len(samples) * 0.99)] * 1e6:.1f} µs, mean {statistics.mean(samples) * 1e6:.1f} µs")
+    print()
+    off_topic = sum(1 for _, educational in workload if not educational)
+    print(f"Workload: {requests} messages ({off_topic} off-topic), none of them seen in training")
+    print(f"{'gate':>12}{'upstream calls':>16}{'off-topic sent':>16}{'real blocked':>14}")
+    baseline = evaluate(substring_gate, workload)
+    classifier = evaluate(content_filter.is_educational, workload)
+    for name, outcome in (("substring", baseline), ("classifier", classifier)):
+        print(f"{name:>12}{outcome['calls']:>16}{outcome['wasted']:>16}{outcome['blocked_real']:>14}")
+    print()
+    print(f"✅ Upstream calls avoided on off-topic messages: {baseline['wasted'] - classifier['wasted']} "
+          f"({classifier['wasted']} of {off_topic} still sent, was {baseline['wasted']})")
+    print(f"✅ Real questions no longer blocked: {baseline['blocked_real'] - classifier['blocked_real']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    main(args.requests, args.seed)
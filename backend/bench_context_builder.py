@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Context builder benchmark
+
+Compares the previous fixed "last 10 messages" context with the
+token-budget builder on conversations of pasted essays and of one-liners,
+reporting prompt tokens sent, turns kept and build time.
+"""
+import argparse
+import os
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+
+from ai_tutor_service import AITutorService  # noqa: E402
+from context_builder import MESSAGE_OVERHEAD  # noqa: E402
+from models import ChatMessage  # noqa: E402
+
+ESSAY = ("The industrial revolution transformed how goods were produced. " * 400).strip()
+
+
+def conversation(kind: str, turns: int):
+    history = []
+    for i in range(turns):
+        if kind == "essays" and i % 2 == 0:
+            history.append(ChatMessage(role="user", content=f"Please review my essay {i}: {ESSAY}"))
+        else:
+            history.append(ChatMessage(role="user" if i % 2 == 0 else "assistant",
+                                       content=f"Short turn number {i} about derivatives."))
+    return history
+
+
+def fixed_window_tokens(service, system_prompt, history, message):
+    """Token count of the previous history[-10:] context"""
+    count = service.context_builder.counter.count
+    contents = [system_prompt] + [msg.content for msg in history[-10:]] + [message]
+    return sum(count(content) + MESSAGE_OVERHEAD for content in contents)
+
+
+def main(number: int):
+    service = AITutorService()
+    message = "Can you explain the chain rule?"
+    system_prompt = service._build_conversation_context(message, [], "beginner", "mathematics")[0][0]["content"]
+    budget = service.context_builder.token_budget
+    print(f"🚀 Context builder benchmark (budget {budget} tokens)")
+    print("=" * 72)
+    for kind, turns in (("essays", 10), ("one-liners", 40)):
+        history = conversation(kind, turns)
+        before = fixed_window_tokens(service, system_prompt, history, message)
+        messages, stats = service._build_conversation_context(message, history, "beginner", "mathematics")
+        elapsed = timeit.timeit(
+            lambda: service._build_conversation_context(message, history, "beginner", "mathematics"),
+            number=number) / number
+        print(f"{kind} ({turns} turns)")
+        print(f"   last-10 window:   {before:6d} tokens, {min(10, turns):2d} turns")
+        print(f"   token budget:     {stats.prompt_tokens:6d} tokens, {stats.history_included:2d} turns kept, "
+              f"{stats.history_summarized} summarized, {stats.truncated} trimmed")
+        print(f"   build time:       {elapsed * 1e6:8.1f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=1000)
+    args = parser.parse_args()
+    main(args.number)
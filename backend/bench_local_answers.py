@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Local answer engine benchmark
+
+Builds the knowledge base index over the shipped FAQ/glossary entries plus
+synthetic glossary entries up to --entries, then times queries that should
+be answered locally (shipped and synthetic definitional questions, in
+several phrasings) and queries that should fall through to the model.
+Query latency should stay under 1 ms at 50k entries.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from knowledge_base import DEFAULT_KNOWLEDGE_BASE_PATH, KnowledgeBase
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ra", "tu", "zo", "phi", "tro", "gen", "lyt", "ox", "cel", "mer", "ion",
+             "dra", "quo", "sta", "vel", "nim"]
+# Shared second words give the index long posting lists, like real glossaries
+HEADS = ["law", "theory", "equation", "cell", "reaction", "principle", "effect", "cycle", "function", "bond"]
+SUBJECTS = ["mathematics", "physics", "chemistry", "biology", "computer_science", "english", "history", "geography"]
+
+DIRECT = ["What is {}?", "explain {}", "define {}", "Can you help me understand {}?"]
+OPEN_ENDED = [
+    "How does {} compare with what we covered last week, and why does it matter for the exam?",
+    "Write a step by step worked example using {} for an advanced student",
+    "Why do scientists still argue about {} in modern research papers?",
+]
+
+
+def synthetic_entries(count: int, rng: random.Random):
+    seen, entries = set(), []
+    while len(entries) < count:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        term = f"{word} {rng.choice(HEADS)}" if rng.random() < 0.5 else word
+        if term in seen:
+            continue
+        seen.add(term)
+        entries.append({
+            "subject": rng.choice(SUBJECTS),
+            "question": f"What is {term}?",
+            "aliases": [f"{term} definition"],
+            "answer": f"{term.capitalize()} is a synthetic glossary entry used to size the index."
+        })
+    return entries
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def time_queries(kb: KnowledgeBase, queries):
+    answered, samples = 0, []
+    for query in queries:
+        started = time.perf_counter()
+        match = kb.answer(query)
+        samples.append(time.perf_counter() - started)
+        answered += match is not None
+    return answered, samples
+
+
+def main(total: int, queries: int, seed: int):
+    rng = random.Random(seed)
+    with open(DEFAULT_KNOWLEDGE_BASE_PATH, encoding="utf-8") as f:
+        shipped = json.load(f)["entries"]
+    entries = shipped + synthetic_entries(max(0, total - len(shipped)), rng)
+
+    builds = []
+    for _ in range(3):
+        started = time.perf_counter()
+        kb = KnowledgeBase(entries)
+        builds.append(time.perf_counter() - started)
+    stats = kb.stats()
+
+    topics = [entry["question"][len("What is "):-1] if entry["question"].startswith("What is ") else entry["question"]
+              for entry in rng.sample(entries, min(len(entries), 2000))]
+    direct = [rng.choice(DIRECT).format(rng.choice(topics)) for _ in range(queries)]
+    open_ended = [rng.choice(OPEN_ENDED).format(rng.choice(topics)) for _ in range(queries)]
+
+    for query in direct[:200] + open_ended[:200]:
+        kb.answer(query)
+
+    print("📚 Local answer engine benchmark")
+    print("=" * 72)
+    print(f"Corpus: {stats['entries']} entries, {stats['phrasings']} indexed phrasings, {stats['terms']} terms")
+    print(f"Index build: {statistics.median(builds) * 1000:.0f} ms (median of 3)")
+    print(f"{'queries':>16}{'answered':>12}{'p50 µs':>10}{'p99 µs':>10}{'max µs':>10}")
+    worst = 0.0
+    for name, batch in (("definitional", direct), ("open-ended", open_ended)):
+        answered, samples = time_queries(kb, batch)
+        p99 = percentile(samples, 0.99)
+        worst = max(worst, p99)
+        print(f"{name:>16}{answered / len(batch):>11.0%}{percentile(samples, 0.5) * 1e6:>10.0f}"
+              f"{p99 * 1e6:>10.0f}{max(samples) * 1e6:>10.0f}")
+    print()
+    print(f"{'✅' if worst < 0.001 else '⚠️'} p99 query latency {worst * 1000:.3f} ms (target < 1 ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    main(args.entries, args.queries, args.seed)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Model routing benchmark: one model for everything vs routed model tiers
+
+Sends a mixed workload of quick definitional questions, ordinary questions
+and multi-step proofs through the tutor service twice. First every request
+goes to one capable model (gpt-4o) with max_tokens=500, as before routing.
+Then the rules in model_routes.json send quick questions to the light tier
+(gpt-4o-mini) and give proofs a larger completion budget. The local fake
+OpenAI server gives each model its own latency profile and counts the
+tokens each model used, which are priced with illustrative per-token rates.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import time
+
+import httpx
+
+from fake_openai_server import start_fake_server
+
+PORT = 8768
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ["OPENAI_MODEL"] = "gpt-4o"
+os.environ["OPENAI_MODEL_LIGHT"] = "gpt-4o-mini"
+os.environ.pop("OPENAI_MODEL_HEAVY", None)
+
+from ai_tutor_service import AITutorService  # noqa: E402
+from model_router import ModelRouter  # noqa: E402
+
+# Seconds to the first token, then seconds per token
+MODEL_PROFILES = "gpt-4o-mini=0.15:0.005,gpt-4o=0.5:0.02"
+# Illustrative USD per million (prompt, completion) tokens
+PRICES = {"gpt-4o-mini": (0.15, 0.60), "gpt-4o": (2.50, 10.00)}
+
+QUICK = [
+    "define atom", "what is a noun", "meaning of photosynthesis", "what is velocity",
+    "what is a prime number", "define erosion", "what is an isotope", "what is recursion",
+]
+STANDARD = [
+    "Can you explain how the immune system responds to a new virus and why vaccines help?",
+    "Why did the Industrial Revolution start in Britain rather than somewhere else in Europe?",
+    "How do I choose between a list and a dictionary when I write a Python program?",
+    "What are the main themes of Of Mice and Men and how does the ending connect them?",
+]
+HARD = [
+    "Prove that the square root of 2 is irrational",
+    "Derive the kinetic energy formula from Newton's second law step by step",
+    "Show that the sum of the first n odd numbers is n squared",
+    "What is the time complexity of merge sort and how do you derive it?",
+]
+
+
+def workload(size: int, rng: random.Random):
+    """(kind, message) pairs: about half quick questions, a third ordinary ones and the rest proofs"""
+    mix = [("quick", QUICK, 0.5), ("ordinary", STANDARD, 0.35), ("proof", HARD, 0.15)]
+    requests = []
+    for _ in range(size):
+        kind, pool, _ = rng.choices(mix, weights=[weight for _, _, weight in mix])[0]
+        # A unique suffix keeps single-flight coalescing out of the measurement
+        requests.append((kind, f"{rng.choice(pool)} (#{len(requests)})"))
+    return requests
+
+
+def model_usage() -> dict:
+    return httpx.get(f"http://127.0.0.1:{PORT}/fake/stats").json()["models"]
+
+
+def cost(before: dict, after: dict) -> float:
+    total = 0.0
+    for model, usage in after.items():
+        previous = before.get(model, {})
+        prompt_price, completion_price = PRICES.get(model, (0.0, 0.0))
+        total += (usage["prompt_tokens"] - previous.get("prompt_tokens", 0)) * prompt_price / 1e6
+        total += (usage["completion_tokens"] - previous.get("completion_tokens", 0)) * completion_price / 1e6
+    return total
+
+
+async def run(service: AITutorService, messages, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, routes = {}, {}
+
+    async def ask(kind, message):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await service.generate_response(message, [], user_level="beginner")
+            latencies.setdefault(kind, []).append(time.perf_counter() - started)
+            routes.setdefault(kind, set()).add(response.route)
+
+    before = model_usage()
+    await asyncio.gather(*(ask(kind, message) for kind, message in messages))
+    every = [latency for samples in latencies.values() for latency in samples]
+    return {"latencies": latencies, "routes": routes, "p50": statistics.median(every),
+            "mean": statistics.mean(every), "cost": cost(before, model_usage())}
+
+
+async def main(size: int, concurrency: int, seed: int):
+    service = AITutorService()
+    # Measure routing alone: no caches, local answers or coalescing shortcuts
+    service.response_cache = None
+    service.semantic_cache = None
+    service.knowledge_base.answer_threshold = 2.0
+    routed = service.router
+    single = ModelRouter([], routed.default)
+    await service.warmup(connections=concurrency)
+
+    messages = workload(size, random.Random(seed))
+    print(f"🧭 Model routing benchmark: {size} mixed questions, {concurrency} at a time")
+    print("=" * 72)
+    results = {}
+    for name, router in (("single model", single), ("routed", routed)):
+        service.router = router
+        results[name] = await run(service, messages, concurrency)
+
+    print(f"{'run':<14}{'questions':<11}{'route':<16}{'requests':>10}{'p50 (s)':>10}")
+    for name, result in results.items():
+        for kind, samples in result["latencies"].items():
+            route = ",".join(sorted(result["routes"][kind]))
+            print(f"{name:<14}{kind:<11}{route:<16}{len(samples):>10}{statistics.median(samples):>10.2f}")
+    print()
+    print(f"{'run':<14}{'p50 (s)':>10}{'mean (s)':>10}{'cost (USD)':>14}")
+    for name, result in results.items():
+        print(f"{name:<14}{result['p50']:>10.2f}{result['mean']:>10.2f}{result['cost']:>14.5f}")
+
+    baseline, routed_result = results["single model"], results["routed"]
+    print()
+    quick_before = statistics.median(baseline["latencies"]["quick"])
+    quick_after = statistics.median(routed_result["latencies"]["quick"])
+    print(f"⏱️ p50 latency {baseline['p50']:.2f}s -> {routed_result['p50']:.2f}s overall, "
+          f"{quick_before:.2f}s -> {quick_after:.2f}s for quick questions")
+    print(f"💰 cost ${baseline['cost']:.5f} -> ${routed_result['cost']:.5f} "
+          f"({1 - routed_result['cost'] / baseline['cost']:.0%} lower)")
+    await service.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server = start_fake_server(PORT, model_profiles=MODEL_PROFILES)
+    try:
+        asyncio.run(main(args.requests, args.concurrency, args.seed))
+    finally:
+        server.terminate()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Speculative prefetch benchmark: follow-up latency vs extra upstream calls
+
+Starts the local fake OpenAI server and one backend worker under uvicorn,
+then --students students each hold a --turns turn conversation over
+/api/tutor/chat/stream with a server-side session. After every answer a
+student reads for a while (exponential, mean --think seconds), then
+clicks one of the suggested follow-ups with probability --click (the
+first suggestion most often) or asks a question of their own.
+
+Runs once with prefetching off and once with PREFETCH_SUGGESTIONS set to
+--suggestions (PREFETCH_MAX_IN_FLIGHT to --max-in-flight), the same
+students making the same choices, and reports time to first token for
+clicked follow-ups and for every turn, upstream completions per turn,
+and the prefetcher's own hit ratio. Response caches and local answers
+are off, so every cold question reaches the upstream.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+import httpx
+
+os.environ.update(RESPONSE_CACHE_SIZE="0", SEMANTIC_CACHE_SIZE="0", LOCAL_ANSWER_THRESHOLD="2",
+                  WARMUP_CONNECTIONS="0")
+
+from fake_openai_server import start_fake_server  # noqa: E402
+from loadtest import QUESTIONS, free_port, percentile, start_backend  # noqa: E402
+
+# How often a clicking student picks the first, second and third suggestion
+CLICK_WEIGHTS = (0.6, 0.25, 0.15)
+
+
+async def ask(client: httpx.AsyncClient, base: str, session_id: str, message: str):
+    """One streamed turn: (time to first token, the done event's TutorResponse)"""
+    started, first, done = time.perf_counter(), None, None
+    # Each student is their own user, with their own speculative budget
+    async with client.stream("POST", f"{base}/api/tutor/chat/stream", headers={"X-User-Id": session_id}, json={
+            "message": message, "session_id": session_id, "user_level": "intermediate"}) as response:
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[7:]
+                if event == "token" and first is None:
+                    first = time.perf_counter() - started
+            elif line.startswith("data: ") and event in ("done", "error"):
+                done = json.loads(line[6:])
+    return first, done
+
+
+async def student(client: httpx.AsyncClient, base: str, run: str, index: int, turns: int,
+                  think: float, click: float, seed: int, samples: dict):
+    # Seeded per student, so both runs make the same choices at the same times
+    rng = random.Random(seed * 1000 + index)
+    session_id = f"bench-prefetch-{run}-{index}"
+    message = f"{rng.choice(QUESTIONS)} ({run} student {index})"
+    clicked = False
+    for turn in range(turns):
+        first, done = await ask(client, base, session_id, message)
+        samples["all"].append(first)
+        if clicked:
+            samples["clicked"].append(first)
+        suggestions = (done or {}).get("suggestions") or []
+        await asyncio.sleep(rng.expovariate(1 / think))
+        clicked = bool(suggestions) and rng.random() < click
+        if clicked:
+            message = rng.choices(suggestions, weights=CLICK_WEIGHTS[:len(suggestions)])[0]
+        else:
+            message = f"{rng.choice(QUESTIONS)} ({run} student {index} turn {turn})"
+
+
+async def run(base: str, upstream: str, name: str, args) -> dict:
+    samples = {"all": [], "clicked": []}
+    async with httpx.AsyncClient(timeout=60, limits=httpx.Limits(max_connections=args.students)) as client:
+        before = (await client.get(f"{upstream}/fake/stats")).json()["completions"]
+        await asyncio.gather(*(student(client, base, name, index, args.turns, args.think, args.click, args.seed,
+                                       samples) for index in range(args.students)))
+        # Speculations still running are cancelled only by the next turn: let them settle
+        await asyncio.sleep(args.think)
+        completions = (await client.get(f"{upstream}/fake/stats")).json()["completions"] - before
+        prefetch = (await client.get(f"{base}/api/tutor/cache/stats")).json()["prefetch"]
+    return {"samples": samples, "completions": completions, "prefetch": prefetch}
+
+
+def main(args):
+    upstream_port = free_port()
+    fake = start_fake_server(upstream_port, latency=args.latency, token_delay=args.token_delay)
+    upstream = f"http://127.0.0.1:{upstream_port}"
+    print(f"🔮 Prefetch benchmark: {args.students} students x {args.turns} turns, think time {args.think:g}s, "
+          f"{args.click:.0%} click a suggestion; upstream first token {args.latency:g}s")
+    print("=" * 92)
+    results = {}
+    try:
+        for name, suggestions in (("prefetch off", 0), (f"prefetch {args.suggestions}", args.suggestions)):
+            os.environ.update(PREFETCH_SUGGESTIONS=str(suggestions), PREFETCH_MAX_IN_FLIGHT=str(args.max_in_flight))
+            port = free_port()
+            backend = start_backend(port, upstream_port, workers=1, keep_limits=False)
+            try:
+                results[name] = asyncio.run(run(f"http://127.0.0.1:{port}", upstream, name.replace(" ", "-"), args))
+            finally:
+                backend.terminate()
+    finally:
+        fake.terminate()
+
+    print(f"{'run':<14}{'clicked p50':>12}{'clicked p95':>12}{'all p50':>10}{'all p95':>10}"
+          f"{'calls/turn':>12}{'hit ratio':>11}")
+    for name, result in results.items():
+        clicked, every = result["samples"]["clicked"], result["samples"]["all"]
+        prefetch = result["prefetch"]
+        print(f"{name:<14}{percentile(clicked, 0.5):>11.2f}s{percentile(clicked, 0.95):>11.2f}s"
+              f"{percentile(every, 0.5):>9.2f}s{percentile(every, 0.95):>9.2f}s"
+              f"{result['completions'] / len(every):>12.2f}"
+              f"{prefetch['hit_ratio'] if prefetch['enabled'] else float('nan'):>11.0%}")
+    off, on = results.values()
+    prefetch = on["prefetch"]
+    print()
+    print(f"speculations: {prefetch['started']} started, {prefetch['results']}, skipped {prefetch['skipped']}")
+    clicked_off, clicked_on = statistics.median(off["samples"]["clicked"]), statistics.median(on["samples"]["clicked"])
+    turns = len(on["samples"]["all"])
+    print(f"⏱️ clicked follow-up TTFT p50 {clicked_off:.2f}s -> {clicked_on:.2f}s")
+    print(f"💸 upstream calls per turn {off['completions'] / turns:.2f} -> {on['completions'] / turns:.2f} "
+          f"({on['completions'] - off['completions']:+d} calls for {len(on['samples']['clicked'])} clicked turns)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--think", type=float, default=3.0, help="mean seconds a student reads before asking again")
+    parser.add_argument("--click", type=float, default=0.6, help="share of turns that click a suggestion")
+    parser.add_argument("--suggestions", type=int, default=1, help="follow-ups prefetched per answer")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="PREFETCH_MAX_IN_FLIGHT for the worker")
+    parser.add_argument("--latency", type=float, default=0.8, help="fake upstream seconds to the first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="fake upstream seconds per token")
+    parser.add_argument("--seed", type=int, default=11)
+    main(parser.parse_args())
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Prompt cache benchmark: level note in the system prompt vs compiled prompts
+
+Runs multi-turn tutoring conversations through the tutor service twice
+against the local fake OpenAI server, which caches prompt prefixes the way
+the real API does (prompts of 1024 tokens or more, in 128-token blocks)
+and spends --prefill seconds per 1000 uncached prompt tokens before the
+first token. First with the previous layout, where the student's level
+and detected subject were appended to the system prompt: a follow-up such
+as "can you give me an example?" detects no subject, changes the first
+message and loses the cached conversation. Then with the PromptCompiler
+layout, where the system prompt is shared and the level and subject note
+sits just before the new message. Reports the cache hit rate from the
+usage the upstream returns, and time to first token.
+
+The built-in system prompt is shorter than 1024 tokens, so on its own it
+is never cached; --guidelines adds that many tokens of house rules to it,
+as a deployment with a longer prompt would, which compiled prompts then
+share between every student.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import time
+
+from fake_openai_server import start_fake_server
+
+PORT = 8769
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+os.environ["OPENAI_STREAM_USAGE"] = "true"
+
+from ai_tutor_service import AITutorService  # noqa: E402
+from knowledge_base import DEFAULT_KNOWLEDGE_BASE_PATH  # noqa: E402
+from models import ChatMessage  # noqa: E402
+from prompt_compiler import USER_LEVELS, PromptCompiler  # noqa: E402
+
+GUIDELINE = ("When a student shares an attempt, point out what they did well before correcting the first "
+             "mistake, and ask them to try the next step themselves instead of giving the full solution. ")
+FOLLOW_UPS = [
+    "Can you give me an example?", "Why does that happen?", "I still don't get it, can you explain it more simply?",
+    "What would change if it were the other way around?", "Can you go over the last part again?",
+]
+
+
+def legacy_layout(build):
+    """The previous layout: the level and subject note appended to the system prompt"""
+    def build_legacy(message, history, user_level, subject):
+        messages, stats = build(message, history, user_level, subject)
+        system, note = messages[0], messages[-2]
+        merged = {"role": "system", "content": f"{system['content']}\n{note['content']}\n"}
+        return [merged] + messages[1:-2] + [messages[-1]], stats
+    return build_legacy
+
+
+def conversations(students: int, turns: int, rng: random.Random, tag: str):
+    """(level, [(question, tutor answer)]) per student: a subject question, then mostly follow-ups"""
+    with open(DEFAULT_KNOWLEDGE_BASE_PATH, encoding="utf-8") as f:
+        entries = json.load(f)["entries"]
+    result = []
+    for student in range(students):
+        subject_entries = [entry for entry in entries if entry["subject"] == rng.choice(entries)["subject"]]
+        exchanges = []
+        for turn in range(turns):
+            entry = rng.choice(subject_entries)
+            question = entry["question"] if turn == 0 or rng.random() < 0.3 else rng.choice(FOLLOW_UPS)
+            # Real tutor answers run a few hundred tokens: the history carries several knowledge base answers
+            answer = "\n\n".join([entry["answer"]] + [rng.choice(subject_entries)["answer"] for _ in range(4)])
+            exchanges.append((f"{question} ({tag} student {student})" if turn == 0 else question, answer))
+        result.append((rng.choice(USER_LEVELS), exchanges))
+    return result
+
+
+async def run(service: AITutorService, workload, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    first_tokens, by_turn = [], {}
+    before = service.prompt_cache_stats()
+
+    async def converse(level, exchanges):
+        history = []
+        for turn, (question, answer) in enumerate(exchanges):
+            async with semaphore:
+                started, elapsed = time.perf_counter(), None
+                # Read the whole stream: the usage arrives after the last token
+                async for kind, _ in service.stream_response(question, history, user_level=level):
+                    if kind == "token" and elapsed is None:
+                        elapsed = time.perf_counter() - started
+                first_tokens.append(elapsed)
+                by_turn.setdefault(turn, []).append(elapsed)
+            history = history + [ChatMessage(role="user", content=question),
+                                 ChatMessage(role="assistant", content=answer)]
+
+    await asyncio.gather(*(converse(level, exchanges) for level, exchanges in workload))
+    after = service.prompt_cache_stats()
+    prompt_tokens = after["prompt_tokens"] - before["prompt_tokens"]
+    cached_tokens = after["cached_tokens"] - before["cached_tokens"]
+    ordered = sorted(first_tokens)
+    return {"requests": len(ordered), "prompt_tokens": prompt_tokens, "hit_rate": cached_tokens / prompt_tokens,
+            "p50": statistics.median(ordered), "p95": ordered[int(len(ordered) * 0.95)],
+            "by_turn": {turn: statistics.median(samples) for turn, samples in sorted(by_turn.items())}}
+
+
+async def main(students: int, turns: int, concurrency: int, guidelines: int, seed: int):
+    service = AITutorService()
+    # Measure the upstream prompt cache alone: no response caches or local answers
+    service.response_cache = None
+    service.semantic_cache = None
+    service.knowledge_base.answer_threshold = 2.0
+    counter = service.context_builder.counter
+    if guidelines:
+        rules = GUIDELINE * (guidelines // counter.count(GUIDELINE) + 1)
+        service.system_prompt += "\n\nHouse rules:\n" + counter.truncate(rules, guidelines)
+        service.prompt_compiler = PromptCompiler(service.system_prompt, counter, service.subject_keywords)
+    await service.warmup(connections=concurrency)
+    compiled_build = service._build_conversation_context
+
+    print(f"🧩 Prompt cache benchmark: {students} conversations of {turns} turns, {concurrency} at a time")
+    print(f"   system prompt {service.prompt_compiler.system_tokens} tokens; "
+          f"the upstream caches prompts of 1024+ tokens")
+    print("=" * 76)
+    results = {}
+    for name, build in (("system prompt note", legacy_layout(compiled_build)), ("compiled prompt", compiled_build)):
+        service._build_conversation_context = build
+        # The same conversations each run, tagged so the second run cannot reuse the first run's prefixes
+        workload = conversations(students, turns, random.Random(seed), name)
+        results[name] = await run(service, workload, concurrency)
+
+    print(f"{'layout':<22}{'requests':>10}{'prompt tok':>12}{'cache hits':>12}{'TTFT p50':>10}{'TTFT p95':>10}")
+    for name, result in results.items():
+        print(f"{name:<22}{result['requests']:>10}{result['prompt_tokens'] / result['requests']:>12.0f}"
+              f"{result['hit_rate']:>12.0%}{result['p50']:>9.2f}s{result['p95']:>9.2f}s")
+    print()
+    print("TTFT p50 by turn")
+    print(f"{'layout':<22}" + "".join(f"{turn + 1:>8}" for turn in range(turns)))
+    for name, result in results.items():
+        print(f"{name:<22}" + "".join(f"{result['by_turn'][turn]:>7.2f}s" for turn in range(turns)))
+
+    before, after = results["system prompt note"], results["compiled prompt"]
+    print()
+    print(f"🎯 prompt cache hit rate {before['hit_rate']:.0%} -> {after['hit_rate']:.0%}")
+    print(f"⏱️ time to first token p50 {before['p50']:.2f}s -> {after['p50']:.2f}s, "
+          f"p95 {before['p95']:.2f}s -> {after['p95']:.2f}s")
+    await service.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--guidelines", type=int, default=0, help="tokens of house rules added to the system prompt")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake upstream seconds to the first token")
+    parser.add_argument("--prefill", type=float, default=0.3,
+                        help="fake upstream seconds per 1000 uncached prompt tokens")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    server = start_fake_server(PORT, latency=args.latency, token_delay=0.02, prefill=args.prefill)
+    try:
+        asyncio.run(main(args.students, args.turns, args.concurrency, args.guidelines, args.seed))
+    finally:
+        server.terminate()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Admission control benchmark: one runaway client vs a class of students
+
+Drives the FastAPI app in-process against the local fake OpenAI server,
+which enforces a per-second quota like the real API. A runaway client
+hammers /api/tutor/chat from many connections while students ask a
+question every second. Without admission control the runaway client burns
+the upstream quota and students get offline fallbacks; with it the runaway
+client gets fast 429s and students keep getting real answers.
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from fake_openai_server import start_fake_server
+
+PORT = 8768
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+# Students and the runaway client are told apart by X-User-Id, as a proxy in front would set it
+os.environ["RATE_LIMIT_TRUST_PROXY"] = "true"
+
+import main  # noqa: E402
+from ai_tutor_service import OFFLINE_NOTICE  # noqa: E402
+from circuit_breaker import CircuitBreaker  # noqa: E402
+from rate_limiter import AdmissionController, InMemoryBucketBackend  # noqa: E402
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_scenario(admission: AdmissionController, args) -> dict:
+    main.admission = admission
+    main.ai_tutor.breaker = CircuitBreaker.from_env()
+    deadline = time.perf_counter() + args.duration
+    counter = iter(range(10 ** 9))
+    students = {"latencies": [], "answered": 0, "fallback": 0, "rejected": 0}
+    runaway = {"sent": 0, "rejected": 0}
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://tutor", timeout=60) as client:
+
+        async def ask(user: str):
+            body = {"message": f"Explain photosynthesis step {next(counter)}", "user_level": "beginner"}
+            return await client.post("/api/tutor/chat", json=body, headers={"X-User-Id": user})
+
+        async def runaway_loop():
+            while time.perf_counter() < deadline:
+                response = await ask("runaway")
+                runaway["sent"] += 1
+                if response.status_code == 429:
+                    runaway["rejected"] += 1
+                    await asyncio.sleep(0.01)
+
+        async def student_loop(student: int):
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await ask(f"student-{student}")
+                if response.status_code == 429:
+                    students["rejected"] += 1
+                else:
+                    students["latencies"].append(time.perf_counter() - started)
+                    if response.json()["response"].startswith(OFFLINE_NOTICE):
+                        students["fallback"] += 1
+                    else:
+                        students["answered"] += 1
+                await asyncio.sleep(1.0)
+
+        await asyncio.gather(*(runaway_loop() for _ in range(args.runaway_connections)),
+                             *(student_loop(i) for i in range(args.students)))
+    return {"students": students, "runaway": runaway}
+
+
+def report(name: str, result: dict):
+    students, runaway = result["students"], result["runaway"]
+    total = students["answered"] + students["fallback"] + students["rejected"]
+    print(f"{name:<14}{students['answered']:>6}/{total:<6}{students['fallback']:>10}{students['rejected']:>8}"
+          f"{percentile(students['latencies'], 50) * 1000:>10.0f}{percentile(students['latencies'], 99) * 1000:>10.0f}"
+          f"{runaway['sent']:>10}{runaway['rejected']:>10}")
+
+
+async def main_async(args):
+    main.ai_tutor.response_cache = None
+    main.ai_tutor.semantic_cache = None
+
+    print(f"🚦 Admission control benchmark: upstream quota {args.rps_limit:.0f} req/s, "
+          f"{args.students} students, runaway client on {args.runaway_connections} connections")
+    print("=" * 84)
+    print(f"{'mode':<14}{'real answers':>13}{'fallback':>10}{'429s':>8}{'p50 (ms)':>10}{'p99 (ms)':>10}"
+          f"{'runaway':>10}{'its 429s':>10}")
+
+    unlimited = AdmissionController(InMemoryBucketBackend(), user_rpm=0, global_rpm=0, global_tpm=0)
+    report("no limiter", await run_scenario(unlimited, args))
+    # Let the upstream quota window roll over between scenarios
+    await asyncio.sleep(1.5)
+
+    limited = AdmissionController(InMemoryBucketBackend(), user_rpm=args.user_rpm, user_burst=5,
+                                  global_rpm=args.rps_limit * 60 * 0.9, global_tpm=0,
+                                  queue_size=50, max_wait=5)
+    report("limiter", await run_scenario(limited, args))
+    print(f"\n📊 limiter: {limited.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--runaway-connections", type=int, default=30)
+    parser.add_argument("--rps-limit", type=float, default=20)
+    parser.add_argument("--user-rpm", type=float, default=90)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = start_fake_server(PORT, latency=args.latency, token_delay=0.0, rps_limit=args.rps_limit)
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        server.terminate()
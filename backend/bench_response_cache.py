@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Response cache benchmark
+
+Measures generate_response latency on a cache hit (memory and SQLite
+tiers) against a miss that goes to the local fake OpenAI server.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from fake_openai_server import start_fake_server
+
+PORT = 8765
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1"
+# The knowledge base would answer the question before the cache is filled, so nothing would be cached
+os.environ["LOCAL_ANSWER_THRESHOLD"] = "2"
+
+from ai_tutor_service import AITutorService  # noqa: E402
+from response_cache import ResponseCache, SQLiteCacheBackend  # noqa: E402
+
+
+async def time_call(service: AITutorService, message: str) -> float:
+    started = time.perf_counter()
+    await service.generate_response(message, [], user_level="beginner")
+    return time.perf_counter() - started
+
+
+async def main(iterations: int):
+    print("🚀 Response cache benchmark")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        service = AITutorService()
+        service.response_cache = ResponseCache(backend=SQLiteCacheBackend(db_path))
+
+        miss = await time_call(service, "What is photosynthesis?")
+        print(f"miss (upstream call):      {miss * 1000:10.3f} ms")
+
+        hits = [await time_call(service, "  what is PHOTOSYNTHESIS  ") for _ in range(iterations)]
+        print(f"memory hit (mean):         {sum(hits) / len(hits) * 1000:10.3f} ms")
+
+        # A fresh process only has the SQLite tier to go on
+        service.response_cache = ResponseCache(backend=SQLiteCacheBackend(db_path))
+        disk_hit = await time_call(service, "What is photosynthesis?")
+        print(f"SQLite hit after restart:  {disk_hit * 1000:10.3f} ms")
+
+        print(f"stats: {service.response_cache.stats()}")
+        await service.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    server = start_fake_server(PORT, latency=0.2)
+    try:
+        asyncio.run(main(args.iterations))
+    finally:
+        server.terminate()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Semantic cache benchmark on a synthetic question corpus
+
+Fills the cache with questions about generated topics and with
+subtractions, then replays paraphrases of cached questions, questions
+about unseen topics and near-misses (a cached question with another
+question word, or with its operands swapped or its operator changed),
+reporting correct hits, wrong hits, misses and lookup latency.
+"""
+import argparse
+import random
+import time
+
+from semantic_cache import SemanticCache
+
+SYLLABLES = ["pho", "to", "syn", "the", "sis", "mi", "to", "chon", "dri", "on", "de", "ri",
+             "va", "tive", "quan", "tum", "ge", "ne", "tic", "al", "ge", "bra", "ther", "mo",
+             "dy", "na", "mic", "ox", "i", "da", "tion", "mag", "net", "ism", "lo", "ga", "rithm"]
+
+CACHED_TEMPLATES = {
+    "define": "What is {topic}?",
+    "uses": "What are the uses of {topic}?",
+    "examples": "Give me examples of {topic}",
+    "history": "What is the history of {topic}?",
+    "discovered": "When was {topic} discovered?",
+}
+
+PARAPHRASES = {
+    "define": ["Explain {topic}", "what does {topic} mean?", "Can you tell me about {topic}",
+               "define {topic} please", "what's {topic}"],
+    "uses": ["uses of {topic}", "What are {topic} uses?", "tell me the use of {topic}"],
+    "examples": ["examples of {topic}?", "can you give an example of {topic}"],
+    "history": ["history of {topic}", "Explain the history of {topic}"],
+    "discovered": ["when was {topic} discovered", "Can you tell me when {topic} was discovered?"],
+}
+
+# Same terms as a cached question bar one word or their order, but another question
+NEAR_MISSES = ["Why was {topic} discovered?", "Who discovered {topic}?", "Where was {topic} discovered?",
+               "How was {topic} discovered?"]
+
+ARITHMETIC = "What is {a} - {b}?"
+ARITHMETIC_PARAPHRASES = ["what's {a} - {b}", "{a}-{b}?", "Explain {a} - {b}"]
+ARITHMETIC_NEAR_MISSES = ["What is {b} - {a}?", "What is {a} + {b}?", "what's {a} * {b}"]
+OPERANDS = range(1, 31)
+
+LEVELS = ["beginner", "advanced"]
+
+
+def make_topics(count: int, rng: random.Random):
+    topics = set()
+    while len(topics) < count:
+        topics.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 5))))
+    return sorted(topics)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main(entries: int, queries: int, seed: int):
+    rng = random.Random(seed)
+    per_topic = len(CACHED_TEMPLATES) * len(LEVELS)
+    topics = make_topics(entries // per_topic + queries, rng)
+    cached_topics, unseen_topics = topics[:entries // per_topic], topics[entries // per_topic:]
+
+    # Only a > b is cached, so the swapped subtraction is a question the cache has not seen
+    pairs = [(a, b) for a in OPERANDS for b in OPERANDS if a > b]
+    cache = SemanticCache(capacity=len(cached_topics) * per_topic + len(pairs) * len(LEVELS))
+    started = time.perf_counter()
+    for topic in cached_topics:
+        for intent, template in CACHED_TEMPLATES.items():
+            for level in LEVELS:
+                cache.add(template.format(topic=topic), level, None,
+                          {"topic": topic, "intent": intent})
+    for a, b in pairs:
+        for level in LEVELS:
+            cache.add(ARITHMETIC.format(a=a, b=b), level, None, {"answer": a - b})
+    build = time.perf_counter() - started
+
+    correct = wrong = missed = false_hits = near_hits = near_misses = 0
+    latencies = []
+    for _ in range(queries):
+        draw = rng.random()
+        near = False
+        if draw < 0.6:
+            topic, intent = rng.choice(cached_topics), rng.choice(list(PARAPHRASES))
+            question = rng.choice(PARAPHRASES[intent]).format(topic=topic)
+            expected = {"topic": topic, "intent": intent}
+        elif draw < 0.7:
+            a, b = rng.choice(pairs)
+            question = rng.choice(ARITHMETIC_PARAPHRASES).format(a=a, b=b)
+            expected = {"answer": a - b}
+        elif draw < 0.8:
+            question = rng.choice(PARAPHRASES["define"]).format(topic=rng.choice(unseen_topics))
+            expected = None
+        elif draw < 0.9:
+            question, near = rng.choice(NEAR_MISSES).format(topic=rng.choice(cached_topics)), True
+        else:
+            a, b = rng.choice(pairs)
+            question, near = rng.choice(ARITHMETIC_NEAR_MISSES).format(a=a, b=b), True
+
+        started = time.perf_counter()
+        hit = cache.lookup(question, rng.choice(LEVELS), None)
+        latencies.append(time.perf_counter() - started)
+
+        if near:
+            near_misses += 1
+            near_hits += hit is not None
+        elif expected is None:
+            false_hits += hit is not None
+        elif hit is None:
+            missed += 1
+        elif hit == expected:
+            correct += 1
+        else:
+            wrong += 1
+
+    paraphrased = correct + wrong + missed
+    unseen = queries - paraphrased - near_misses
+    print("🚀 Semantic cache benchmark")
+    print("=" * 50)
+    print(f"cached entries:            {cache.size}")
+    print(f"build time:                {build:.2f} s ({build / cache.size * 1e6:.1f} µs/entry)")
+    print(f"paraphrase correct hits:   {correct / paraphrased:.1%}")
+    print(f"paraphrase wrong hits:     {wrong / paraphrased:.1%}")
+    print(f"paraphrase misses:         {missed / paraphrased:.1%}")
+    print(f"unseen-topic false hits:   {false_hits / unseen:.1%}")
+    print(f"near-miss false hits:      {near_hits / near_misses:.1%}")
+    print(f"lookup p50 / p99:          {percentile(latencies, 50) * 1e6:.0f} / "
+          f"{percentile(latencies, 99) * 1e6:.0f} µs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    main(args.entries, args.queries, args.seed)
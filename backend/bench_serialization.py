@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Serialization benchmark: default FastAPI JSON path vs the fast JSON path
+
+Builds the chat route twice on bare FastAPI apps, once the default way
+(stdlib json request parsing, response_model validation, jsonable_encoder)
+and once with FastJSONRoute/FastJSONResponse, and drives both through raw
+ASGI calls with 10-, 50- and 200-message histories. The tutor answer is
+fixed so only request parsing and response serialization are measured.
+
+The fast path is about 1.1-1.4x faster with 10- and 50-message histories.
+At 200 messages pydantic validation of the request dominates, which both
+paths share, and runs range from 0.74x to 1.38x: no reliable gain.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+
+from fastapi import FastAPI  # noqa: E402
+
+import main  # noqa: E402
+from fast_json import FastJSONResponse, FastJSONRoute  # noqa: E402
+from models import TutorRequest, TutorResponse  # noqa: E402
+
+ANSWER = TutorResponse(
+    response=("Photosynthesis turns light, water and carbon dioxide into glucose and oxygen. " * 20).strip(),
+    suggestions=["Would you like to see real-world applications?", "Should we explore the underlying principles?"],
+    subject_detected="biology",
+    confidence=0.9,
+    context_tokens=1800,
+    timestamp=datetime.now()
+)
+
+
+async def fixed_answer(message, conversation_history, subject=None, user_level="beginner", **kwargs):
+    return ANSWER.model_copy()
+
+
+def build_default_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/chat", response_model=TutorResponse)
+    async def chat(request: TutorRequest):
+        return await main.answer_request(request)
+
+    return app
+
+
+def build_fast_app() -> FastAPI:
+    app = FastAPI(default_response_class=FastJSONResponse)
+    app.router.route_class = FastJSONRoute
+
+    @app.post("/chat", response_model=TutorResponse)
+    async def chat(request: TutorRequest):
+        return FastJSONResponse(await main.answer_request(request))
+
+    return app
+
+
+def request_body(history_size: int) -> bytes:
+    history = [
+        {"role": "user" if i % 2 == 0 else "assistant",
+         "content": f"Turn {i}: a question or explanation about plants, light and energy. " * 4}
+        for i in range(history_size)
+    ]
+    return json.dumps({"message": "What happens in the Calvin cycle?", "conversation_history": history,
+                       "user_level": "beginner"}).encode("utf-8")
+
+
+async def call(app: FastAPI, body: bytes):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/chat", "raw_path": b"/chat", "query_string": b"", "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80)
+    }
+    received = False
+    messages = []
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"], b"".join(message.get("body", b"") for message in messages[1:])
+
+
+async def measure(app: FastAPI, body: bytes, requests: int) -> dict:
+    for _ in range(50):
+        await call(app, body)
+    started = time.perf_counter()
+    for _ in range(requests):
+        await call(app, body)
+    elapsed = time.perf_counter() - started
+
+    # Allocation pass, separate because tracing slows everything down
+    tracemalloc.start()
+    peaks = []
+    for _ in range(min(requests, 200)):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await call(app, body)
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+    return {"rps": requests / elapsed, "peak_kb": sum(peaks) / len(peaks) / 1024}
+
+
+async def main_async(sizes, requests):
+    main.ai_tutor.generate_response = fixed_answer
+    default_app, fast_app = build_default_app(), build_fast_app()
+
+    print("⚡ Chat route serialization benchmark (fixed answer, no upstream)")
+    print("=" * 72)
+    print(f"{'history':>8}{'path':>10}{'req/s':>12}{'µs/req':>10}{'peak KB/req':>14}{'speedup':>10}")
+    for size in sizes:
+        body = request_body(size)
+        default_status, default_body = await call(default_app, body)
+        fast_status, fast_body = await call(fast_app, body)
+        assert default_status == fast_status == 200
+        assert json.loads(default_body) == json.loads(fast_body), "fast path changed the response"
+
+        default = await measure(default_app, body, requests)
+        fast = await measure(fast_app, body, requests)
+        for name, result in (("default", default), ("fast", fast)):
+            speedup = f"{result['rps'] / default['rps']:.2f}x" if name == "fast" else ""
+            print(f"{size:>8}{name:>10}{result['rps']:>12.0f}{1e6 / result['rps']:>10.0f}"
+                  f"{result['peak_kb']:>14.1f}{speedup:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10,50,200")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main_async([int(size) for size in args.sizes.split(",")], args.requests))
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Session payload benchmark
+
+Compares the request body a client sends at a given turn when it resends
+the full conversation_history with the body it sends when the server
+keeps the session, plus the Pydantic parse time of each.
+"""
+import argparse
+import json
+import timeit
+
+from models import TutorRequest
+
+QUESTION = "Can you explain how the chain rule works when differentiating nested functions?"
+ANSWER = ("Of course! The chain rule says that the derivative of f(g(x)) is f'(g(x)) * g'(x). "
+          "Think of it as peeling an onion: differentiate the outer layer, keep the inside as it is, "
+          "then multiply by the derivative of the inside. For example, d/dx sin(x^2) = cos(x^2) * 2x. "
+          "Keep practising and you will master it!")
+
+
+def full_history_body(turn: int) -> bytes:
+    history = []
+    for i in range(turn - 1):
+        history.append({"role": "user", "content": f"{QUESTION} ({i})"})
+        history.append({"role": "assistant", "content": ANSWER})
+    return json.dumps({"message": QUESTION, "conversation_history": history,
+                       "user_level": "intermediate"}).encode("utf-8")
+
+
+def session_body() -> bytes:
+    return json.dumps({"message": QUESTION, "session_id": "3f6c1e0a-8b1d-4c55-9a53-2f0e6b7d9c11",
+                       "user_level": "intermediate"}).encode("utf-8")
+
+
+def main(turn: int, number: int):
+    print(f"🚀 Session payload benchmark at turn {turn}")
+    print("=" * 50)
+    for name, body in (("full history", full_history_body(turn)), ("session id", session_body())):
+        parse = timeit.timeit(lambda: TutorRequest.model_validate_json(body), number=number) / number
+        print(f"{name:<14}{len(body):>10,d} bytes {parse * 1e6:>10.1f} µs to parse")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turn", type=int, default=50)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.turn, args.number)
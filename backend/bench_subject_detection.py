@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Subject detection microbenchmark
+
+Compares the previous per-keyword substring scan with the compiled
+SubjectDetector, on the built-in keyword map and on a large synthetic map
+like one loaded through SUBJECT_KEYWORDS_PATH.
+"""
+import argparse
+import os
+import random
+import string
+import timeit
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+
+from ai_tutor_service import AITutorService  # noqa: E402
+from subject_detector import SubjectDetector, merge_subject_keywords  # noqa: E402
+
+MESSAGES = [
+    "Can you help me understand what photosynthesis is?",
+    "How do I solve a quadratic equation with the formula?",
+    "Explain how a database index speeds up queries in Python code",
+    "What caused the fall of the Roman empire in ancient history?",
+    "I need to start my essay about the author of this novel",
+    "How do I start a database?",
+]
+
+
+def substring_scan(subject_keywords, message):
+    """The previous _detect_subject implementation"""
+    message_lower = message.lower()
+    subject_scores = {}
+    for subject, keywords in subject_keywords.items():
+        score = sum(1 for keyword in keywords if keyword in message_lower)
+        if score > 0:
+            subject_scores[subject] = score
+    if subject_scores:
+        return max(subject_scores, key=subject_scores.get)
+    return None
+
+
+def synthetic_keywords(subjects: int, per_subject: int, rng: random.Random):
+    return {
+        f"subject_{i}": ["".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+                         for _ in range(per_subject)]
+        for i in range(subjects)
+    }
+
+
+def report(name, keywords, number):
+    detector = SubjectDetector(keywords)
+    legacy = timeit.timeit(lambda: [substring_scan(keywords, m) for m in MESSAGES], number=number)
+    compiled = timeit.timeit(lambda: [detector.scores(m) for m in MESSAGES], number=number)
+    cached = timeit.timeit(lambda: [detector.detect(m) for m in MESSAGES], number=number)
+    calls = number * len(MESSAGES)
+    keyword_count = sum(len(k) for k in keywords.values())
+    print(f"{name} ({len(keywords)} subjects, {keyword_count} keywords)")
+    print(f"   substring scan:    {legacy / calls * 1e6:10.2f} µs/message")
+    print(f"   compiled matcher:  {compiled / calls * 1e6:10.2f} µs/message")
+    print(f"   compiled + cache:  {cached / calls * 1e6:10.2f} µs/message")
+
+
+def main(number: int):
+    print("🚀 Subject detection benchmark")
+    print("=" * 50)
+    base = AITutorService().subject_keywords
+    report("built-in keywords", base, number)
+    large = merge_subject_keywords(base, synthetic_keywords(40, 100, random.Random(3)))
+    report("with loaded config", large, max(1, number // 10))
+
+    print("\nMatches that changed with whole-word matching:")
+    detector = SubjectDetector(base)
+    for message in MESSAGES:
+        before, after = substring_scan(base, message), detector.detect(message)
+        if before != after:
+            print(f"   {message!r}: {before} -> {after}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.number)
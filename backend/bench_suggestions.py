@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Follow-up suggestion benchmark: canned lists vs the concept-based engine
+
+Builds answers of about --tokens tokens per subject from the shipped
+knowledge base answers and runs them through the previous canned
+suggestion lists and the SuggestionEngine. Reports how many different
+suggestion sets each produces and how many suggestions name something the
+answer actually covers, plus the engine's latency on whole answers and on
+answers streamed in small chunks (total, and the work left when the
+stream ends). Suggestions should take well under 1 ms for a 500-token answer.
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from context_builder import TokenCounter
+from knowledge_base import DEFAULT_KNOWLEDGE_BASE_PATH
+from suggestion_engine import DEFAULT_GRAPH_PATH, SuggestionEngine
+
+# The previous _extract_suggestions
+GENERIC = ["Would you like me to explain this concept differently?", "Do you have any follow-up questions?"]
+CANNED = {
+    "mathematics": ["Would you like to see step-by-step solving examples?", "Should we practice with similar problems?"],
+    "science": ["Would you like to see real-world applications?", "Should we explore the underlying principles?"],
+    "computer_science": ["Would you like to see code examples?", "Should we walk through the algorithm step by step?"],
+}
+
+
+def canned_suggestions(response: str, subject):
+    return list(CANNED.get(subject, GENERIC))
+
+
+def build_answers(tokens: int, seed: int):
+    """(subject, text) answers of about `tokens` tokens, from one subject's knowledge base answers each"""
+    counter = TokenCounter("gpt-3.5-turbo")
+    with open(DEFAULT_KNOWLEDGE_BASE_PATH, encoding="utf-8") as f:
+        entries = json.load(f)["entries"]
+    by_subject = {}
+    for entry in entries:
+        by_subject.setdefault(entry["subject"], []).append(entry["answer"])
+    rng = random.Random(seed)
+    answers = []
+    for subject, pool in by_subject.items():
+        for _ in range(10):
+            parts = []
+            while counter.count(" ".join(parts)) < tokens:
+                parts.append(rng.choice(pool))
+            answers.append((subject, " ".join(parts)))
+    return answers, counter
+
+
+def names_answer_concept(suggestion: str, engine: SuggestionEngine, text: str) -> bool:
+    """The suggestion names a graph concept or keyphrase that appears in the answer"""
+    extractor = engine.extractor(None)
+    extractor.feed(text)
+    extractor.suggestions()
+    mentioned = [engine.concepts[index].name for index in extractor.ranked()]
+    keyphrase = extractor._keyphrase()
+    return any(name in suggestion for name in mentioned) or bool(keyphrase and keyphrase in suggestion)
+
+
+def timed(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2] * 1e6, samples[int(len(samples) * 0.99)] * 1e6, statistics.mean(samples) * 1e6
+
+
+def main(tokens: int, rounds: int, chunk: int, seed: int):
+    engine = SuggestionEngine.load(DEFAULT_GRAPH_PATH)
+    answers, counter = build_answers(tokens, seed)
+    mean_tokens = statistics.mean(counter.count(text) for _, text in answers)
+
+    print(f"💡 Suggestion benchmark: {len(answers)} answers of ~{mean_tokens:.0f} tokens, "
+          f"{len(engine.concepts)} concepts in the graph")
+    print("=" * 72)
+    print(f"{'suggester':<12}{'distinct sets':>15}{'specific':>12}{'per answer':>12}")
+    for name, suggest in (("canned", canned_suggestions), ("engine", engine.suggest)):
+        produced = [suggest(text, subject) for subject, text in answers]
+        distinct = len({tuple(suggestions) for suggestions in produced})
+        specific = sum(names_answer_concept(suggestion, engine, text)
+                       for (_, text), suggestions in zip(answers, produced) for suggestion in suggestions)
+        total = sum(len(suggestions) for suggestions in produced)
+        print(f"{name:<12}{distinct:>15}{specific / total:>12.0%}{total / len(produced):>12.1f}")
+
+    whole, streamed, tail = [], [], []
+    for _ in range(rounds):
+        for subject, text in answers:
+            began = time.perf_counter()
+            engine.suggest(text, subject)
+            whole.append(time.perf_counter() - began)
+
+            extractor = engine.extractor(subject)
+            chunks = [text[i:i + chunk] for i in range(0, len(text), chunk)]
+            began = time.perf_counter()
+            for piece in chunks:
+                extractor.feed(piece)
+            finishing = time.perf_counter()
+            extractor.suggestions()
+            streamed.append(time.perf_counter() - began)
+            tail.append(time.perf_counter() - finishing)
+
+    print()
+    print(f"{'engine latency':<28}{'p50 µs':>10}{'p99 µs':>10}{'mean µs':>10}")
+    for name, samples in ((f"whole answer", whole), (f"streamed, {chunk}-char chunks", streamed),
+                          ("left after the last chunk", tail)):
+        p50, p99, mean = timed(samples)
+        print(f"{name:<28}{p50:>10.1f}{p99:>10.1f}{mean:>10.1f}")
+    print()
+    p50, p99, _ = timed(whole)
+    print(f"{'✅' if p99 < 1000 else '❌'} p99 {p99:.0f} µs for ~{mean_tokens:.0f}-token answers (target: under 1 ms)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=500, help="answer length in tokens")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--chunk", type=int, default=4, help="characters per streamed chunk")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    main(args.tokens, args.rounds, args.chunk, args.seed)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Transcript persistence benchmark: inline writes vs the write-behind queue
+
+Produces tutor exchanges at a steady rate on the event loop, as chat
+handlers would, and measures what persisting each one costs the handler.
+Inline, every exchange is inserted and committed to SQLite before the
+handler returns. Write-behind, the handler only queues the record and
+TranscriptLog writes batches to SQLite or a JSON lines file on its writer
+thread. Also reports records dropped on overflow and the time to write
+out what is still queued at shutdown.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from transcript_log import SQLiteTranscriptSink, TranscriptLog, open_sink
+
+RESPONSE = ("Photosynthesis turns light energy into chemical energy. Plants take in carbon dioxide "
+            "and water and, using sunlight absorbed by chlorophyll, make glucose and release oxygen. ") * 4
+
+
+def make_record(index: int) -> dict:
+    return {
+        "created_at": "2026-01-01T12:00:00", "session_id": f"session-{index % 500}",
+        "client": f"user:{index % 2000}", "subject": "biology", "user_level": "intermediate",
+        "route": "standard", "message": f"How does photosynthesis work? (#{index})",
+        "response": RESPONSE, "context_tokens": 420, "confidence": 0.8
+    }
+
+
+async def produce(persist, rate: int, seconds: float) -> list:
+    """Persist `rate` records a second in 10 ms ticks; returns the per-record handler cost"""
+    costs, index = [], 0
+    per_tick = max(1, rate // 100)
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    while loop.time() - started < seconds:
+        tick = loop.time()
+        for _ in range(per_tick):
+            began = time.perf_counter()
+            await persist(make_record(index))
+            costs.append(time.perf_counter() - began)
+            index += 1
+        await asyncio.sleep(max(0.0, 0.01 - (loop.time() - tick)))
+    return costs
+
+
+async def run_inline(path: str, rate: int, seconds: float) -> dict:
+    sink = SQLiteTranscriptSink(path)
+
+    async def persist(record):
+        sink.write([record])
+
+    costs = await produce(persist, rate, seconds)
+    sink.close()
+    return {"costs": costs, "dropped": 0, "shutdown": 0.0}
+
+
+async def run_write_behind(path: str, rate: int, seconds: float, queue_size: int, overflow: str) -> dict:
+    log = TranscriptLog(open_sink(path), max_queue=queue_size, overflow=overflow)
+    log.start()
+    costs = await produce(log.put, rate, seconds)
+    began = time.perf_counter()
+    await log.close()
+    return {"costs": costs, "dropped": log.dropped, "shutdown": time.perf_counter() - began}
+
+
+def quantile(samples: list, q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def main(rate: int, seconds: float, queue_size: int, overflow: str):
+    print(f"🗄️ Transcript persistence benchmark: {rate} exchanges/s for {seconds:.0f}s")
+    print("=" * 84)
+    print(f"{'mode':<26}{'records':>9}{'p50 µs':>10}{'p99 µs':>10}{'max µs':>10}{'dropped':>9}{'shutdown':>10}")
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        runs = (
+            ("inline SQLite commit", run_inline(os.path.join(directory, "inline.db"), rate, seconds)),
+            ("write-behind SQLite", run_write_behind(os.path.join(directory, "queued.db"), rate, seconds,
+                                                     queue_size, overflow)),
+            ("write-behind JSONL", run_write_behind(os.path.join(directory, "queued.jsonl"), rate, seconds,
+                                                    queue_size, overflow)),
+        )
+        for name, run in runs:
+            result = results[name] = await run
+            costs = result["costs"]
+            print(f"{name:<26}{len(costs):>9}{quantile(costs, 0.5) * 1e6:>10.1f}{quantile(costs, 0.99) * 1e6:>10.1f}"
+                  f"{max(costs) * 1e6:>10.1f}{result['dropped']:>9}{result['shutdown'] * 1000:>8.0f}ms")
+
+    inline = statistics.mean(results["inline SQLite commit"]["costs"])
+    queued = statistics.mean(results["write-behind SQLite"]["costs"])
+    print()
+    print(f"⚡ Mean handler cost {inline * 1e6:.1f} µs inline -> {queued * 1e6:.1f} µs write-behind "
+          f"({inline / queued:.0f}x less)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=int, default=5000, help="exchanges per second")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--overflow", default="drop_newest", choices=["drop_newest", "drop_oldest", "block"])
+    args = parser.parse_args()
+    asyncio.run(main(args.rate, args.seconds, args.queue_size, args.overflow))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+WebSocket benchmark: per-turn overhead and connections held, vs the HTTP path
+
+Starts the local fake OpenAI server (answering almost instantly, so the
+numbers are the backend's own overhead) and one backend worker under
+uvicorn. One student then asks --turns questions in a row, with a
+server-side session, three ways, once with questions the local knowledge
+base answers (only the transport and the tutor's own work, no upstream
+call) and once with questions that go to the model:
+
+  HTTP, warm        POST /api/tutor/chat/stream on a kept-alive connection
+                    (the browser's CORS preflight still cached)
+  HTTP, cold        a new connection, an OPTIONS preflight and the POST:
+                    every turn once the student thinks longer than the
+                    keep-alive timeout (5 s in uvicorn) between questions
+  WebSocket         an ask frame on the open /ws/tutor connection
+
+Reports time to first token and to the full answer, bytes the client sends
+per turn (our minimal headers: browsers add several hundred more) and the
+worker's CPU time per turn. Then opens --connections idle connections of
+each kind to the same worker and reports its memory per connection, how
+many are still open after the keep-alive timeout, and how fast a question
+is answered while they are held. The worker runs with permessage-deflate
+off, as serve.py does; --deflate turns it on.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import statistics
+import time
+
+import httpx
+import websockets
+
+os.environ.update(RESPONSE_CACHE_SIZE="0", SEMANTIC_CACHE_SIZE="0", WARMUP_CONNECTIONS="0",
+                  WS_MAX_CONNECTIONS="100000")
+
+from fake_openai_server import start_fake_server  # noqa: E402
+from knowledge_base import DEFAULT_KNOWLEDGE_BASE_PATH  # noqa: E402
+from loadtest import QUESTIONS, free_port, percentile, start_backend  # noqa: E402
+
+ORIGIN = "http://localhost:4200"
+KEEP_ALIVE_TIMEOUT = 5
+
+
+def worker_cpu(pid: int) -> float:
+    """User plus system CPU seconds of a process (Linux /proc)"""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def worker_rss(pid: int) -> int:
+    """Resident memory of a process in bytes (Linux /proc)"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def request_bytes(request: httpx.Request) -> int:
+    line = len(request.method) + len(request.url.raw_path) + 12
+    return line + sum(len(name) + len(value) + 4 for name, value in request.headers.raw) + 2 + len(request.content)
+
+
+with open(DEFAULT_KNOWLEDGE_BASE_PATH, encoding="utf-8") as f:
+    LOCAL_QUESTIONS = [entry["question"] for entry in json.load(f)["entries"]]
+
+
+def question(run: str, turn: int, local: bool) -> str:
+    if local:
+        return LOCAL_QUESTIONS[turn % len(LOCAL_QUESTIONS)]
+    # Unique per turn, so no cache or coalescing answers for the server
+    return f"{QUESTIONS[turn % len(QUESTIONS)]} ({run} turn {turn})"
+
+
+async def http_turn(client: httpx.AsyncClient, base: str, session_id: str, message: str, preflight: bool):
+    sent = 0
+    if preflight:
+        options = client.build_request("OPTIONS", f"{base}/api/tutor/chat/stream", headers={
+            "Origin": ORIGIN, "Access-Control-Request-Method": "POST",
+            "Access-Control-Request-Headers": "content-type"})
+        sent += request_bytes(options)
+        (await client.send(options)).raise_for_status()
+    request = client.build_request("POST", f"{base}/api/tutor/chat/stream", headers={"Origin": ORIGIN},
+                                   json={"message": message, "session_id": session_id, "user_level": "intermediate"})
+    sent += request_bytes(request)
+    started, first = time.perf_counter(), None
+    response = await client.send(request, stream=True)
+    async for line in response.aiter_lines():
+        if first is None and line.startswith("event: token"):
+            first = time.perf_counter() - started
+        if line.startswith("event: done"):
+            break
+    await response.aclose()
+    return first, time.perf_counter() - started, sent
+
+
+async def run_http(base: str, turns: int, cold: bool, local: bool) -> dict:
+    run = f"{'cold' if cold else 'warm'}-{'local' if local else 'model'}"
+    samples = []
+    client = httpx.AsyncClient(timeout=30)
+    try:
+        for turn in range(turns):
+            if cold:
+                # What the browser faces after the keep-alive timeout: new connection, preflight again
+                await client.aclose()
+                client = httpx.AsyncClient(timeout=30)
+            samples.append(await http_turn(client, base, f"bench-http-{run}", question(run, turn, local),
+                                           preflight=cold or turn == 0))
+    finally:
+        await client.aclose()
+    return {"samples": samples}
+
+
+async def run_socket(port: int, turns: int, session_id: str, local: bool = False) -> dict:
+    samples = []
+    uri = f"ws://127.0.0.1:{port}/ws/tutor?session_id={session_id}&user_level=intermediate"
+    async with websockets.connect(uri, origin=ORIGIN, ping_interval=None) as socket:
+        await socket.recv()
+        for turn in range(turns):
+            frame = json.dumps({"type": "ask", "id": str(turn), "message": question(session_id, turn, local)})
+            started, first = time.perf_counter(), None
+            await socket.send(frame)
+            while True:
+                reply = json.loads(await socket.recv())
+                if first is None and reply["type"] == "token":
+                    first = time.perf_counter() - started
+                if reply["type"] in ("done", "error"):
+                    break
+            # A text frame is the payload plus a 6-14 byte header (client frames are masked)
+            samples.append((first, time.perf_counter() - started, len(frame.encode("utf-8")) + 8))
+    return {"samples": samples}
+
+
+async def hold_http(base: str, count: int) -> list:
+    """Idle keep-alive connections, each opened by one request"""
+    clients = [httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_keepalive_connections=1)) for _ in range(count)]
+    await asyncio.gather(*(client.get(f"{base}/health/live") for client in clients))
+    return clients
+
+
+async def hold_sockets(port: int, count: int) -> list:
+    async def connect():
+        socket = await websockets.connect(f"ws://127.0.0.1:{port}/ws/tutor", origin=ORIGIN, ping_interval=None)
+        await socket.recv()
+        return socket
+    sockets = []
+    # In waves, so the listen backlog is not overrun
+    for start in range(0, count, 200):
+        sockets += await asyncio.gather(*(connect() for _ in range(min(200, count - start))))
+    return sockets
+
+
+def open_connections(port: int) -> int:
+    """Established TCP connections to the backend port (Linux /proc/net/tcp)"""
+    hex_port = f":{port:04X}"
+    established = 0
+    with open("/proc/net/tcp") as f:
+        for line in f.readlines()[1:]:
+            fields = line.split()
+            if fields[1].endswith(hex_port) and fields[3] == "01":
+                established += 1
+    return established
+
+
+async def main(turns: int, connections: int, backend, port: int):
+    base = f"http://127.0.0.1:{port}"
+    pid = backend.pid
+    print(f"🔌 WebSocket benchmark: {turns} turns per conversation, {connections} idle connections held")
+    print("=" * 90)
+    results = {}
+    for local in (True, False):
+        print(f"{'local answers' if local else 'model answers':<16}{'TTFT p50':>10}{'TTFT p95':>10}{'turn p50':>10}"
+              f"{'turn p95':>10}{'bytes/turn':>12}{'CPU ms/turn':>13}")
+        runs = (("HTTP, warm", lambda: run_http(base, turns, cold=False, local=local)),
+                ("HTTP, cold", lambda: run_http(base, turns, cold=True, local=local)),
+                ("WebSocket", lambda: run_socket(port, turns, f"bench-socket-{local}", local)))
+        for name, run in runs:
+            cpu = worker_cpu(pid)
+            samples = (await run())["samples"]
+            cpu = (worker_cpu(pid) - cpu) / turns
+            firsts = [first for first, _, _ in samples]
+            totals = [total for _, total, _ in samples]
+            results[name, local] = {"turn": statistics.median(totals), "cpu": cpu}
+            print(f"  {name:<14}{percentile(firsts, 0.5) * 1000:>8.1f}ms{percentile(firsts, 0.95) * 1000:>8.1f}ms"
+                  f"{percentile(totals, 0.5) * 1000:>8.1f}ms{percentile(totals, 0.95) * 1000:>8.1f}ms"
+                  f"{statistics.mean(sent for _, _, sent in samples):>12.0f}{cpu * 1000:>13.2f}")
+        print()
+
+    print(f"{'held connections':<18}{'KB each':>10}{'open after idle':>18}{'turn p50 while held':>22}")
+    for name, hold in (("HTTP keep-alive", lambda: hold_http(base, connections)),
+                       ("WebSocket", lambda: hold_sockets(port, connections))):
+        rss = worker_rss(pid)
+        held = await hold()
+        per_connection = (worker_rss(pid) - rss) / connections / 1024
+        await asyncio.sleep(KEEP_ALIVE_TIMEOUT + 1)
+        still_open = open_connections(port)
+        probe = (await run_socket(port, 5, f"bench-probe-{name.split()[0].lower()}"))["samples"]
+        print(f"{name:<18}{per_connection:>10.1f}{still_open:>12}/{connections:<5}"
+              f"{statistics.median(total for _, total, _ in probe) * 1000:>20.1f}ms")
+        for connection in held:
+            await (connection.aclose() if isinstance(connection, httpx.AsyncClient) else connection.close())
+
+    warm, cold, socket = (results[name, True] for name in ("HTTP, warm", "HTTP, cold", "WebSocket"))
+    print()
+    print(f"⏱️ local-answer turn p50 {warm['turn'] * 1000:.1f}ms warm HTTP / {cold['turn'] * 1000:.1f}ms cold HTTP -> "
+          f"{socket['turn'] * 1000:.1f}ms WebSocket")
+    print(f"🧮 worker CPU per local-answer turn {warm['cpu'] * 1000:.2f}ms / {cold['cpu'] * 1000:.2f}ms -> "
+          f"{socket['cpu'] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--connections", type=int, default=2000, help="idle connections held per transport")
+    parser.add_argument("--deflate", action="store_true", help="let WebSockets negotiate permessage-deflate")
+    args = parser.parse_args()
+
+    # Each held connection is a file descriptor here and in the worker
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (min(hard, max(soft, 2 * args.connections + 1024)), hard))
+
+    upstream_port, backend_port = free_port(), free_port()
+    fake = start_fake_server(upstream_port, latency=0.0, token_delay=0.0)
+    backend = start_backend(backend_port, upstream_port, workers=1, keep_limits=False,
+                            options=["--ws-per-message-deflate", "true" if args.deflate else "false"])
+    try:
+        asyncio.run(main(args.turns, args.connections, backend, backend_port))
+    finally:
+        backend.terminate()
+        fake.terminate()
@@ -0,0 +1,107 @@
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "catalog.json")
+
+
+@dataclass(frozen=True)
+class CatalogDocument:
+    """One endpoint's response, serialized once with its strong ETag"""
+    body: bytes
+    etag: str
+
+
+def _document(payload) -> CatalogDocument:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return CatalogDocument(body=body, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+class Catalog:
+    """
+    Subjects and study tips loaded from a JSON data file.
+
+    Each endpoint body is serialized to bytes once per load, so serving it is
+    a dictionary lookup. The file's mtime and size are checked at most every
+    `reload_interval` seconds on access and the catalog is reloaded when they
+    change; a file that fails to parse leaves the previous catalog in place.
+    Listeners are called with the catalog after every successful load.
+    """
+
+    def __init__(self, path: str = DEFAULT_CATALOG_PATH, reload_interval: float = 2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.listeners: List[Callable[["Catalog"], None]] = []
+        self.documents: Dict[str, CatalogDocument] = {}
+        self.subject_keywords: Dict[str, List[str]] = {}
+        self.loaded_at = 0.0
+        self._signature = None
+        self._checked_at = 0.0
+        self.reload()
+
+    @classmethod
+    def from_env(cls) -> "Catalog":
+        return cls(
+            path=os.getenv("CATALOG_PATH") or DEFAULT_CATALOG_PATH,
+            reload_interval=float(os.getenv("CATALOG_RELOAD_INTERVAL", 2))
+        )
+
+    def _file_signature(self):
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self) -> bool:
+        """Load the data file; returns False (keeping the old catalog) if it is unreadable"""
+        signature = None
+        try:
+            signature = self._file_signature()
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            subjects = data["subjects"]
+            study_tips = data["study_tips"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if not self.documents:
+                raise
+            print(f"⚠️ Catalog reload failed, keeping the previous one: {e}")
+            # Try again only once the file changes again
+            self._signature = signature or self._signature
+            return False
+
+        # The UI gets everything but the detection keywords
+        public_subjects = {
+            key: {field: value for field, value in subject.items() if field != "keywords"}
+            for key, subject in subjects.items()
+        }
+        self.documents = {
+            "subjects": _document({"subjects": public_subjects}),
+            "study_tips": _document({"tips": study_tips})
+        }
+        self.subject_keywords = {key: list(subject.get("keywords", [])) for key, subject in subjects.items()}
+        self._signature = signature
+        self.loaded_at = time.time()
+        for listener in self.listeners:
+            listener(self)
+        return True
+
+    def add_listener(self, listener: Callable[["Catalog"], None]):
+        self.listeners.append(listener)
+
+    def check_for_changes(self):
+        """Reload if the data file changed since it was last read"""
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+        try:
+            changed = self._file_signature() != self._signature
+        except OSError:
+            return
+        if changed:
+            self.reload()
+
+    def document(self, name: str) -> Optional[CatalogDocument]:
+        self.check_for_changes()
+        return self.documents.get(name)
@@ -0,0 +1,112 @@
+import os
+import random
+import time
+from collections import deque
+from typing import Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Failure-rate and slow-call circuit breaker for the upstream model.
+
+    Outcomes of the last `window` calls are kept. Once at least `min_calls`
+    are recorded and either the failure rate or the slow-call rate reaches
+    its threshold, the breaker opens and calls are rejected outright for
+    `open_seconds`. It then lets `half_open_probes` calls through: a healthy
+    probe closes it again, a failed one reopens it.
+    """
+
+    def __init__(self, window: int = 20, min_calls: int = 10, failure_rate: float = 0.5,
+                 slow_call_seconds: float = 10.0, slow_call_rate: float = 0.5,
+                 open_seconds: float = 30.0, half_open_probes: int = 1, clock=time.monotonic):
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.clock = clock
+
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.outcomes = deque(maxlen=window)  # (failed, slow)
+        self.times_opened = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            window=int(os.getenv("BREAKER_WINDOW", 20)),
+            min_calls=int(os.getenv("BREAKER_MIN_CALLS", 10)),
+            failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", 0.5)),
+            slow_call_seconds=float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 10)),
+            slow_call_rate=float(os.getenv("BREAKER_SLOW_CALL_RATE", 0.5)),
+            open_seconds=float(os.getenv("BREAKER_OPEN_SECONDS", 30)),
+            half_open_probes=int(os.getenv("BREAKER_HALF_OPEN_PROBES", 1))
+        )
+
+    def acquire(self) -> Optional[str]:
+        """Admit a call: returns the state it was admitted in, or None if rejected"""
+        if self.state == OPEN:
+            if self.clock() - self.opened_at < self.open_seconds:
+                return None
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+        if self.state == HALF_OPEN:
+            if self.probes_in_flight >= self.half_open_probes:
+                return None
+            self.probes_in_flight += 1
+            return HALF_OPEN
+        return CLOSED
+
+    def record(self, permit: str, success: Optional[bool], duration: float):
+        """Report a call's outcome; success=None releases the permit without judging upstream health"""
+        slow = duration >= self.slow_call_seconds
+        if permit == HALF_OPEN:
+            self.probes_in_flight = max(0, self.probes_in_flight - 1)
+            if self.state != HALF_OPEN or success is None:
+                return
+            if success and not slow:
+                self.state = CLOSED
+                self.outcomes.clear()
+            else:
+                self._trip()
+            return
+
+        if success is None or self.state != CLOSED:
+            return
+        self.outcomes.append((not success, slow))
+        if len(self.outcomes) < self.min_calls:
+            return
+        failures = sum(1 for failed, _ in self.outcomes if failed)
+        slow_calls = sum(1 for _, was_slow in self.outcomes if was_slow)
+        if (failures / len(self.outcomes) >= self.failure_rate
+                or slow_calls / len(self.outcomes) >= self.slow_call_rate):
+            self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = self.clock()
+        self.outcomes.clear()
+        self.times_opened += 1
+
+    def snapshot(self) -> Dict:
+        failures = sum(1 for failed, _ in self.outcomes if failed)
+        return {
+            "state": self.state,
+            "recent_calls": len(self.outcomes),
+            "recent_failures": failures,
+            "times_opened": self.times_opened,
+            "retry_in_seconds": round(max(0.0, self.opened_at + self.open_seconds - self.clock()), 1)
+            if self.state == OPEN else 0.0
+        }
+
+
+def backoff_delay(attempt: int, base: float = 0.25, cap: float = 2.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,344 @@
+import os
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from fast_json import dumps
+
+try:
+    import brotli
+except ImportError:  # optional: br is not offered without it
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is not offered without it
+    zstandard = None
+
+# Server preference when the client accepts several equally
+DEFAULT_ENCODINGS = ("zstd", "br", "gzip")
+# Streams are flushed after every event, where gzip's small sync-flush marker beats
+# zstd's block header and brotli's per-flush CPU (see bench_compression.py)
+DEFAULT_STREAM_ENCODINGS = ("gzip", "zstd", "br")
+# Request bodies can be decoded with a bound on their decompressed size; the
+# brotli binding cannot stop part way through its output, so br is response-only
+REQUEST_ENCODINGS = ("gzip", "x-gzip", "deflate", "zstd")
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Response encodings this process can produce"""
+    modules = {"zstd": zstandard, "br": brotli, "gzip": zlib}
+    return tuple(name for name in DEFAULT_ENCODINGS if modules[name] is not None)
+
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}; a coding listed with q=0 is refused"""
+    preferences = {}
+    for part in header.split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        preferences[coding] = q
+    return preferences
+
+
+def is_compressible(content_type: str) -> bool:
+    content_type = content_type.split(";", 1)[0].strip().lower()
+    return (content_type.startswith("text/") or content_type.endswith("json") or content_type.endswith("+xml")
+            or content_type in ("application/javascript", "application/xml"))
+
+
+class _Encoder:
+    """One response's compressor: compress() buffers, flush() ends a chunk, finish() ends the stream"""
+
+    def __init__(self, encoding: str, settings: "Compression"):
+        if encoding == "gzip":
+            self._zlib = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31)
+        elif encoding == "br":
+            self._brotli = brotli.Compressor(mode=brotli.MODE_TEXT, quality=settings.brotli_quality)
+        else:
+            self._zstd = zstandard.ZstdCompressor(level=settings.zstd_level).compressobj()
+        self.encoding = encoding
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "gzip":
+            return self._zlib.compress(data)
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zstd.compress(data)
+
+    def flush(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+        if self.encoding == "br":
+            return self._brotli.flush()
+        return self._zstd.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        if self.encoding == "gzip":
+            return self._zlib.flush()
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zstd.flush()
+
+
+class RequestBodyError(Exception):
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def decode_body(body: bytes, encoding: str, limit: int) -> bytes:
+    """Decompress a request body, refusing (413) to produce more than `limit` bytes"""
+    too_large = RequestBodyError(413, f"Decompressed request body exceeds {limit} bytes")
+    try:
+        if encoding == "zstd":
+            if zstandard is None:
+                raise RequestBodyError(415, "zstd request bodies are not supported")
+            out = bytearray()
+            with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+                while True:
+                    chunk = reader.read(limit + 1 - len(out))
+                    if not chunk:
+                        break
+                    out += chunk
+                    if len(out) > limit:
+                        raise too_large
+            return bytes(out)
+        # gzip, or deflate as the zlib format of RFC 9110
+        decompressor = zlib.decompressobj(31 if encoding in ("gzip", "x-gzip") else 15)
+        out = bytearray()
+        data = body
+        while data and not decompressor.eof:
+            # Inflate at most one byte past the limit, however small the input
+            out += decompressor.decompress(data, limit + 1 - len(out))
+            if len(out) > limit:
+                raise too_large
+            data = decompressor.unconsumed_tail
+        if not decompressor.eof:
+            raise RequestBodyError(400, f"Truncated {encoding} request body")
+        return bytes(out)
+    except (zlib.error, getattr(zstandard, "ZstdError", zlib.error)) as e:
+        raise RequestBodyError(400, f"Invalid {encoding} request body: {e}")
+
+
+class Compression:
+    """
+    Negotiated compression settings and counters, shared by every request.
+
+    Responses are compressed with the first coding in `encodings` the
+    client accepts (br and zstd only when brotli and zstandard are
+    installed), unless they are smaller than `min_size` bytes, where the
+    saving is a few packets at most and not worth the CPU. Streamed
+    responses, SSE above all, are compressed as they go with the first
+    accepted coding in `stream_encodings` and flushed after every chunk,
+    so an event reaches the browser as soon as it is written.
+
+    Request bodies sent with Content-Encoding gzip, deflate or zstd are
+    decompressed before the route sees them, refusing with 413 any body
+    whose compressed or decompressed size is over `max_request_bytes`.
+    """
+
+    def __init__(self, min_size: int = 1024, max_request_bytes: int = 1024 * 1024,
+                 encodings: Optional[List[str]] = None, stream_encodings: Optional[List[str]] = None,
+                 gzip_level: int = 6, brotli_quality: int = 4, zstd_level: int = 3):
+        available = available_encodings()
+        self.encodings = tuple(name for name in (encodings or available) if name in available)
+        self.stream_encodings = tuple(name for name in (stream_encodings or DEFAULT_STREAM_ENCODINGS)
+                                      if name in self.encodings)
+        self.min_size = min_size
+        self.max_request_bytes = max_request_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.zstd_level = zstd_level
+        # Response body bytes before and after compression, by coding
+        self.bytes_in: Dict[str, int] = {name: 0 for name in self.encodings}
+        self.bytes_out: Dict[str, int] = {name: 0 for name in self.encodings}
+        self.responses = {"compressed": 0, "below_min_size": 0, "not_accepted": 0}
+        self.requests: Dict[str, int] = {"decoded": 0, "too_large": 0, "unsupported": 0, "invalid": 0}
+
+    @classmethod
+    def from_env(cls) -> "Compression":
+        def codings(name: str) -> Optional[List[str]]:
+            return [coding.strip() for coding in os.getenv(name, "").split(",") if coding.strip()] or None
+
+        return cls(
+            min_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+            max_request_bytes=int(os.getenv("COMPRESSION_MAX_REQUEST_BYTES", 1024 * 1024)),
+            encodings=codings("COMPRESSION_ENCODINGS"),
+            stream_encodings=codings("COMPRESSION_STREAM_ENCODINGS"),
+            gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", 6)),
+            brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4)),
+            zstd_level=int(os.getenv("COMPRESSION_ZSTD_LEVEL", 3))
+        )
+
+    def negotiate(self, accept_encoding: str, streaming: bool = False) -> Optional[str]:
+        """The coding to answer with, or None for identity"""
+        if not accept_encoding or not self.encodings:
+            return None
+        preferences = parse_accept_encoding(accept_encoding)
+        wildcard = preferences.get("*", 0.0)
+        best, best_q = None, 0.0
+        # Highest q wins; among equal q, the first in server order
+        for name in self.stream_encodings if streaming else self.encodings:
+            q = preferences.get(name, wildcard)
+            if q > best_q:
+                best, best_q = name, q
+        return best
+
+    def encoder(self, encoding: str) -> _Encoder:
+        return _Encoder(encoding, self)
+
+    def stats(self) -> Dict:
+        sent = sum(self.bytes_out.values())
+        raw = sum(self.bytes_in.values())
+        return {
+            "encodings": list(self.encodings),
+            "responses": dict(self.responses),
+            "bytes_in": dict(self.bytes_in),
+            "bytes_out": dict(self.bytes_out),
+            "ratio": sent / raw if raw else 1.0,
+            "requests": dict(self.requests)
+        }
+
+
+class CompressionMiddleware:
+    """ASGI middleware decoding compressed request bodies and compressing responses"""
+
+    def __init__(self, app, compression: Compression):
+        self.app = app
+        self.compression = compression
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding", "").strip().lower()
+        if content_encoding and content_encoding != "identity":
+            try:
+                scope, receive = await self._decode_request(scope, receive, content_encoding)
+            except RequestBodyError as e:
+                await self._reject(send, e)
+                return
+
+        await self.app(scope, receive, self._compressing_send(send, headers.get("accept-encoding", "")))
+
+    async def _decode_request(self, scope, receive, encoding: str):
+        compression = self.compression
+        if encoding not in REQUEST_ENCODINGS:
+            compression.requests["unsupported"] += 1
+            raise RequestBodyError(415, f"Unsupported Content-Encoding: {encoding}")
+        body = bytearray()
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                break
+            body += message.get("body", b"")
+            if len(body) > compression.max_request_bytes:
+                compression.requests["too_large"] += 1
+                raise RequestBodyError(413, f"Request body exceeds {compression.max_request_bytes} bytes")
+            if not message.get("more_body", False):
+                break
+        try:
+            decoded = decode_body(bytes(body), encoding, compression.max_request_bytes)
+        except RequestBodyError as e:
+            compression.requests["too_large" if e.status == 413 else
+                                 "unsupported" if e.status == 415 else "invalid"] += 1
+            raise
+        compression.requests["decoded"] += 1
+
+        raw_headers = [(name, value) for name, value in scope["headers"]
+                       if name not in (b"content-encoding", b"content-length")]
+        raw_headers.append((b"content-length", str(len(decoded)).encode("latin-1")))
+        pending = [{"type": "http.request", "body": decoded, "more_body": False}]
+
+        async def receive_decoded():
+            # The decoded body once, then whatever the server sends next (a disconnect)
+            return pending.pop() if pending else await receive()
+
+        return {**scope, "headers": raw_headers}, receive_decoded
+
+    async def _reject(self, send, error: RequestBodyError):
+        body = dumps({"detail": error.detail})
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))]
+        if error.status == 415:
+            # RFC 7694: the codings this server does accept
+            headers.append((b"accept-encoding", ", ".join(REQUEST_ENCODINGS).encode("latin-1")))
+        await send({"type": "http.response.start", "status": error.status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _compressing_send(self, send, accept_encoding: str):
+        compression = self.compression
+        start: Optional[dict] = None
+        encoding: Optional[str] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, encoding, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Held until the first body chunk shows whether the response is worth compressing
+                start = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is None:
+                headers = MutableHeaders(raw=list(start.get("headers", [])))
+                compressible = (start["status"] not in (204, 206, 304)
+                                and "content-encoding" not in headers
+                                and "no-transform" not in headers.get("cache-control", "")
+                                and is_compressible(headers.get("content-type", "")))
+                if compressible:
+                    encoding = compression.negotiate(accept_encoding, streaming=more_body)
+                    # Caches must not serve one client's encoding to another
+                    headers.add_vary_header("Accept-Encoding")
+                    if encoding is None:
+                        compression.responses["not_accepted"] += 1
+                    elif not more_body and len(body) < compression.min_size:
+                        compression.responses["below_min_size"] += 1
+                if not compressible or encoding is None or (not more_body and len(body) < compression.min_size):
+                    passthrough = True
+                    await send({**start, "headers": headers.raw})
+                    await send(message)
+                    return
+
+                encoder = compression.encoder(encoding)
+                compression.responses["compressed"] += 1
+                headers["Content-Encoding"] = encoding
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # Still the same document, but no longer byte-identical to the uncompressed one
+                    headers["ETag"] = "W/" + etag
+                if "content-length" in headers:
+                    del headers["content-length"]
+                if not more_body:
+                    data = encoder.compress(body) + encoder.finish()
+                    headers["Content-Length"] = str(len(data))
+                else:
+                    data = encoder.compress(body) + encoder.flush()
+                await send({**start, "headers": headers.raw})
+            else:
+                # Flushed per chunk: each SSE event goes out as soon as it is written
+                data = encoder.compress(body) + (encoder.flush() if more_body else encoder.finish())
+            compression.bytes_in[encoding] += len(body)
+            compression.bytes_out[encoding] += len(data)
+            await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        return send_compressed
@@ -0,0 +1,95 @@
+import json
+import math
+import os
+import zlib
+from typing import List, Sequence
+
+import numpy as np
+
+from subject_detector import message_words
+
+DEFAULT_TRAINING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "content_filter_training.json")
+
+# Below even odds: a blocked real question costs more than one wasted upstream call
+DEFAULT_THRESHOLD = 0.3
+
+
+def feature_ids(words: Sequence[str], dim: int) -> List[int]:
+    """Hashed ids of the word unigrams and bigrams, without repeats"""
+    grams = list(words)
+    grams.extend(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return list({zlib.crc32(gram.encode("utf-8")) % dim for gram in grams})
+
+
+class ContentFilter:
+    """
+    Hashed n-gram logistic regression deciding whether a message is educational.
+
+    Word unigrams and bigrams are hashed into `dim` weights and each message
+    is a binary, L2-normalized feature vector, so scoring is a sum over the
+    message's own features; no vocabulary is kept. Bigrams are what tell
+    "who should I vote for" from "how does voting work". The model is
+    trained at startup from a bundled labelled set of tutor messages, using
+    the same word split as subject detection so each message is tokenized
+    once for both.
+    """
+
+    def __init__(self, weights: np.ndarray, bias: float, threshold: float = DEFAULT_THRESHOLD):
+        self.weights = weights
+        self.bias = bias
+        self.dim = len(weights)
+        self.threshold = threshold
+
+    @classmethod
+    def train(cls, educational: List[str], off_topic: List[str], dim: int = 1 << 14, epochs: int = 300,
+              learning_rate: float = 8.0, l2: float = 1e-4, threshold: float = DEFAULT_THRESHOLD) -> "ContentFilter":
+        """Fit the weights with full-batch gradient descent, each class weighted equally"""
+        texts = educational + off_topic
+        labels = np.array([1.0] * len(educational) + [0.0] * len(off_topic), dtype=np.float32)
+        sample_weights = np.where(labels == 1.0, 0.5 / len(educational), 0.5 / len(off_topic)).astype(np.float32)
+
+        # Train over the hashed ids the set actually uses; every other weight stays zero anyway
+        rows = [feature_ids(message_words(text), dim) for text in texts]
+        columns = sorted({feature for ids in rows for feature in ids})
+        column_of = {feature: column for column, feature in enumerate(columns)}
+        features = np.zeros((len(texts), len(columns)), dtype=np.float32)
+        for row, ids in enumerate(rows):
+            if ids:
+                features[row, [column_of[feature] for feature in ids]] = 1.0 / math.sqrt(len(ids))
+
+        used = np.zeros(len(columns), dtype=np.float32)
+        bias = 0.0
+        for _ in range(epochs):
+            predictions = 1.0 / (1.0 + np.exp(-(features @ used + bias)))
+            errors = (predictions - labels) * sample_weights
+            used -= learning_rate * (features.T @ errors + l2 * used)
+            bias -= learning_rate * float(errors.sum())
+
+        weights = np.zeros(dim, dtype=np.float32)
+        weights[columns] = used
+        return cls(weights, bias, threshold)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "ContentFilter":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls.train(data["educational"], data["off_topic"], **kwargs)
+
+    @classmethod
+    def from_env(cls) -> "ContentFilter":
+        """Train on CONTENT_FILTER_TRAINING_PATH with the CONTENT_FILTER_THRESHOLD setting"""
+        return cls.load(
+            os.getenv("CONTENT_FILTER_TRAINING_PATH") or DEFAULT_TRAINING_PATH,
+            threshold=float(os.getenv("CONTENT_FILTER_THRESHOLD", DEFAULT_THRESHOLD))
+        )
+
+    def probability(self, message: str) -> float:
+        """Probability that the message is an educational question"""
+        ids = feature_ids(message_words(message), self.dim)
+        score = self.bias
+        if ids:
+            score += float(self.weights[ids].sum()) / math.sqrt(len(ids))
+        return 1.0 / (1.0 + math.exp(-score))
+
+    def is_educational(self, message: str) -> bool:
+        return self.probability(message) >= self.threshold
@@ -0,0 +1,187 @@
+import math
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from models import ChatMessage
+
+if TYPE_CHECKING:
+    from prompt_compiler import CompiledPrompt
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to the character-based estimate
+    tiktoken = None
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD = 4
+# Smallest leftover budget worth filling with a trimmed turn
+MIN_PARTIAL_TOKENS = 100
+TRUNCATION_MARKER = "\n[... trimmed to fit the conversation budget ...]\n"
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken when installed, otherwise estimates ~4 characters per token"""
+
+    def __init__(self, model: str, cache_size: int = 8192):
+        self.encoding = None
+        if tiktoken is not None:
+            try:
+                self.encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self.encoding = tiktoken.get_encoding("cl100k_base")
+        # History is resent every turn, so most counts are cache hits
+        self.count = lru_cache(maxsize=cache_size)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.encoding is not None:
+            return len(self.encoding.encode(text))
+        return math.ceil(len(text) / 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keep the head and tail of text within max_tokens"""
+        if self.count(text) <= max_tokens:
+            return text
+        keep = max(0, max_tokens - self.count(TRUNCATION_MARKER))
+        tail_size = keep // 3
+        if self.encoding is not None:
+            tokens = self.encoding.encode(text)
+            head = self.encoding.decode(tokens[:keep - tail_size])
+            tail = self.encoding.decode(tokens[len(tokens) - tail_size:]) if tail_size else ""
+        else:
+            head = text[:(keep - tail_size) * 4]
+            tail = text[len(text) - tail_size * 4:] if tail_size else ""
+        return head + TRUNCATION_MARKER + tail
+
+
+@dataclass
+class ContextStats:
+    prompt_tokens: int
+    history_included: int
+    history_summarized: int
+    history_dropped: int
+    truncated: int
+
+
+class ContextBuilder:
+    """
+    Fills a token budget with conversation history, newest turns first.
+
+    Turns that do not fit are condensed into a short extractive summary, and
+    any single message larger than half the budget (a pasted essay) is
+    trimmed to its head and tail.
+    """
+
+    def __init__(self, counter: TokenCounter, token_budget: int = 3000,
+                 max_history_messages: int = 50, summary_tokens: int = 200):
+        self.counter = counter
+        self.token_budget = token_budget
+        self.max_history_messages = max_history_messages
+        self.summary_tokens = summary_tokens
+
+    @classmethod
+    def from_env(cls, model: str) -> "ContextBuilder":
+        return cls(
+            TokenCounter(model),
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", 3000)),
+            max_history_messages=int(os.getenv("CONTEXT_MAX_MESSAGES", 50)),
+            summary_tokens=int(os.getenv("CONTEXT_SUMMARY_TOKENS", 200))
+        )
+
+    def message_tokens(self, content: str) -> int:
+        return self.counter.count(content) + MESSAGE_OVERHEAD
+
+    def build(self, prompt: "CompiledPrompt", history: List[ChatMessage],
+              current_message: str) -> Tuple[List[Dict[str, str]], ContextStats]:
+        """
+        Return the chat messages for the upstream call and how the budget was spent.
+
+        The shared system message comes first and the prompt's level and
+        subject note last, just before the new user message, so everything
+        that varies between students sits after a common prefix.
+        """
+        truncated = 0
+        message_cap = self.token_budget // 2
+
+        if self.message_tokens(current_message) > message_cap:
+            current_message = self.counter.truncate(current_message, message_cap - MESSAGE_OVERHEAD)
+            truncated += 1
+
+        used = prompt.tokens + self.message_tokens(current_message)
+        history = history[-self.max_history_messages:] if self.max_history_messages else []
+
+        # Newest first, with oversized messages trimmed
+        candidates = []
+        for msg in reversed(history):
+            content = msg.content
+            cost = self.message_tokens(content)
+            if cost > message_cap:
+                content = self.counter.truncate(content, message_cap - MESSAGE_OVERHEAD)
+                cost = self.message_tokens(content)
+                truncated += 1
+            candidates.append(({"role": msg.role, "content": content}, cost))
+
+        remaining = self.token_budget - used
+        if sum(cost for _, cost in candidates) > remaining:
+            # Not everything fits: leave room for the summary of what is left out
+            remaining -= self.summary_tokens + MESSAGE_OVERHEAD
+
+        kept: List[Dict[str, str]] = []
+        for message, cost in candidates:
+            if cost > remaining:
+                # Spend a sizeable leftover on the head and tail of the turn that did not fit
+                if remaining >= MIN_PARTIAL_TOKENS:
+                    message = {"role": message["role"],
+                               "content": self.counter.truncate(message["content"], remaining - MESSAGE_OVERHEAD)}
+                    kept.append(message)
+                    used += self.message_tokens(message["content"])
+                    truncated += 1
+                break
+            kept.append(message)
+            remaining -= cost
+            used += cost
+        kept.reverse()
+        split = len(history) - len(kept)
+
+        messages = [prompt.system]
+        summarized = 0
+        overflow = history[:split]
+        if overflow:
+            summary, summarized = self._summarize(overflow)
+            if summary:
+                messages.append({"role": "system", "content": summary})
+                used += self.message_tokens(summary)
+
+        messages.extend(kept)
+        messages.append(prompt.note)
+        messages.append({"role": "user", "content": current_message})
+
+        return messages, ContextStats(
+            prompt_tokens=used,
+            history_included=len(kept),
+            history_summarized=summarized,
+            history_dropped=len(overflow) - summarized,
+            truncated=truncated
+        )
+
+    def _summarize(self, overflow: List[ChatMessage]) -> Tuple[str, int]:
+        """Condense older turns to their opening sentence, newest first, within summary_tokens"""
+        header = "Summary of earlier conversation (older turns shortened to save space):"
+        budget = self.summary_tokens - self.counter.count(header)
+        lines: List[str] = []
+        for msg in reversed(overflow):
+            first_sentence = msg.content.strip().split("\n", 1)[0].split(". ", 1)[0][:160]
+            if not first_sentence:
+                continue
+            speaker = "Student asked" if msg.role == "user" else "Tutor explained"
+            line = f"- {speaker}: {first_sentence}"
+            cost = self.counter.count(line) + 1
+            if cost > budget:
+                break
+            lines.append(line)
+            budget -= cost
+        if not lines:
+            return "", 0
+        lines.reverse()
+        return "\n".join([header, *lines]), len(lines)
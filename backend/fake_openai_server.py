@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Local fake OpenAI-compatible server for offline benchmarks
+
+Serves POST /v1/chat/completions (plain or "stream": true) with a
+configurable artificial latency so the tutor backend can be load tested
+without touching the real API. A share of requests can be made to fail
+slowly with a 503, to simulate a degraded upstream, and a per-second
+quota answers the excess with 429 like the real rate limits do.
+Latency can be set per model ("gpt-4o-mini=0.15:0.005" is 150 ms to the
+first token, then 5 ms per token) to compare model tiers. Prompt prefixes
+are cached like OpenAI's automatic prompt caching (prompts of 1024 tokens
+or more, in 128-token blocks) and reported in usage.prompt_tokens_details;
+--prefill adds time to the first token for every 1000 uncached prompt tokens.
+POST /fake/config changes the behaviour of a running server.
+Point the backend at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="Fake OpenAI")
+
+# Server behaviour, overridable from the command line or environment
+config = {
+    "latency": float(os.getenv("FAKE_OPENAI_LATENCY", 0.5)),
+    "token_delay": float(os.getenv("FAKE_OPENAI_TOKEN_DELAY", 0.02)),
+    "failure_rate": float(os.getenv("FAKE_OPENAI_FAILURE_RATE", 0)),
+    "failure_latency": float(os.getenv("FAKE_OPENAI_FAILURE_LATENCY", 5)),
+    "rps_limit": float(os.getenv("FAKE_OPENAI_RPS_LIMIT", 0)),
+    # Seconds per 1000 prompt tokens not served from the prefix cache, before the first token
+    "prefill": float(os.getenv("FAKE_OPENAI_PREFILL", 0)),
+    "prefix_cache": float(os.getenv("FAKE_OPENAI_PREFIX_CACHE", 1)),
+}
+# Completions requested since start, read back by benchmarks via GET /fake/stats
+stats = {"completions": 0, "rate_limited": 0, "models": {}}
+_quota_window = {"second": 0, "count": 0}
+
+def parse_model_profiles(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parse "model=latency:token_delay,..." into per-model timings"""
+    profiles = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, timing = item.partition("=")
+        latency, _, token_delay = timing.partition(":")
+        profiles[model.strip()] = (float(latency), float(token_delay or config["token_delay"]))
+    return profiles
+
+
+# Models without a profile use the global latency and token delay
+model_profiles = parse_model_profiles(os.getenv("FAKE_OPENAI_MODEL_PROFILES", ""))
+
+
+def _timing(model: str) -> Tuple[float, float]:
+    return model_profiles.get(model, (config["latency"], config["token_delay"]))
+
+
+# Prompt caching as the real API does it: prefixes of at least 1024 tokens, matched in 128-token blocks
+PREFIX_MIN_TOKENS = 1024
+PREFIX_BLOCK_TOKENS = 128
+PREFIX_CACHE_SIZE = 100000
+_prefix_cache: "OrderedDict[int, None]" = OrderedDict()
+
+
+def _cached_prefix_tokens(model: str, messages: List[dict]) -> int:
+    """Tokens of the longest block-aligned prompt prefix seen before; remembers this prompt's prefixes"""
+    if not config["prefix_cache"]:
+        return 0
+    text = model + "".join(f"\x00{message.get('role')}\x00{message.get('content', '')}" for message in messages)
+    cached = 0
+    for end in range(PREFIX_MIN_TOKENS * 4, len(text) + 1, PREFIX_BLOCK_TOKENS * 4):
+        key = hash(text[:end])
+        if key in _prefix_cache:
+            cached = end // 4
+            _prefix_cache.move_to_end(key)
+        else:
+            _prefix_cache[key] = None
+    while len(_prefix_cache) > PREFIX_CACHE_SIZE:
+        _prefix_cache.popitem(last=False)
+    return cached
+
+
+def _usage(messages, content: str, cached_tokens: int = 0) -> dict:
+    # Roughly four characters per prompt token, one completion token per word
+    prompt_tokens = sum(len(str(message.get("content", ""))) for message in messages) // 4
+    completion_tokens = len(content.split(" "))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": min(cached_tokens, prompt_tokens)}}
+
+
+def _prefill_seconds(usage: dict) -> float:
+    uncached = usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"]
+    return config["prefill"] * uncached / 1000
+
+
+FAKE_ANSWER = (
+    "Great question! Photosynthesis is the process plants use to turn light, "
+    "water and carbon dioxide into glucose and oxygen. Keep up the curiosity!"
+)
+
+
+def _completion_body(model: str, content: str, usage: dict) -> dict:
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": usage
+    }
+
+
+def _chunk_body(completion_id: str, model: str, delta: dict, finish_reason=None) -> str:
+    chunk = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+    }
+    return f"data: {json.dumps(chunk)}\n\n"
+
+
+async def _stream_answer(model: str, content: str, usage: dict, include_usage: bool):
+    """First chunk after the configured latency and prompt prefill, then one word per token delay"""
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    latency, token_delay = _timing(model)
+    await asyncio.sleep(latency + _prefill_seconds(usage))
+    yield _chunk_body(completion_id, model, {"role": "assistant", "content": ""})
+    for i, word in enumerate(content.split(" ")):
+        if i:
+            await asyncio.sleep(token_delay)
+        yield _chunk_body(completion_id, model, {"content": word if i == 0 else " " + word})
+    yield _chunk_body(completion_id, model, {}, finish_reason="stop")
+    if include_usage:
+        # stream_options.include_usage: a last chunk without choices carrying the usage
+        usage_chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                       "model": model, "choices": [], "usage": usage}
+        yield f"data: {json.dumps(usage_chunk)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    model = body.get("model", "gpt-3.5-turbo")
+    stats["completions"] += 1
+    if config["rps_limit"] > 0:
+        second = int(time.time())
+        if _quota_window["second"] != second:
+            _quota_window.update(second=second, count=0)
+        _quota_window["count"] += 1
+        if _quota_window["count"] > config["rps_limit"]:
+            stats["rate_limited"] += 1
+            return JSONResponse(status_code=429, headers={"Retry-After": "1"}, content={
+                "error": {"message": "Rate limit reached for requests", "type": "requests", "code": "rate_limit_exceeded"}
+            })
+    if random.random() < config["failure_rate"]:
+        # A degraded upstream: the caller waits, then gets an error anyway
+        await asyncio.sleep(config["failure_latency"])
+        return JSONResponse(status_code=503, content={
+            "error": {"message": "The server is overloaded", "type": "server_error", "code": None}
+        })
+    # The answer is cut at max_tokens words, like a real completion cap
+    content = " ".join(FAKE_ANSWER.split(" ")[:body.get("max_tokens") or None])
+    messages = body.get("messages", [])
+    usage = _usage(messages, content, _cached_prefix_tokens(model, messages))
+    per_model = stats["models"].setdefault(
+        model, {"completions": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0})
+    per_model["completions"] += 1
+    per_model["prompt_tokens"] += usage["prompt_tokens"]
+    per_model["cached_tokens"] += usage["prompt_tokens_details"]["cached_tokens"]
+    per_model["completion_tokens"] += usage["completion_tokens"]
+    if body.get("stream"):
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(_stream_answer(model, content, usage, include_usage), media_type="text/event-stream")
+    # A full completion costs the first-token latency and prefill plus every token
+    latency, token_delay = _timing(model)
+    await asyncio.sleep(latency + _prefill_seconds(usage) + token_delay * (len(content.split(" ")) - 1))
+    return _completion_body(model, content, usage)
+
+
+@app.post("/fake/config")
+async def update_config(request: Request):
+    """Change latency or failure settings of the running server"""
+    updates = await request.json()
+    config.update({key: float(value) for key, value in updates.items() if key in config})
+    if "model_profiles" in updates:
+        model_profiles.clear()
+        model_profiles.update(parse_model_profiles(updates["model_profiles"]))
+    return {**config, "model_profiles": model_profiles}
+
+
+@app.get("/fake/stats")
+async def get_stats():
+    return stats
+
+
+def start_fake_server(port: int = 8765, latency: float = 0.5, token_delay: float = 0.02,
+                      timeout: float = 15.0, failure_rate: float = 0.0,
+                      failure_latency: float = 5.0, rps_limit: float = 0.0,
+                      model_profiles: str = "", prefill: float = 0.0) -> subprocess.Popen:
+    """Launch the fake server in a subprocess and wait until it accepts requests"""
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--port", str(port),
+         "--latency", str(latency), "--token-delay", str(token_delay),
+         "--failure-rate", str(failure_rate), "--failure-latency", str(failure_latency),
+         "--rps-limit", str(rps_limit), "--model-profiles", model_profiles, "--prefill", str(prefill)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/docs", timeout=0.5)
+            return proc
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"Fake OpenAI server did not start on port {port}")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=config["latency"],
+                        help="seconds before the first token of each completion")
+    parser.add_argument("--token-delay", type=float, default=config["token_delay"],
+                        help="seconds between streamed tokens")
+    parser.add_argument("--failure-rate", type=float, default=config["failure_rate"],
+                        help="share of completions that fail with a 503")
+    parser.add_argument("--failure-latency", type=float, default=config["failure_latency"],
+                        help="seconds a failing completion takes before erroring")
+    parser.add_argument("--rps-limit", type=float, default=config["rps_limit"],
+                        help="completions allowed per second before answering 429 (0 = unlimited)")
+    parser.add_argument("--prefill", type=float, default=config["prefill"],
+                        help="seconds before the first token per 1000 prompt tokens not served from the prefix cache")
+    parser.add_argument("--model-profiles", default="",
+                        help='per-model timings, e.g. "gpt-4o-mini=0.15:0.005,gpt-4o=0.9:0.03"')
+    args = parser.parse_args()
+    config["latency"] = args.latency
+    config["token_delay"] = args.token_delay
+    config["failure_rate"] = args.failure_rate
+    config["failure_latency"] = args.failure_latency
+    config["rps_limit"] = args.rps_limit
+    config["prefill"] = args.prefill
+    model_profiles.update(parse_model_profiles(args.model_profiles))
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,60 @@
+import json
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional: fall back to the standard library
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON, as JSONResponse does"""
+    if isinstance(content, BaseModel):
+        # pydantic-core writes models straight to JSON, without validating or
+        # walking them through jsonable_encoder first
+        return content.model_dump_json().encode("utf-8")
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def loads(body: bytes) -> Any:
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response that renders pydantic models with pydantic-core and
+    everything else with orjson.
+
+    Routes that return FastJSONResponse(model) skip FastAPI's response_model
+    validation and jsonable_encoder; the model was already validated when it
+    was built.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class FastJSONRequest(Request):
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class FastJSONRoute(APIRoute):
+    """Route class that parses JSON request bodies with orjson"""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await handler(FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
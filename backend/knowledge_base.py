@@ -0,0 +1,148 @@
+import json
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from semantic_cache import tokenize
+
+DEFAULT_KNOWLEDGE_BASE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base.json")
+
+DEFAULT_ANSWER_THRESHOLD = 0.8
+DEFAULT_FALLBACK_THRESHOLD = 0.5
+
+# BM25-ranked phrasings whose term overlap is checked to pick the answer
+CANDIDATES = 5
+
+
+@dataclass(frozen=True)
+class Match:
+    subject: str
+    question: str
+    answer: str
+    score: float
+    confidence: float
+
+
+class KnowledgeBase:
+    """
+    BM25 index over FAQ and glossary entries, answering questions locally.
+
+    Every phrasing of an entry (its question and aliases) is indexed as its
+    own short document, reduced to content words by the semantic cache's
+    tokenizer, so "explain photosynthesis" and "what is photosynthesis?" both
+    become {photosynthesis}. Postings are NumPy arrays of document ids and
+    precomputed BM25 weights, so a query only touches the postings of its
+    own terms. Confidence is the IDF-weighted overlap in both directions
+    between the query and a candidate phrasing: "what is a cell" matches
+    "What is a cell?" fully, while "what is cell division" covers too little
+    of the query to be answered from that entry.
+    """
+
+    def __init__(self, entries: List[Dict], answer_threshold: float = DEFAULT_ANSWER_THRESHOLD,
+                 fallback_threshold: float = DEFAULT_FALLBACK_THRESHOLD, k1: float = 1.2, b: float = 0.75):
+        self.answer_threshold = answer_threshold
+        self.fallback_threshold = fallback_threshold
+        self.entries = entries
+        self.subjects: Dict[str, int] = {}
+
+        doc_entries, doc_terms = [], []
+        for index, entry in enumerate(entries):
+            self.subjects.setdefault(entry["subject"], len(self.subjects))
+            for phrasing in [entry["question"], *entry.get("aliases", [])]:
+                terms = tokenize(phrasing)
+                if terms:
+                    doc_entries.append(index)
+                    doc_terms.append(terms)
+
+        self.doc_entries = np.array(doc_entries, dtype=np.int32)
+        self.doc_subjects = np.array([self.subjects[entries[index]["subject"]] for index in doc_entries],
+                                     dtype=np.int32)
+        self.doc_terms = [frozenset(terms) for terms in doc_terms]
+        doc_count = len(doc_terms)
+        average_length = sum(map(len, doc_terms)) / doc_count if doc_count else 1.0
+
+        term_docs: Dict[str, List[int]] = {}
+        term_freqs: Dict[str, List[int]] = {}
+        for doc, terms in enumerate(doc_terms):
+            counts: Dict[str, int] = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, tf in counts.items():
+                term_docs.setdefault(term, []).append(doc)
+                term_freqs.setdefault(term, []).append(tf)
+
+        lengths = np.array([len(terms) for terms in doc_terms], dtype=np.float32)
+        self.idf: Dict[str, float] = {}
+        self.postings: Dict[str, tuple] = {}
+        for term, docs in term_docs.items():
+            idf = math.log(1 + (doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            ids = np.array(docs, dtype=np.int32)
+            tf = np.array(term_freqs[term], dtype=np.float32)
+            weights = idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lengths[ids] / average_length))
+            self.idf[term] = idf
+            self.postings[term] = (ids, weights.astype(np.float32))
+        # A word the corpus never uses counts as much as its rarest one
+        self.unknown_idf = math.log(1 + (doc_count + 0.5) / 0.5)
+        self.doc_mass = [sum(self.idf[term] for term in terms) for terms in self.doc_terms]
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "KnowledgeBase":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f)["entries"], **kwargs)
+
+    @classmethod
+    def from_env(cls) -> "KnowledgeBase":
+        """Load the corpus at KNOWLEDGE_BASE_PATH with LOCAL_*_THRESHOLD settings"""
+        return cls.load(
+            os.getenv("KNOWLEDGE_BASE_PATH") or DEFAULT_KNOWLEDGE_BASE_PATH,
+            answer_threshold=float(os.getenv("LOCAL_ANSWER_THRESHOLD", DEFAULT_ANSWER_THRESHOLD)),
+            fallback_threshold=float(os.getenv("LOCAL_FALLBACK_THRESHOLD", DEFAULT_FALLBACK_THRESHOLD))
+        )
+
+    def search(self, query: str, subject: Optional[str] = None) -> Optional[Match]:
+        """Best-covered entry among the top BM25 phrasings, restricted to `subject` if the corpus has it"""
+        terms = set(tokenize(query))
+        postings = [self.postings[term] for term in terms if term in self.postings]
+        if not postings:
+            return None
+
+        if len(postings) == 1:
+            docs, scores = postings[0]
+        else:
+            docs, inverse = np.unique(np.concatenate([ids for ids, _ in postings]), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate([weights for _, weights in postings]))
+        subject_id = self.subjects.get(subject) if subject else None
+        if subject_id is not None:
+            keep = self.doc_subjects[docs] == subject_id
+            docs, scores = docs[keep], scores[keep]
+            if docs.size == 0:
+                return None
+        if docs.size > CANDIDATES:
+            top = np.argpartition(-scores, CANDIDATES)[:CANDIDATES]
+            docs, scores = docs[top], scores[top]
+
+        query_mass = sum(self.idf.get(term, self.unknown_idf) for term in terms)
+        best, best_key = None, (-1.0, -1.0)
+        for doc, score in zip(docs.tolist(), scores.tolist()):
+            matched = sum(self.idf[term] for term in terms & self.doc_terms[doc])
+            confidence = (matched / query_mass) * (matched / self.doc_mass[doc])
+            if (confidence, score) > best_key:
+                best, best_key = doc, (confidence, score)
+
+        entry = self.entries[self.doc_entries[best]]
+        return Match(subject=entry["subject"], question=entry["question"], answer=entry["answer"],
+                     score=best_key[1], confidence=best_key[0])
+
+    def answer(self, query: str, subject: Optional[str] = None,
+               threshold: Optional[float] = None) -> Optional[Match]:
+        """The best match if its confidence reaches `threshold` (default: the direct-answer threshold)"""
+        match = self.search(query, subject)
+        if match is None or match.confidence < (self.answer_threshold if threshold is None else threshold):
+            return None
+        return match
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self.entries), "phrasings": len(self.doc_terms), "terms": len(self.postings)}
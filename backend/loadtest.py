@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+Offline load-testing suite for the tutor API
+
+Starts the local fake OpenAI server and the backend (under uvicorn, with
+OPENAI_BASE_URL pointed at the fake), then drives the chat, streaming and
+batch routes with a closed loop of virtual users at each concurrency
+level. Reports throughput, error rate, offline fallback answers and
+p50/p95/p99 latency (plus time to first token for streaming), and saves
+everything as JSON tagged with the current commit. `--compare` checks a
+run against an earlier results file and exits non-zero when throughput or
+tail latency regressed beyond `--tolerance`, or the error or fallback
+rate rose by more than `--rate-tolerance`.
+
+    python loadtest.py --concurrency 1,10,50 --duration 10
+    python loadtest.py --compare loadtest-results/<earlier>.json
+
+Use --target to load test an already running backend instead.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+
+from ai_tutor_service import OFFLINE_NOTICE
+from fake_openai_server import start_fake_server
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Ordinary questions; the suffix added per request keeps caches, coalescing and local answers out of the way
+QUESTIONS = [
+    "Can you explain how the immune system responds to a new virus?",
+    "How do I solve a system of two linear equations by substitution?",
+    "Why did the Industrial Revolution start in Britain?",
+    "How does a hash table handle collisions in Python?",
+    "What are the main themes of Of Mice and Men?",
+    "How does the water cycle affect the weather in coastal regions?",
+    "How do I balance a redox equation in acidic solution?",
+    "Why does a satellite stay in orbit instead of falling down?",
+]
+
+# Lower is worse for these, higher is worse for the rest
+HIGHER_IS_BETTER = {"throughput_rps"}
+COMPARED = ["throughput_rps", "p95_ms", "p99_ms", "ttft_p95_ms"]
+# Compared in absolute terms: fallback answers are fast, so a degraded run can look like a faster one
+RATES = ["error_rate", "fallback_rate"]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def git_revision() -> Dict[str, object]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def start_backend(port: int, upstream_port: int, workers: int, keep_limits: bool,
+                  timeout: float = 30.0, options: Sequence[str] = ()) -> subprocess.Popen:
+    """Run main:app under uvicorn against the fake upstream and wait until it is ready"""
+    env = dict(os.environ)
+    env.update(OPENAI_API_KEY=env.get("OPENAI_API_KEY") or "sk-fake-loadtest-key",
+               OPENAI_BASE_URL=f"http://127.0.0.1:{upstream_port}/v1")
+    # The load generator stands in for the proxy that identifies users with X-User-Id
+    env.update(RATE_LIMIT_TRUST_PROXY="true")
+    if not keep_limits:
+        # Measure the server, not the per-user and global quotas
+        env.update(RATE_LIMIT_USER_RPM="0", RATE_LIMIT_GLOBAL_RPM="0", RATE_LIMIT_GLOBAL_TPM="0")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log", *options],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health/ready", timeout=0.5).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"Backend did not become ready on port {port}")
+
+
+class Scenario:
+    """One route under load; `call` returns (ok, degraded, time to first token or None)"""
+    name = ""
+    # Shared by every scenario, and unique per run, so no request repeats an earlier one by accident
+    counter = itertools.count(1)
+    run_id = os.urandom(3).hex()
+
+    def __init__(self, args):
+        self.args = args
+
+    def payload(self) -> dict:
+        number = next(self.counter)
+        question = QUESTIONS[number % len(QUESTIONS)]
+        if self.args.repeat_ratio and (number % 100) < self.args.repeat_ratio * 100:
+            return {"message": question, "user_level": "intermediate"}
+        return {"message": f"{question} (run {self.run_id} #{number})", "user_level": "intermediate"}
+
+    async def call(self, client: httpx.AsyncClient, user: str):
+        raise NotImplementedError
+
+
+class ChatScenario(Scenario):
+    name = "chat"
+
+    async def call(self, client, user):
+        response = await client.post("/api/tutor/chat", json=self.payload(), headers={"X-User-Id": user})
+        if response.status_code != 200:
+            return False, False, None
+        return True, response.json()["response"].startswith(OFFLINE_NOTICE), None
+
+
+class StreamScenario(Scenario):
+    name = "stream"
+
+    async def call(self, client, user):
+        started = time.perf_counter()
+        first_token, event = None, None
+        async with client.stream("POST", "/api/tutor/chat/stream", json=self.payload(),
+                                 headers={"X-User-Id": user}) as response:
+            if response.status_code != 200:
+                await response.aread()
+                return False, False, None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                    if event == "token" and first_token is None:
+                        first_token = time.perf_counter() - started
+                    elif event == "error":
+                        return False, False, first_token
+                elif event == "done" and line.startswith("data: "):
+                    answer = json.loads(line[len("data: "):])["response"]
+                    return True, answer.startswith(OFFLINE_NOTICE), first_token
+        return False, False, first_token
+
+
+class BatchScenario(Scenario):
+    name = "batch"
+
+    async def call(self, client, user):
+        body = {"requests": [self.payload() for _ in range(self.args.batch_size)]}
+        response = await client.post("/api/tutor/chat/batch", json=body, headers={"X-User-Id": user})
+        if response.status_code != 200:
+            return False, False, None
+        result = response.json()
+        degraded = any(item["response"] and item["response"]["response"].startswith(OFFLINE_NOTICE)
+                       for item in result["results"])
+        return result["failed"] == 0, degraded, None
+
+
+SCENARIOS = {scenario.name: scenario for scenario in (ChatScenario, StreamScenario, BatchScenario)}
+
+
+async def run_level(base_url: str, scenario: Scenario, concurrency: int, duration: float,
+                    max_requests: int) -> dict:
+    """Closed loop: `concurrency` virtual users each send their next request as soon as one finishes"""
+    latencies, first_tokens = [], []
+    errors = degraded = sent = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(120.0, connect=10.0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user(index: int):
+            nonlocal errors, degraded, sent
+            while time.perf_counter() < deadline and (not max_requests or sent < max_requests):
+                sent += 1
+                started = time.perf_counter()
+                try:
+                    ok, fallback, first_token = await scenario.call(client, f"loadtest-{index}")
+                except httpx.HTTPError:
+                    ok, fallback, first_token = False, False, None
+                latencies.append(time.perf_counter() - started)
+                if first_token is not None:
+                    first_tokens.append(first_token)
+                errors += not ok
+                degraded += fallback
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user(index) for index in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    completed = len(latencies)
+    prompts = completed * (scenario.args.batch_size if scenario.name == "batch" else 1)
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": completed,
+        "errors": errors,
+        "error_rate": round(errors / completed, 4) if completed else None,
+        # Answered, but with the offline fallback instead of the model
+        "degraded": degraded,
+        "fallback_rate": round(degraded / completed, 4) if completed else None,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(completed / elapsed, 2) if elapsed else None,
+        "prompts_per_s": round(prompts / elapsed, 2) if elapsed else None,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(max(latencies) if latencies else None),
+        "ttft_p50_ms": ms(percentile(first_tokens, 0.50)),
+        "ttft_p95_ms": ms(percentile(first_tokens, 0.95)),
+        "ttft_p99_ms": ms(percentile(first_tokens, 0.99)),
+    }
+
+
+def print_results(results: List[dict]):
+    print(f"{'scenario':<9}{'conc':>6}{'reqs':>8}{'err %':>8}{'fallbk':>8}{'req/s':>9}"
+          f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ttft p95':>10}")
+    for result in results:
+        error_rate = (result["error_rate"] or 0) * 100
+        ttft = result["ttft_p95_ms"]
+        print(f"{result['scenario']:<9}{result['concurrency']:>6}{result['requests']:>8}{error_rate:>8.1f}"
+              f"{result['degraded']:>8}"
+              f"{result['throughput_rps']:>9.1f}{result['p50_ms']:>9.0f}{result['p95_ms']:>9.0f}"
+              f"{result['p99_ms']:>9.0f}{(f'{ttft:.0f}' if ttft is not None else '-'):>10}")
+
+
+def compare(current: List[dict], baseline_path: str, tolerance: float, rate_tolerance: float) -> bool:
+    """Print deltas against an earlier run; returns False if anything regressed beyond the tolerance"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    earlier = {(result["scenario"], result["concurrency"]): result for result in baseline["results"]}
+    print(f"\n📊 Compared with {baseline_path} (commit {baseline['meta'].get('commit')}), "
+          f"tolerance {tolerance:.0%}")
+    healthy = True
+    for result in current:
+        before = earlier.get((result["scenario"], result["concurrency"]))
+        if before is None:
+            continue
+        for metric in COMPARED:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            flag = "❌" if worse > tolerance else "✅"
+            healthy &= worse <= tolerance
+            print(f"   {flag} {result['scenario']:<7} c={result['concurrency']:<4} {metric:<15}"
+                  f"{old:>10.1f} -> {new:>10.1f} ({change:+.1%})")
+        for metric in RATES:
+            old, new = before.get(metric) or 0.0, result.get(metric) or 0.0
+            flag = "❌" if new - old > rate_tolerance else "✅"
+            healthy &= new - old <= rate_tolerance
+            print(f"   {flag} {result['scenario']:<7} c={result['concurrency']:<4} {metric:<15}"
+                  f"{old:>10.1%} -> {new:>10.1%}")
+    return healthy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", help="base URL of a running backend (skips starting one)")
+    parser.add_argument("--scenarios", default="chat,stream,batch")
+    parser.add_argument("--concurrency", default="1,10,50")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario and level")
+    parser.add_argument("--max-requests", type=int, default=0, help="stop a level after this many requests")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="share of requests repeating a question verbatim (exercises the caches)")
+    parser.add_argument("--workers", type=int, default=1, help="backend worker processes")
+    parser.add_argument("--keep-rate-limits", action="store_true",
+                        help="leave the backend's rate limits on instead of disabling them")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake upstream seconds to first token")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="fake upstream seconds per token")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of fake upstream calls failing")
+    parser.add_argument("--failure-latency", type=float, default=1.0)
+    parser.add_argument("--output", help="results file (default loadtest-results/<time>-<commit>.json)")
+    parser.add_argument("--compare", help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    parser.add_argument("--rate-tolerance", type=float, default=0.01,
+                        help="allowed absolute rise in error and fallback rates")
+    args = parser.parse_args()
+
+    scenarios = [SCENARIOS[name](args) for name in args.scenarios.split(",")]
+    levels = [int(level) for level in args.concurrency.split(",")]
+
+    processes = []
+    base_url = args.target
+    try:
+        if base_url is None:
+            upstream_port, backend_port = free_port(), free_port()
+            processes.append(start_fake_server(upstream_port, latency=args.latency, token_delay=args.token_delay,
+                                               failure_rate=args.failure_rate,
+                                               failure_latency=args.failure_latency))
+            processes.append(start_backend(backend_port, upstream_port, args.workers, args.keep_rate_limits))
+            base_url = f"http://127.0.0.1:{backend_port}"
+
+        print(f"🏋️ Load test against {base_url}: {', '.join(scenario.name for scenario in scenarios)} "
+              f"at concurrency {args.concurrency}, {args.duration:g}s each")
+        print("=" * 78)
+        results = []
+        for scenario in scenarios:
+            for level in levels:
+                results.append(asyncio.run(run_level(base_url, scenario, level, args.duration, args.max_requests)))
+        print_results(results)
+    finally:
+        for proc in reversed(processes):
+            proc.terminate()
+            proc.wait()
+
+    revision = git_revision()
+    meta = {
+        **revision,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "target": args.target or "local",
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+    }
+    output = args.output or os.path.join(
+        BACKEND_DIR, "loadtest-results",
+        f"{datetime.now():%Y%m%d-%H%M%S}-{revision['commit'] or 'nogit'}{'-dirty' if revision['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\n💾 Results saved to {output}")
+
+    if args.compare and not compare(results, args.compare, args.tolerance, args.rate_tolerance):
+        print("\n❌ Performance regressed beyond the tolerance")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,28 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 import asyncio
+import json
+import math
 import os
 from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple, Union
 from dotenv import load_dotenv
+from starlette.requests import HTTPConnection
 
-from models import TutorRequest, TutorResponse, ErrorResponse, ChatMessage
-from ai_tutor_service import AITutorService
+from models import (TutorRequest, TutorResponse, ErrorResponse, ChatMessage,
+                    BatchTutorRequest, BatchTutorResponse, BatchJobStatus)
+from ai_tutor_service import AITutorService, StreamInterrupted, UpstreamGate
+from catalog import CatalogDocument
+from batch_service import BatchProcessor
+from session_store import SessionStore
+from transcript_log import TranscriptLog
+from tutor_socket import TutorSocketHub
+from prefetch import SpeculativePrefetcher
+from rate_limiter import AdmissionController, RateLimited, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from metrics import registry, MetricsMiddleware, mark_handler_done
+from compression import Compression, CompressionMiddleware
+from fast_json import FastJSONResponse, FastJSONRoute
 
 # Load environment variables
 load_dotenv()
@@ -16,8 +31,15 @@ load_dotenv()
 app = FastAPI(
     title="LearnMate AI Tutor Backend",
     description="AI-powered educational assistant using OpenAI GPT-3.5 Turbo",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
+# Parse JSON request bodies with orjson on every route defined below
+app.router.route_class = FastJSONRoute
+
+# Negotiated response compression and compressed request bodies; inside CORS, so its 413s carry CORS headers
+compression = Compression.from_env()
+app.add_middleware(CompressionMiddleware, compression=compression)
 
 # Configure CORS
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:4200").split(",")
@@ -27,11 +49,58 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Retry-After"],
 )
 
+# Route latency histograms and per-stage Server-Timing headers
+app.add_middleware(MetricsMiddleware, timing_allow_origin=", ".join(cors_origins))
+
 # Initialize AI Tutor Service
 ai_tutor = AITutorService()
 
+# Server-side conversation sessions
+session_store = SessionStore.from_env()
+
+# Write-behind transcript persistence for analytics (off unless TRANSCRIPT_LOG_PATH is set)
+transcript_log = TranscriptLog.from_env()
+
+# Per-client and global (upstream quota) request admission
+admission = AdmissionController.from_env()
+# Only a trusted proxy in front may say who the client is: X-Forwarded-For and X-User-Id
+trust_proxy = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() in ("1", "true", "yes")
+
+# Readiness: off until warm-up is done, and again as soon as shutdown starts
+lifecycle = {"ready": False, "draining": False}
+
+@app.on_event("startup")
+async def startup_event():
+    if transcript_log is not None:
+        transcript_log.start()
+    warmed = await ai_tutor.warmup(connections=int(os.getenv("WARMUP_CONNECTIONS", 4)))
+    print(f"🔥 Warm-up done: {warmed['cached_answers']} cached answers loaded, "
+          f"{warmed['upstream_connections']} upstream connections open")
+    lifecycle["ready"] = True
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    lifecycle["draining"] = True
+    # Students reconnect to a worker that is not shutting down; their sessions carry over
+    await socket_hub.close()
+    prefetcher.close()
+    # Let background batch jobs and upstream calls whose callers already left finish
+    deadline = asyncio.get_running_loop().time() + float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", 20))
+    await batch_processor.drain(timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+    abandoned = await ai_tutor.drain(timeout=max(0.0, deadline - asyncio.get_running_loop().time()))
+    if abandoned:
+        print(f"⚠️ Shutting down with {abandoned} upstream calls still in flight")
+    await batch_processor.shutdown()
+    await ai_tutor.aclose()
+    await admission.close()
+    session_store.close()
+    if transcript_log is not None:
+        # After the drains: finished batch jobs and streams have queued their transcripts
+        await transcript_log.close()
+
 # Root endpoint
 @app.get("/")
 async def root():
@@ -41,9 +110,14 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/api/tutor/chat",
+            "chat_stream": "/api/tutor/chat/stream",
+            "chat_batch": "/api/tutor/chat/batch",
+            "chat_socket": "/ws/tutor",
             "subjects": "/api/tutor/subjects", 
             "study_tips": "/api/tutor/study-tips",
             "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
             "docs": "/docs"
         },
         "status": "running",
@@ -53,52 +127,243 @@ async def root():
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(), "service": "LearnMate AI Tutor"}
+    # Still serving (offline answers) while the upstream breaker is not closed
+    upstream = ai_tutor.breaker.snapshot()
+    status = "healthy" if upstream["state"] == "closed" else "degraded"
+    return {"status": status, "upstream": upstream, "timestamp": datetime.now(), "service": "LearnMate AI Tutor"}
 
-# Main chat endpoint
-@app.post("/api/tutor/chat", response_model=TutorResponse)
-async def chat_with_tutor(request: TutorRequest):
-    """
-    Main endpoint for chatting with the AI tutor
-    """
+# Liveness probe: the worker's event loop is responding
+@app.get("/health/live")
+async def liveness_probe():
+    return {"status": "alive"}
+
+# Readiness probe: warmed up and not shutting down, so safe to route traffic here
+@app.get("/health/ready")
+async def readiness_probe():
+    if lifecycle["draining"]:
+        return FastJSONResponse(status_code=503, content={"status": "draining"})
+    if not lifecycle["ready"]:
+        return FastJSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
+
+def validate_chat_request(request: TutorRequest):
+    """Reject chat requests that cannot be answered"""
+    # Validate OpenAI API key
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(
+            status_code=500, 
+            detail="OpenAI API key not configured"
+        )
+    
+    # Validate message content
+    if not request.message.strip():
+        raise HTTPException(
+            status_code=400, 
+            detail="Message cannot be empty"
+        )
+
+def client_id(http_request: HTTPConnection) -> str:
+    """Rate-limit identity: behind a trusted proxy its X-User-Id, else the client address"""
+    # A client could send a new X-User-Id with every request and never reach its limit
+    if not trust_proxy:
+        return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+    user_id = http_request.headers.get("x-user-id")
+    if user_id:
+        return f"user:{user_id}"
+    forwarded = http_request.headers.get("x-forwarded-for")
+    if forwarded:
+        return f"ip:{forwarded.split(',')[0].strip()}"
+    return f"ip:{http_request.client.host if http_request.client else 'unknown'}"
+
+def estimate_tokens(request: TutorRequest) -> int:
+    """Upstream tokens a request may cost: its message plus the completion cap of its model route"""
+    return ai_tutor.context_builder.counter.count(request.message) + ai_tutor.completion_budget(
+        request.message, request.subject, request.user_level, len(request.conversation_history or []))
+
+def too_many_requests(e: RateLimited) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(e),
+        headers={"Retry-After": e.retry_after_header}
+    )
+
+def admit_client(client: str):
+    """Spend one request from the client's own bucket, or fail fast with 429 and Retry-After"""
     try:
-        # Validate OpenAI API key
-        if not os.getenv("OPENAI_API_KEY"):
-            raise HTTPException(
-                status_code=500, 
-                detail="OpenAI API key not configured"
-            )
-        
-        # Validate message content
-        if not request.message.strip():
-            raise HTTPException(
-                status_code=400, 
-                detail="Message cannot be empty"
-            )
-        
+        admission.check_client(client)
+    except RateLimited as e:
+        raise too_many_requests(e)
+
+def upstream_gate(client: str, priority: int = PRIORITY_INTERACTIVE, **kwargs) -> UpstreamGate:
+    """Admission to the global upstream buckets, taken only by a request about to call the model"""
+    async def gate(tokens: int):
+        await admission.acquire(client, tokens, priority, charge_client=False, **kwargs)
+    return gate
+
+def off_topic_response() -> TutorResponse:
+    """Polite redirect returned for non-educational messages"""
+    return TutorResponse(
+        response="I'm here to help with your studies and learning! Let's focus on educational topics. Is there something specific you'd like to learn about today? 📚",
+        suggestions=[
+            "Ask about mathematics, science, or any academic subject",
+            "Request help with homework or study techniques",
+            "Explore concepts you're curious about"
+        ],
+        subject_detected=None,
+        confidence=1.0,
+        timestamp=datetime.now()
+    )
+
+async def answer_request(request: TutorRequest, client: Optional[str] = None, speculate: bool = True,
+                         upstream: Optional[UpstreamGate] = None) -> TutorResponse:
+    """Validate and answer one chat request; `upstream` admits it to the model, interactively by default"""
+    validate_chat_request(request)
+    history = resolve_history(request)
+
+    # A follow-up the previous answer suggested may already be answered
+    response = await prefetcher.take(request, history)
+    if response is None:
         # Check if content is educational (optional validation)
         if not ai_tutor.validate_educational_content(request.message):
-            return TutorResponse(
-                response="I'm here to help with your studies and learning! Let's focus on educational topics. Is there something specific you'd like to learn about today? 📚",
-                suggestions=[
-                    "Ask about mathematics, science, or any academic subject",
-                    "Request help with homework or study techniques",
-                    "Explore concepts you're curious about"
-                ],
-                subject_detected=None,
-                confidence=1.0,
-                timestamp=datetime.now()
-            )
-        
+            return off_topic_response()
+
         # Generate response using AI tutor service
-        response = await ai_tutor.generate_response(
+        try:
+            response = await ai_tutor.generate_response(
+                message=request.message,
+                conversation_history=history,
+                subject=request.subject,
+                user_level=request.user_level,
+                admit=upstream or upstream_gate(client or "unknown")
+            )
+        except RateLimited as e:
+            raise too_many_requests(e)
+    response = await record_turn(request, response, client)
+    if speculate and client:
+        prefetcher.schedule(request, response, history, client)
+    return response
+
+def resolve_history(request: TutorRequest) -> List[ChatMessage]:
+    """History from the server-side session when one is named, else as sent by the client"""
+    if not request.session_id:
+        return request.conversation_history or []
+    history = session_store.history(request.session_id)
+    if history is None:
+        # Unknown or expired session: start it from whatever the client still has
+        history = request.conversation_history or []
+        session_store.seed(request.session_id, history)
+    return history
+
+async def record_turn(request: TutorRequest, response: TutorResponse, client: Optional[str]) -> TutorResponse:
+    """
+    Append the exchange to the request's session, if it has one, and queue its
+    transcript; returns the response to send, carrying the session id
+    """
+    if request.session_id:
+        session_store.append(request.session_id, [
+            ChatMessage(role="user", content=request.message),
+            ChatMessage(role="assistant", content=response.response)
+        ])
+        # A new object: the answer may be shared with other callers and caches
+        response = response.model_copy(update={"session_id": request.session_id})
+    if transcript_log is not None:
+        await transcript_log.put({
+            "created_at": response.timestamp.isoformat(),
+            "session_id": request.session_id,
+            "client": client,
+            "subject": response.subject_detected,
+            "user_level": request.user_level,
+            "route": response.route,
+            "message": request.message,
+            "response": response.response,
+            "context_tokens": response.context_tokens,
+            "confidence": response.confidence
+        })
+    return response
+
+async def answer_batch_item(request: TutorRequest) -> TutorResponse:
+    """Answer one batch prompt once global capacity allows, behind interactive chat"""
+    return await answer_request(request, "batch", speculate=False,
+                                upstream=upstream_gate("batch", PRIORITY_BATCH, timeout=math.inf))
+
+# Initialize batch processing for bulk question sets
+batch_processor = BatchProcessor.from_env(answer_batch_item)
+
+async def answer_follow_up(request: TutorRequest, history: List[ChatMessage]) -> TutorResponse:
+    """Answer a suggested follow-up ahead of time; recorded only if the student asks it"""
+    # Not coalesced: a shared call is shielded, and an abandoned speculation must stop its upstream call
+    return await ai_tutor.generate_response(
+        message=request.message,
+        conversation_history=history,
+        subject=request.subject,
+        user_level=request.user_level,
+        coalesce=False
+    )
+
+# Speculative answers to suggested follow-ups (off unless PREFETCH_SUGGESTIONS is set)
+prefetcher = SpeculativePrefetcher.from_env(answer_follow_up, admission, estimate_tokens)
+
+def sse_event(event: str, data: str) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {data}\n\n"
+
+async def stream_answer(request: TutorRequest, client: str, history: Optional[List[ChatMessage]] = None
+                        ) -> AsyncIterator[Tuple[str, Union[str, TutorResponse]]]:
+    """
+    Stream one chat turn: ("token", text) chunks, then ("done", response) once
+    the turn is recorded, or ("off_topic", response) for a redirect; an answer
+    cut off mid-stream raises a 502 HTTPException after its tokens
+    """
+    if history is None:
+        history = resolve_history(request)
+    # A follow-up the previous answer suggested may already be answered
+    prefetched = await prefetcher.take(request, history)
+    if prefetched is not None:
+        prefetched = await record_turn(request, prefetched, client)
+        prefetcher.schedule(request, prefetched, history, client)
+        yield "token", prefetched.response
+        yield "done", prefetched
+        return
+
+    if not ai_tutor.validate_educational_content(request.message):
+        response = off_topic_response()
+        yield "token", response.response
+        yield "off_topic", response
+        return
+
+    try:
+        async for kind, payload in ai_tutor.stream_response(
             message=request.message,
-            conversation_history=request.conversation_history,
+            conversation_history=history,
             subject=request.subject,
-            user_level=request.user_level
-        )
-        
-        return response
+            user_level=request.user_level,
+            admit=upstream_gate(client)
+        ):
+            if kind == "done":
+                payload = await record_turn(request, payload, client)
+                prefetcher.schedule(request, payload, history, client)
+            yield kind, payload
+    except RateLimited as e:
+        raise too_many_requests(e)
+    except StreamInterrupted as e:
+        # The tokens already sent are not an answer: never recorded, reported as an error instead of done
+        print(f"⚠️ {e}")
+        raise HTTPException(status_code=502, detail="The answer was interrupted before it finished, please ask again")
+
+# Main chat endpoint
+@app.post("/api/tutor/chat", response_model=TutorResponse)
+async def chat_with_tutor(request: TutorRequest, http_request: Request):
+    """
+    Main endpoint for chatting with the AI tutor
+    """
+    try:
+        client = client_id(http_request)
+        validate_chat_request(request)
+        admit_client(client)
+        response = await answer_request(request, client)
+        mark_handler_done()
+        # Already a validated model: serialize it directly instead of re-validating it
+        return FastJSONResponse(response)
         
     except HTTPException:
         raise
@@ -108,103 +373,306 @@ async def chat_with_tutor(request: TutorRequest):
             detail=f"Internal server error: {str(e)}"
         )
 
+# Streaming chat endpoint
+@app.post("/api/tutor/chat/stream")
+async def chat_with_tutor_stream(request: TutorRequest, http_request: Request):
+    """
+    Stream the tutor answer as server-sent events.
+
+    Emits a `token` event per chunk from the model, then a single `done`
+    event carrying the full TutorResponse (suggestions, subject, confidence).
+    """
+    validate_chat_request(request)
+    client = client_id(http_request)
+    admit_client(client)
+
+    async def event_stream():
+        try:
+            async for kind, payload in stream_answer(request, client):
+                if kind == "token":
+                    yield sse_event("token", json.dumps({"token": payload}))
+                else:
+                    yield sse_event("done", payload.model_dump_json())
+        except HTTPException as e:
+            # Headers are already sent: a 429 from the upstream quota arrives here, with its Retry-After
+            error = {"message": e.detail}
+            if (e.headers or {}).get("Retry-After"):
+                error["retry_after"] = int(e.headers["Retry-After"])
+            yield sse_event("error", json.dumps(error))
+        except Exception as e:
+            yield sse_event("error", json.dumps({"message": f"Internal server error: {str(e)}"}))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def answer_socket_turn(request: TutorRequest, history: List[ChatMessage], client: str
+                             ) -> AsyncIterator[Tuple[str, Union[str, TutorResponse]]]:
+    """One question asked over /ws/tutor, with the conversation the connection holds"""
+    validate_chat_request(request)
+    admit_client(client)
+    if request.session_id and request.conversation_history:
+        # Sent after a reconnect found no session, which starts again from it
+        session_store.seed(request.session_id, history)
+    async for event in stream_answer(request, client, history):
+        yield event
+
+# Persistent per-student chat connections
+socket_hub = TutorSocketHub.from_env(answer_socket_turn)
+
+# WebSocket chat endpoint
+@app.websocket("/ws/tutor")
+async def chat_with_tutor_socket(websocket: WebSocket, session_id: Optional[str] = None,
+                                 user_level: str = "beginner", subject: Optional[str] = None):
+    """
+    Chat over one persistent connection; see TutorSocketHub for the frames.
+
+    The conversation of `session_id` is loaded once when the connection opens
+    and kept on it; each answered question is also written to the session.
+    """
+    # Browsers do not preflight WebSockets, so check the origin here
+    origin = websocket.headers.get("origin")
+    if origin and "*" not in cors_origins and origin not in cors_origins:
+        await websocket.close(code=1008)
+        return
+    history = (session_store.history(session_id) or []) if session_id else []
+    await socket_hub.serve(websocket, client_id(websocket), session_id, history, user_level, subject)
+
+# Batch chat endpoint
+@app.post("/api/tutor/chat/batch", response_model=BatchTutorResponse,
+          responses={202: {"model": BatchJobStatus}})
+async def chat_with_tutor_batch(batch: BatchTutorRequest, http_request: Request):
+    """
+    Answer a list of chat requests concurrently.
+
+    Identical prompts are answered once; results come back in request order
+    with per-item errors. With `async_job` set, returns 202 and a job id to
+    poll at /api/tutor/chat/batch/{job_id}. Items wait for upstream capacity
+    behind interactive chat.
+    """
+    if not batch.requests:
+        raise HTTPException(status_code=400, detail="Batch must contain at least one request")
+    if len(batch.requests) > batch_processor.max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: at most {batch_processor.max_items} requests allowed"
+        )
+    if not os.getenv("OPENAI_API_KEY"):
+        raise HTTPException(status_code=500, detail="OpenAI API key not configured")
+    # The batch costs its sender one request; the items queue for global capacity
+    admit_client(client_id(http_request))
+
+    if batch.async_job:
+        job = batch_processor.submit(batch.requests, batch.concurrency)
+        return FastJSONResponse(job, status_code=202)
+
+    response = await batch_processor.run(batch.requests, batch.concurrency)
+    mark_handler_done()
+    return FastJSONResponse(response)
+
+# Batch job status
+@app.get("/api/tutor/chat/batch/{job_id}", response_model=BatchJobStatus)
+async def get_batch_job(job_id: str):
+    """
+    Poll a background batch job; results are included once it completes
+    """
+    job = batch_processor.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return FastJSONResponse(job)
+
+# End a conversation session
+@app.delete("/api/tutor/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """
+    Forget the server-side history of a conversation
+    """
+    session_store.delete(session_id)
+    prefetcher.discard(session_id)
+    return {"session_id": session_id, "deleted": True, "timestamp": datetime.now()}
+
+# Response cache statistics
+@app.get("/api/tutor/cache/stats")
+async def get_cache_stats():
+    """
+    Hit/miss counters for the exact and semantic response caches, and the upstream prompt cache hit rate
+    """
+    semantic = ai_tutor.semantic_cache.stats() if ai_tutor.semantic_cache is not None else None
+    coalescing = {"chat": ai_tutor.inflight.stats(), "stream": ai_tutor.inflight_streams.stats()}
+    prompt_cache = ai_tutor.prompt_cache_stats()
+    if ai_tutor.response_cache is None:
+        return {"enabled": False, "semantic": semantic, "coalescing": coalescing, "prompt_cache": prompt_cache,
+                "prefetch": prefetcher.stats(), "timestamp": datetime.now()}
+    return {"enabled": True, **ai_tutor.response_cache.stats(), "semantic": semantic,
+            "coalescing": coalescing, "prompt_cache": prompt_cache, "prefetch": prefetcher.stats(),
+            "timestamp": datetime.now()}
+
+def cache_metrics():
+    """Cache counters exported at scrape time"""
+    caches = (("exact", ai_tutor.response_cache), ("semantic", ai_tutor.semantic_cache))
+    lookups, entries = [], []
+    for name, cache in caches:
+        if cache is None:
+            continue
+        stats = cache.stats()
+        lookups.append(({"cache": name, "result": "hit"}, stats["hits"]))
+        lookups.append(({"cache": name, "result": "miss"}, stats["misses"]))
+        entries.append(({"cache": name}, stats["entries"]))
+    yield "tutor_cache_lookups_total", "counter", "Response cache lookups by result", lookups
+    yield "tutor_cache_entries", "gauge", "Entries held by each response cache", entries
+    yield ("tutor_prompt_cache_hit_ratio", "gauge", "Share of upstream prompt tokens served from the upstream prefix cache",
+           [({}, ai_tutor.prompt_cache_stats()["hit_rate"])])
+
+registry.add_collector(cache_metrics)
+
+def circuit_metrics():
+    """Upstream circuit breaker state exported at scrape time"""
+    state = ai_tutor.breaker.snapshot()["state"]
+    yield ("tutor_circuit_state", "gauge", "Upstream circuit breaker state (1 for the current state)",
+           [({"state": name}, 1 if name == state else 0) for name in ("closed", "half_open", "open")])
+    yield ("tutor_circuit_opened_total", "counter", "Times the upstream circuit breaker has opened",
+           [({}, ai_tutor.breaker.times_opened)])
+
+registry.add_collector(circuit_metrics)
+
+def coalescing_metrics():
+    """Single-flight counters exported at scrape time"""
+    flights = (("chat", ai_tutor.inflight), ("stream", ai_tutor.inflight_streams))
+    requests, ratios = [], []
+    for path, flight in flights:
+        stats = flight.stats()
+        requests.append(({"path": path, "role": "leader"}, stats["leaders"]))
+        requests.append(({"path": path, "role": "follower"}, stats["followers"]))
+        ratios.append(({"path": path}, stats["coalescing_ratio"]))
+    yield ("tutor_coalesced_requests_total", "counter",
+           "Uncached tutor requests that started (leader) or joined (follower) an upstream call", requests)
+    yield ("tutor_coalescing_ratio", "gauge",
+           "Share of uncached tutor requests that joined an identical in-flight call", ratios)
+
+registry.add_collector(coalescing_metrics)
+
+def admission_metrics():
+    """Rate limiter counters exported at scrape time"""
+    stats = admission.stats()
+    yield ("tutor_admission_requests_total", "counter", "Requests admitted or rejected by the rate limiter",
+           [({"result": "admitted"}, stats["admitted"])] +
+           [({"result": "rejected", "reason": reason}, count) for reason, count in stats["rejected"].items()])
+    yield ("tutor_admission_queued_total", "counter", "Requests that waited for global upstream capacity",
+           [({}, stats["queued"])])
+    yield ("tutor_admission_queue_depth", "gauge", "Requests currently waiting for global upstream capacity",
+           [({}, stats["queue_depth"])])
+
+registry.add_collector(admission_metrics)
+
+def transcript_metrics():
+    """Transcript write-behind queue counters exported at scrape time"""
+    if transcript_log is None:
+        return
+    stats = transcript_log.stats()
+    yield ("tutor_transcripts_total", "counter", "Tutor exchanges written, dropped on overflow or lost to write errors",
+           [({"result": result}, stats[result]) for result in ("written", "dropped", "failed")])
+    yield ("tutor_transcript_queue_depth", "gauge", "Transcripts waiting to be written",
+           [({}, stats["queued"])])
+
+registry.add_collector(transcript_metrics)
+
+def socket_metrics():
+    """WebSocket connection counters exported at scrape time"""
+    stats = socket_hub.stats()
+    yield ("tutor_websocket_connections", "gauge", "Open /ws/tutor connections", [({}, stats["connections"])])
+    yield ("tutor_websocket_in_flight", "gauge", "Questions being answered over /ws/tutor", [({}, stats["in_flight"])])
+    yield ("tutor_websocket_questions_total", "counter", "Questions asked over /ws/tutor by outcome",
+           [({"result": result}, count) for result, count in stats["questions"].items()])
+    yield ("tutor_websocket_closed_total", "counter", "/ws/tutor connections closed, by reason",
+           [({"reason": reason}, count) for reason, count in stats["closed"].items()])
+    yield ("tutor_websocket_merged_tokens_total", "counter",
+           "Token chunks merged into an unsent frame because the client was reading slowly",
+           [({}, stats["merged_tokens"])])
+
+registry.add_collector(socket_metrics)
+
+def compression_metrics():
+    """Compression counters exported at scrape time"""
+    stats = compression.stats()
+    yield ("tutor_compression_body_bytes_total", "counter",
+           "Bytes of compressed response bodies before (raw) and after (sent) compression, by coding",
+           [({"encoding": name, "stage": "raw"}, count) for name, count in stats["bytes_in"].items()] +
+           [({"encoding": name, "stage": "sent"}, count) for name, count in stats["bytes_out"].items()])
+    yield ("tutor_compression_responses_total", "counter",
+           "Compressible responses compressed, left below the minimum size or sent to clients accepting no coding",
+           [({"result": result}, count) for result, count in stats["responses"].items()])
+    yield ("tutor_compressed_requests_total", "counter", "Requests with a Content-Encoding body, by outcome",
+           [({"result": result}, count) for result, count in stats["requests"].items()])
+
+registry.add_collector(compression_metrics)
+
+def prefetch_metrics():
+    """Speculative follow-up counters exported at scrape time"""
+    stats = prefetcher.stats()
+    yield ("tutor_prefetch_total", "counter",
+           "Speculative follow-up answers by outcome: served ready (hit) or while generating (joined), "
+           "cancelled, finished but never asked (unused), or failed",
+           [({"result": result}, count) for result, count in stats["results"].items()])
+    yield ("tutor_prefetch_skipped_total", "counter",
+           "Follow-ups not prefetched: too many in flight (busy), student budget spent, or no spare upstream capacity",
+           [({"reason": reason}, count) for reason, count in stats["skipped"].items()])
+    yield ("tutor_prefetch_upstream_calls_total", "counter", "Speculative answers that called the upstream model",
+           [({}, stats["upstream_calls"])])
+    yield ("tutor_prefetch_tokens_total", "counter", "Estimated upstream tokens of speculative answers that called the upstream model",
+           [({}, stats["spent_tokens"])])
+    yield ("tutor_prefetch_hit_ratio", "gauge", "Share of settled speculative answers that a student asked for",
+           [({}, stats["hit_ratio"])])
+    yield ("tutor_prefetch_in_flight", "gauge", "Speculative answers being generated", [({}, stats["in_flight"])])
+
+registry.add_collector(prefetch_metrics)
+
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Static catalog responses are revalidated by ETag once they go stale
+catalog_cache_control = f"public, max-age={int(os.getenv('CATALOG_MAX_AGE', 60))}"
+
+def catalog_response(request: Request, document: CatalogDocument) -> Response:
+    """Serve a pre-serialized catalog document, or 304 when the client's copy is current"""
+    headers = {"ETag": document.etag, "Cache-Control": catalog_cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        # Weak comparison, as If-None-Match requires
+        tags = {tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip() for tag in if_none_match.split(",")}
+        if document.etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=document.body, media_type="application/json", headers=headers)
+
 # Get available subjects
 @app.get("/api/tutor/subjects")
-async def get_subjects():
+async def get_subjects(request: Request):
     """
     Get list of available subjects the tutor can help with
     """
-    subjects = {
-        "mathematics": {
-            "name": "Mathematics",
-            "topics": ["Algebra", "Calculus", "Geometry", "Statistics", "Trigonometry"],
-            "icon": "🔢"
-        },
-        "physics": {
-            "name": "Physics", 
-            "topics": ["Mechanics", "Thermodynamics", "Electricity", "Waves", "Quantum Physics"],
-            "icon": "⚛️"
-        },
-        "chemistry": {
-            "name": "Chemistry",
-            "topics": ["Organic Chemistry", "Inorganic Chemistry", "Physical Chemistry", "Biochemistry"],
-            "icon": "🧪"
-        },
-        "biology": {
-            "name": "Biology",
-            "topics": ["Cell Biology", "Genetics", "Evolution", "Ecology", "Physiology"],
-            "icon": "🧬"
-        },
-        "computer_science": {
-            "name": "Computer Science",
-            "topics": ["Programming", "Algorithms", "Data Structures", "Databases", "AI/ML"],
-            "icon": "💻"
-        },
-        "english": {
-            "name": "English",
-            "topics": ["Grammar", "Literature", "Writing", "Reading Comprehension", "Poetry"],
-            "icon": "📝"
-        },
-        "history": {
-            "name": "History",
-            "topics": ["World History", "Ancient Civilizations", "Modern History", "Historical Analysis"],
-            "icon": "📜"
-        },
-        "geography": {
-            "name": "Geography",
-            "topics": ["Physical Geography", "Human Geography", "Climate", "Cartography"],
-            "icon": "🌍"
-        }
-    }
-    
-    return {"subjects": subjects, "timestamp": datetime.now()}
+    return catalog_response(request, ai_tutor.catalog.document("subjects"))
 
 # Get study tips
 @app.get("/api/tutor/study-tips")
-async def get_study_tips():
+async def get_study_tips(request: Request):
     """
     Get general study tips and learning strategies
     """
-    tips = [
-        {
-            "category": "Time Management",
-            "tip": "Use the Pomodoro Technique: Study for 25 minutes, then take a 5-minute break",
-            "icon": "⏰"
-        },
-        {
-            "category": "Active Learning",
-            "tip": "Teach concepts to someone else or explain them out loud to reinforce understanding",
-            "icon": "🗣️"
-        },
-        {
-            "category": "Note Taking",
-            "tip": "Use the Cornell Note-Taking System to organize and review your notes effectively",
-            "icon": "📝"
-        },
-        {
-            "category": "Practice",
-            "tip": "Practice problems regularly instead of just reading - active recall strengthens memory",
-            "icon": "🎯"
-        },
-        {
-            "category": "Environment",
-            "tip": "Create a dedicated, distraction-free study space with good lighting and organization",
-            "icon": "🏠"
-        }
-    ]
-    
-    return {"tips": tips, "timestamp": datetime.now()}
+    return catalog_response(request, ai_tutor.catalog.document("study_tips"))
 
 # Error handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=500,
         content=ErrorResponse(
             error="Internal Server Error",
             message=str(exc),
             timestamp=datetime.now()
-        ).dict()
+        )
     )
 
 # Run the server
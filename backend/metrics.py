@@ -0,0 +1,228 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Covers sub-millisecond local stages up to slow upstream completions
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[Sample]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        if not self._values and not self.labelnames:
+            yield self.name, {}, 0.0
+        for key, value in self._values.items():
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    def samples(self):
+        for key, (counts, total) in self._values.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": repr(bound)}, cumulative
+            cumulative += counts[-1]
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self.metrics: List[Metric] = []
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable):
+        """collector() yields (name, type, help, [(labels, value), ...]) read at scrape time"""
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{_format_labels(labels)} {value}" for name, labels, value in metric.samples())
+        for collector in self.collectors:
+            for name, kind, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "handler")))
+REQUESTS_TOTAL = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "handler", "status")))
+STAGE_SECONDS = registry.register(Histogram(
+    "tutor_stage_duration_seconds", "Time spent in each stage of a tutor request", ("stage",)))
+FALLBACKS_TOTAL = registry.register(Counter(
+    "tutor_fallback_responses_total", "Offline fallback answers served instead of the model"))
+UPSTREAM_TOKENS = registry.register(Counter(
+    "tutor_upstream_tokens_total",
+    "Tokens exchanged with the upstream model; cached_prompt counts prompt tokens served from its prompt cache",
+    ("kind",)))
+UPSTREAM_IN_FLIGHT = registry.register(Gauge(
+    "tutor_upstream_in_flight", "Upstream model calls currently in flight"))
+UPSTREAM_RETRIES = registry.register(Counter(
+    "tutor_upstream_retries_total", "Upstream model calls retried after a transient failure"))
+CIRCUIT_REJECTIONS = registry.register(Counter(
+    "tutor_circuit_rejections_total", "Upstream calls skipped because the circuit breaker was open"))
+LOCAL_ANSWERS = registry.register(Counter(
+    "tutor_local_answers_total", "Answers served from the local knowledge base, directly or as offline fallback",
+    ("path",)))
+MODEL_ROUTES = registry.register(Counter(
+    "tutor_model_routes_total", "Upstream requests by model route and model", ("route", "model")))
+CONTENT_FILTER_DECISIONS = registry.register(Counter(
+    "tutor_content_filter_total", "Messages allowed or rejected by the educational content filter", ("result",)))
+
+# Per-request stage timings, read back for the Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+HANDLER_DONE = "_handler_done"
+
+
+def record_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as one stage of the current request"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def mark_handler_done():
+    """Call as a route returns, so the time until the response starts counts as serialization"""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[HANDLER_DONE] = time.perf_counter()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording route latency and adding a Server-Timing header"""
+
+    def __init__(self, app, timing_allow_origin: str = ""):
+        self.app = app
+        self.timing_allow_origin = timing_allow_origin.encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                now = time.perf_counter()
+                handler_done = timings.pop(HANDLER_DONE, None)
+                if handler_done is not None:
+                    record_stage("serialization", now - handler_done)
+                entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items()]
+                entries.append(f"total;dur={(now - started) * 1000:.3f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                if self.timing_allow_origin:
+                    headers.append((b"timing-allow-origin", self.timing_allow_origin))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            endpoint = scope.get("endpoint")
+            handler = getattr(endpoint, "__name__", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - started, method=scope["method"], handler=handler)
+            REQUESTS_TOTAL.inc(method=scope["method"], handler=handler, status=status)
@@ -0,0 +1,113 @@
+import json
+import os
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from subject_detector import message_words
+
+DEFAULT_ROUTES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_routes.json")
+
+
+@dataclass(frozen=True)
+class Route:
+    """Model and completion budget chosen for one request"""
+    name: str
+    model: str
+    max_tokens: int
+
+
+@dataclass(frozen=True)
+class RouteRule:
+    """
+    Conditions on cheap request features; every condition given must hold.
+
+    Word counts use the message's word split, history depth counts the
+    messages in the conversation history, and keywords are whole words or
+    phrases ("step by step") looked for in the message.
+    """
+    route: Route
+    min_words: int = 0
+    max_words: Optional[int] = None
+    min_history: int = 0
+    max_history: Optional[int] = None
+    subjects: Optional[FrozenSet[str]] = None
+    user_levels: Optional[FrozenSet[str]] = None
+    keywords: Tuple[str, ...] = ()
+
+    def matches(self, words: Sequence[str], subject: Optional[str], user_level: str, history_depth: int) -> bool:
+        if len(words) < self.min_words or (self.max_words is not None and len(words) > self.max_words):
+            return False
+        if history_depth < self.min_history or (self.max_history is not None and history_depth > self.max_history):
+            return False
+        if self.subjects is not None and subject not in self.subjects:
+            return False
+        if self.user_levels is not None and user_level not in self.user_levels:
+            return False
+        if self.keywords:
+            text = f" {' '.join(words)} "
+            return any(f" {keyword} " in text for keyword in self.keywords)
+        return True
+
+
+class ModelRouter:
+    """
+    Picks the upstream model tier and max_tokens for each request.
+
+    Rules are tried in order and the first that matches wins; requests no
+    rule matches take the default route. Rules name a tier ("light",
+    "standard" or "heavy") that maps to a configured model, or a model
+    directly. Routing only looks at the message's words, the detected
+    subject, the user level and the history depth, so it costs about as
+    much as subject detection.
+    """
+
+    def __init__(self, rules: List[RouteRule], default: Route):
+        self.rules = rules
+        self.default = default
+
+    @classmethod
+    def load(cls, path: str, models: Dict[str, str]) -> "ModelRouter":
+        """Read {"default": {...}, "rules": [{...}]} with tiers resolved through `models`"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        def route(spec: Dict) -> Route:
+            model = spec.get("model") or models.get(spec.get("tier", "standard"))
+            if not model:
+                raise ValueError(f"Route {spec.get('name')!r} names unknown tier {spec.get('tier')!r}")
+            return Route(name=spec["name"], model=model, max_tokens=int(spec["max_tokens"]))
+
+        def keywords(spec: Dict) -> Tuple[str, ...]:
+            return tuple(" ".join(message_words(keyword)) for keyword in spec.get("keywords", []))
+
+        rules = [
+            RouteRule(
+                route=route(spec),
+                min_words=spec.get("min_words", 0),
+                max_words=spec.get("max_words"),
+                min_history=spec.get("min_history", 0),
+                max_history=spec.get("max_history"),
+                subjects=frozenset(spec["subjects"]) if "subjects" in spec else None,
+                user_levels=frozenset(spec["user_levels"]) if "user_levels" in spec else None,
+                keywords=keywords(spec)
+            )
+            for spec in data.get("rules", [])
+        ]
+        return cls(rules, route(data["default"]))
+
+    @classmethod
+    def from_env(cls, default_model: str) -> "ModelRouter":
+        """Load MODEL_ROUTES_PATH; light and heavy tiers default to the standard model"""
+        models = {
+            "light": os.getenv("OPENAI_MODEL_LIGHT") or default_model,
+            "standard": default_model,
+            "heavy": os.getenv("OPENAI_MODEL_HEAVY") or default_model
+        }
+        return cls.load(os.getenv("MODEL_ROUTES_PATH") or DEFAULT_ROUTES_PATH, models)
+
+    def route(self, message: str, subject: Optional[str], user_level: str, history_depth: int) -> Route:
+        words = message_words(message)
+        for rule in self.rules:
+            if rule.matches(words, subject, user_level, history_depth):
+                return rule.route
+        return self.default
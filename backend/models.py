@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Literal
 from datetime import datetime
 
 
@@ -14,6 +14,7 @@ class TutorRequest(BaseModel):
     conversation_history: Optional[List[ChatMessage]] = []
     subject: Optional[str] = None
     user_level: Optional[str] = "beginner"  # beginner, intermediate, advanced
+    session_id: Optional[str] = None  # server keeps the history; send only the new message
 
 
 class TutorResponse(BaseModel):
@@ -21,6 +22,9 @@ class TutorResponse(BaseModel):
     suggestions: Optional[List[str]] = []
     subject_detected: Optional[str] = None
     confidence: Optional[float] = None
+    context_tokens: Optional[int] = None  # prompt tokens sent upstream; None when served from cache
+    session_id: Optional[str] = None
+    route: Optional[str] = None  # model route that produced the answer; None when answered locally
     timestamp: datetime
 
 
@@ -28,3 +32,34 @@ class ErrorResponse(BaseModel):
     error: str
     message: str
     timestamp: datetime
+
+
+class BatchTutorRequest(BaseModel):
+    requests: List[TutorRequest]
+    concurrency: Optional[int] = None  # defaults to BATCH_CONCURRENCY
+    async_job: Optional[bool] = False  # return a job id instead of waiting
+
+
+class BatchItemResult(BaseModel):
+    index: int
+    response: Optional[TutorResponse] = None
+    error: Optional[str] = None
+
+
+class BatchTutorResponse(BaseModel):
+    results: List[BatchItemResult]
+    total: int
+    unique_prompts: int
+    succeeded: int
+    failed: int
+    timestamp: datetime
+
+
+class BatchJobStatus(BaseModel):
+    job_id: str
+    status: Literal["pending", "running", "completed", "failed"]
+    total: int
+    completed: int
+    result: Optional[BatchTutorResponse] = None
+    error: Optional[str] = None
+    created_at: datetime
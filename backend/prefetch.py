@@ -0,0 +1,212 @@
+import asyncio
+import contextvars
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from metrics import record_stage
+from models import ChatMessage, TutorRequest, TutorResponse
+from rate_limiter import AdmissionController
+
+# Answers a follow-up with the conversation it would be asked in
+SpeculationHandler = Callable[[TutorRequest, List[ChatMessage]], Awaitable[TutorResponse]]
+
+
+def _normalize(message: str) -> str:
+    return " ".join(message.split()).casefold()
+
+
+def _fingerprint(history: List[ChatMessage]) -> Tuple[str, ...]:
+    """The exchange a speculation follows; session trimming may drop older turns, never these"""
+    return tuple(message.content for message in history[-2:])
+
+
+@dataclass
+class _Speculation:
+    """One session's follow-ups being answered ahead of time, for the turn that suggested them"""
+    fingerprint: Tuple[str, ...]
+    user_level: Optional[str]
+    subject: Optional[str]
+    expires_at: float
+    tasks: Dict[str, asyncio.Task]
+
+
+class SpeculativePrefetcher:
+    """
+    Answers a session's suggested follow-ups before the student clicks one.
+
+    After a turn is answered, its top `suggestions` follow-ups are answered
+    in the background, each only if upstream capacity is spare (nobody
+    waiting for admission and `headroom` of the global quota left after it)
+    and the student has budget left (`user_tokens_per_hour` of estimated
+    tokens spent speculatively), with at most `max_in_flight` running per
+    worker. The next turn of the session takes the answer if it asks one of
+    those follow-ups, at the same level and subject, within `ttl` seconds;
+    a click while the answer is still being generated waits for it instead
+    of starting another call. Whatever the next turn asks, the other
+    speculations of the previous turn are cancelled or dropped; the handler
+    must run its upstream call in the speculation's own task, so that
+    cancelling it really stops the call. Spend (`upstream_calls`,
+    `spent_tokens`) counts only the speculations whose upstream call ran to
+    the end.
+    """
+
+    def __init__(self, handler: SpeculationHandler, admission: AdmissionController,
+                 estimate: Callable[[TutorRequest], int], suggestions: int = 0, ttl: float = 120.0,
+                 max_in_flight: int = 8, user_tokens_per_hour: float = 20000.0, headroom: float = 0.5,
+                 max_sessions: int = 10000, clock=time.monotonic):
+        self.handler = handler
+        self.admission = admission
+        self.estimate = estimate
+        self.suggestions = suggestions
+        self.ttl = ttl
+        self.max_in_flight = max_in_flight
+        self.user_tokens_per_hour = user_tokens_per_hour
+        self.headroom = headroom
+        self.max_sessions = max_sessions
+        self.clock = clock
+        self._sessions: "OrderedDict[str, _Speculation]" = OrderedDict()
+        # Running speculations and their estimated tokens, spent once the answer comes back
+        self._running: Dict[asyncio.Task, int] = {}
+        self.started = 0
+        self.upstream_calls = 0
+        self.spent_tokens = 0
+        self.results = {"hit": 0, "joined": 0, "cancelled": 0, "unused": 0, "failed": 0}
+        self.skipped = {"busy": 0, "budget": 0, "capacity": 0}
+
+    @classmethod
+    def from_env(cls, handler: SpeculationHandler, admission: AdmissionController,
+                 estimate: Callable[[TutorRequest], int]) -> "SpeculativePrefetcher":
+        return cls(
+            handler,
+            admission,
+            estimate,
+            suggestions=int(os.getenv("PREFETCH_SUGGESTIONS", 0)),
+            ttl=float(os.getenv("PREFETCH_TTL", 120)),
+            max_in_flight=int(os.getenv("PREFETCH_MAX_IN_FLIGHT", 8)),
+            user_tokens_per_hour=float(os.getenv("PREFETCH_USER_TOKENS_PER_HOUR", 20000)),
+            headroom=float(os.getenv("PREFETCH_HEADROOM", 0.5)),
+            max_sessions=int(os.getenv("PREFETCH_MAX_SESSIONS", 10000))
+        )
+
+    def schedule(self, request: TutorRequest, response: TutorResponse, history: List[ChatMessage], client: str):
+        """Start answering the follow-ups `response` suggests, asked after `request` in `history`"""
+        if self.suggestions <= 0 or not request.session_id or not response.suggestions:
+            return
+        self.discard(request.session_id)
+        self._expire()
+        history = list(history) + [ChatMessage(role="user", content=request.message),
+                                   ChatMessage(role="assistant", content=response.response)]
+        tasks: Dict[str, asyncio.Task] = {}
+        for suggestion in response.suggestions[:self.suggestions]:
+            key = _normalize(suggestion)
+            if not key or key in tasks:
+                continue
+            if len(self._running) >= self.max_in_flight:
+                self.skipped["busy"] += 1
+                continue
+            follow_up = TutorRequest(message=suggestion, subject=request.subject, user_level=request.user_level,
+                                     session_id=request.session_id)
+            tokens = self.estimate(follow_up)
+            refused = self.admission.try_acquire_spare(client, tokens, self.user_tokens_per_hour, self.headroom)
+            if refused is not None:
+                self.skipped[refused] += 1
+                continue
+            # A fresh context, so its stage timings do not land in the request that suggested it
+            task = contextvars.Context().run(asyncio.ensure_future, self.handler(follow_up, history))
+            task.add_done_callback(self._finished)
+            self._running[task] = tokens
+            tasks[key] = task
+            self.started += 1
+        if not tasks:
+            return
+        self._sessions[request.session_id] = _Speculation(
+            fingerprint=_fingerprint(history),
+            user_level=request.user_level,
+            subject=request.subject,
+            expires_at=self.clock() + self.ttl,
+            tasks=tasks
+        )
+        while len(self._sessions) > self.max_sessions:
+            self._abandon(self._sessions.popitem(last=False)[1].tasks.values())
+
+    async def take(self, request: TutorRequest, history: List[ChatMessage]) -> Optional[TutorResponse]:
+        """The speculative answer to this turn, if it asks a follow-up being prefetched; None otherwise"""
+        if not request.session_id:
+            return None
+        speculation = self._sessions.pop(request.session_id, None)
+        if speculation is None:
+            return None
+        task = speculation.tasks.pop(_normalize(request.message), None)
+        # Whatever was asked, the other follow-ups of that turn will not be
+        self._abandon(speculation.tasks.values())
+        if task is None:
+            return None
+        if (self.clock() >= speculation.expires_at or speculation.user_level != request.user_level
+                or speculation.subject != request.subject or speculation.fingerprint != _fingerprint(history)):
+            self._abandon([task])
+            return None
+
+        result = "hit" if task.done() else "joined"
+        if not task.done():
+            started = time.perf_counter()
+            # wait() rather than await: a disconnecting student leaves the answer to the response cache
+            await asyncio.wait({task})
+            record_stage("prefetch_wait", time.perf_counter() - started)
+        if task.cancelled() or task.exception() is not None:
+            self.results["failed"] += 1
+            return None
+        self.results[result] += 1
+        return task.result().model_copy(deep=True)
+
+    def discard(self, session_id: str):
+        """Cancel a session's speculations, e.g. when it is deleted"""
+        speculation = self._sessions.pop(session_id, None)
+        if speculation is not None:
+            self._abandon(speculation.tasks.values())
+
+    def close(self):
+        while self._sessions:
+            self._abandon(self._sessions.popitem(last=False)[1].tasks.values())
+
+    def _expire(self):
+        # Sessions are kept in scheduling order, so expired ones are at the front
+        now = self.clock()
+        while self._sessions and next(iter(self._sessions.values())).expires_at <= now:
+            self._abandon(self._sessions.popitem(last=False)[1].tasks.values())
+
+    def _abandon(self, tasks: Iterable[asyncio.Task]):
+        for task in list(tasks):
+            if not task.done():
+                task.cancel()
+                self.results["cancelled"] += 1
+            elif task.cancelled() or task.exception() is not None:
+                self.results["failed"] += 1
+            else:
+                self.results["unused"] += 1
+
+    def _finished(self, task: asyncio.Task):
+        tokens = self._running.pop(task, 0)
+        if task.cancelled() or task.exception() is not None:
+            return
+        # Cached and knowledge base answers carry no route: those cost no upstream call
+        if task.result().route is not None:
+            self.upstream_calls += 1
+            self.spent_tokens += tokens
+
+    def stats(self) -> Dict:
+        used = self.results["hit"] + self.results["joined"]
+        settled = sum(self.results.values())
+        return {
+            "enabled": self.suggestions > 0,
+            "sessions": len(self._sessions),
+            "in_flight": len(self._running),
+            "started": self.started,
+            "upstream_calls": self.upstream_calls,
+            "spent_tokens": self.spent_tokens,
+            "results": dict(self.results),
+            "skipped": dict(self.skipped),
+            "hit_ratio": used / settled if settled else 0.0
+        }
@@ -0,0 +1,72 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from context_builder import MESSAGE_OVERHEAD, TokenCounter
+
+USER_LEVELS = ("beginner", "intermediate", "advanced")
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """
+    Messages framing every request for one (level, subject).
+
+    `system` is the same message object for every request, so the prompt
+    starts with a byte-identical prefix; `note` carries the level and
+    subject and goes after the conversation, just before the new user
+    message. Both are shared between requests and must not be mutated.
+    """
+    system: Dict[str, str]
+    note: Dict[str, str]
+    tokens: int
+
+
+class PromptCompiler:
+    """
+    Pre-built prompt framing, so upstream prefix caching sees one shared prefix.
+
+    The system prompt used to end with the student's level and subject, which
+    made the first message differ between students and rebuilt a large string
+    on every call. Here the system message is built once and the level and
+    subject note for every (level, subject) in the catalog is compiled, with
+    its token count, at startup. Other combinations (custom levels, subjects
+    named by the client) are compiled on first use and kept in a small LRU.
+    """
+
+    def __init__(self, system_prompt: str, counter: TokenCounter, subjects: Iterable[str],
+                 levels: Iterable[str] = USER_LEVELS, cache_size: int = 256):
+        self.counter = counter
+        self.system = {"role": "system", "content": system_prompt}
+        self.system_tokens = counter.count(system_prompt) + MESSAGE_OVERHEAD
+        self.cache_size = cache_size
+        self.prompts: Dict[Tuple[str, Optional[str]], CompiledPrompt] = {
+            (level, subject): self._compile(level, subject)
+            for level in levels for subject in (None, *subjects)
+        }
+        self._extra: "OrderedDict[Tuple[str, Optional[str]], CompiledPrompt]" = OrderedDict()
+
+    def _compile(self, level: str, subject: Optional[str]) -> CompiledPrompt:
+        note = f"The student is at {level} level."
+        if subject:
+            note += f" They are asking about {subject}."
+        note += " Please adjust your explanation accordingly."
+        return CompiledPrompt(
+            system=self.system,
+            note={"role": "system", "content": note},
+            tokens=self.system_tokens + self.counter.count(note) + MESSAGE_OVERHEAD
+        )
+
+    def prompt(self, level: str, subject: Optional[str]) -> CompiledPrompt:
+        key = (level, subject)
+        compiled = self.prompts.get(key)
+        if compiled is not None:
+            return compiled
+        compiled = self._extra.get(key)
+        if compiled is None:
+            compiled = self._extra[key] = self._compile(level, subject)
+            if len(self._extra) > self.cache_size:
+                self._extra.popitem(last=False)
+        else:
+            self._extra.move_to_end(key)
+        return compiled
@@ -0,0 +1,277 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+# Lower runs first when requests wait for global capacity
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+# (key, refill per second, capacity, cost)
+BucketSpec = Tuple[str, float, float, float]
+# A share of capacity every bucket must keep after paying, or one per bucket
+Headroom = Union[float, Sequence[float]]
+
+
+def _refill(tokens: float, updated: float, rate: float, capacity: float, now: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _take(states: List[Tuple[float, float]], buckets: List[BucketSpec], now: float, headroom: Headroom = 0.0):
+    """
+    Return (wait seconds, new states); the states only change when every bucket
+    can pay and still hold `headroom` (a share of its capacity) afterwards
+    """
+    refilled = [_refill(tokens, updated, rate, capacity, now)
+                for (tokens, updated), (_, rate, capacity, _) in zip(states, buckets)]
+    headrooms = [headroom] * len(buckets) if isinstance(headroom, (int, float)) else headroom
+    wait = 0.0
+    for tokens, reserve, (_, rate, capacity, cost) in zip(refilled, headrooms, buckets):
+        if tokens < cost + reserve * capacity:
+            # A cost above the capacity can never be paid in full; wait for a full bucket instead
+            wait = max(wait, (min(cost, capacity) + reserve * capacity - tokens) / rate)
+    if wait > 0:
+        return wait, None
+    return 0.0, [(tokens - cost, now) for tokens, (_, _, _, cost) in zip(refilled, buckets)]
+
+
+class InMemoryBucketBackend:
+    """Process-local token buckets with an LRU cap on the number of keys"""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, buckets: List[BucketSpec], now: float, headroom: Headroom = 0.0, charge: bool = True) -> float:
+        states = [self._buckets.get(key, (capacity, now)) for key, _, capacity, _ in buckets]
+        wait, new_states = _take(states, buckets, now, headroom)
+        if new_states is not None and charge:
+            for (key, _, _, _), state in zip(buckets, new_states):
+                self._buckets[key] = state
+                self._buckets.move_to_end(key)
+            # A forgotten bucket is simply a full one, so evicting idle keys is safe
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def close(self):
+        self._buckets.clear()
+
+
+class SQLiteBucketBackend:
+    """Token buckets shared by every worker on the host"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rate_buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def take(self, buckets: List[BucketSpec], now: float, headroom: Headroom = 0.0, charge: bool = True) -> float:
+        with self._lock:
+            # IMMEDIATE takes the write lock up front, so workers cannot interleave read and update
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                states = []
+                for key, _, capacity, _ in buckets:
+                    row = self._conn.execute(
+                        "SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)
+                    ).fetchone()
+                    states.append(row if row is not None else (capacity, now))
+                wait, new_states = _take(states, buckets, now, headroom)
+                if new_states is not None and charge:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                        [(key, tokens, updated) for (key, _, _, _), (tokens, updated) in zip(buckets, new_states)]
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float, reason: str):
+        super().__init__(f"Rate limited ({reason}); retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.reason = reason
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class AdmissionController:
+    """
+    Token-bucket admission control in front of the upstream model.
+
+    Each client has its own bucket and is turned away straight away once it
+    is empty. Admitted requests then need capacity from the global request
+    and token buckets, sized to the upstream RPM/TPM quota; when those are
+    empty, requests wait in a bounded priority queue (interactive chat ahead
+    of batch work) and are rejected once the queue is full or they have
+    waited too long.
+    """
+
+    def __init__(self, backend, user_rpm: float = 30, user_burst: float = 10,
+                 global_rpm: float = 3000, global_tpm: float = 90000,
+                 queue_size: int = 200, max_wait: float = 10.0, clock=time.time):
+        self.backend = backend
+        self.user_rpm = user_rpm
+        self.user_burst = user_burst
+        self.global_rpm = global_rpm
+        self.global_tpm = global_tpm
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.clock = clock
+
+        self._queue: List[tuple] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.admitted = 0
+        self.queued = 0
+        self.rejected: Dict[str, int] = {"client": 0, "queue_full": 0, "timeout": 0}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        path = os.getenv("RATE_LIMIT_STORE_PATH")
+        backend = SQLiteBucketBackend(path) if path else InMemoryBucketBackend()
+        return cls(
+            backend,
+            user_rpm=float(os.getenv("RATE_LIMIT_USER_RPM", 30)),
+            user_burst=float(os.getenv("RATE_LIMIT_USER_BURST", 10)),
+            global_rpm=float(os.getenv("RATE_LIMIT_GLOBAL_RPM", 3000)),
+            global_tpm=float(os.getenv("RATE_LIMIT_GLOBAL_TPM", 90000)),
+            queue_size=int(os.getenv("RATE_LIMIT_QUEUE_SIZE", 200)),
+            max_wait=float(os.getenv("RATE_LIMIT_MAX_WAIT", 10))
+        )
+
+    def _global_buckets(self, tokens: float) -> List[BucketSpec]:
+        # A full minute of quota may be spent at once, as the upstream allows
+        buckets = []
+        if self.global_rpm > 0:
+            buckets.append(("global:requests", self.global_rpm / 60, self.global_rpm, 1))
+        if self.global_tpm > 0:
+            buckets.append(("global:tokens", self.global_tpm / 60, self.global_tpm, tokens))
+        return buckets
+
+    def _take_global(self, tokens: float) -> float:
+        buckets = self._global_buckets(tokens)
+        return self.backend.take(buckets, self.clock()) if buckets else 0.0
+
+    async def acquire(self, client: str, tokens: float, priority: int = PRIORITY_INTERACTIVE,
+                      timeout: Optional[float] = None, charge_client: bool = True):
+        """
+        Wait for admission or raise RateLimited.
+
+        tokens is the estimated upstream cost of the request. timeout defaults
+        to max_wait; pass math.inf for work that should queue rather than fail.
+        """
+        if charge_client:
+            self.check_client(client)
+
+        # Nobody may overtake requests that are already waiting
+        if not self._queue and self._take_global(tokens) == 0:
+            self.admitted += 1
+            return
+        if len(self._queue) >= self.queue_size:
+            self.rejected["queue_full"] += 1
+            raise RateLimited(self._estimated_wait(tokens), "queue_full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), tokens, future))
+        self.queued += 1
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        timeout = self.max_wait if timeout is None else timeout
+        try:
+            await asyncio.wait_for(future, None if math.isinf(timeout) else timeout)
+        except asyncio.TimeoutError:
+            self.rejected["timeout"] += 1
+            raise RateLimited(self._estimated_wait(tokens), "timeout")
+        self.admitted += 1
+
+    def check_client(self, client: str):
+        """Spend one request from the client's own bucket, or raise RateLimited"""
+        if self.user_rpm <= 0:
+            return
+        wait = self.backend.take([(f"client:{client}", self.user_rpm / 60, self.user_burst, 1)], self.clock())
+        if wait > 0:
+            self.rejected["client"] += 1
+            raise RateLimited(wait, "client")
+
+    def try_acquire_spare(self, client: str, tokens: float, client_tokens_per_hour: float = 0.0,
+                          headroom: float = 0.5) -> Optional[str]:
+        """
+        Admit optional work from spare capacity only, never waiting: returns
+        None when admitted, else why not ("budget" or "capacity").
+
+        The client pays from its own budget of `client_tokens_per_hour` (0
+        for no limit), separate from its request bucket. Nothing may be
+        waiting for global capacity, and the global buckets must keep
+        `headroom` of their capacity after paying, so the next interactive
+        requests still find room.
+        """
+        if any(not entry[3].done() for entry in self._queue):
+            return "capacity"
+        budget = []
+        if client_tokens_per_hour > 0:
+            budget = [(f"spare:{client}", client_tokens_per_hour / 3600, client_tokens_per_hour, tokens)]
+        buckets = self._global_buckets(tokens)
+        now = self.clock()
+        # One take for both, so the budget is not spent on work the global buckets refuse
+        if self.backend.take(budget + buckets, now, [0.0] * len(budget) + [headroom] * len(buckets)) == 0:
+            return None
+        return "budget" if budget and self.backend.take(budget, now, charge=False) > 0 else "capacity"
+
+    def _estimated_wait(self, tokens: float) -> float:
+        """Rough time until a new request at the back of the queue would be admitted"""
+        per_request = 60 / self.global_rpm if self.global_rpm > 0 else 0.0
+        per_token = 60 / self.global_tpm if self.global_tpm > 0 else 0.0
+        queued_tokens = sum(entry[2] for entry in self._queue) + tokens
+        return max(per_request * (len(self._queue) + 1), per_token * queued_tokens)
+
+    async def _dispatch(self):
+        """Admit queued requests in priority order as global capacity refills"""
+        try:
+            while self._queue:
+                _, _, tokens, future = self._queue[0]
+                if future.done():  # gave up waiting
+                    heapq.heappop(self._queue)
+                    continue
+                wait = self._take_global(tokens)
+                if wait == 0:
+                    heapq.heappop(self._queue)
+                    future.set_result(None)
+                    continue
+                await asyncio.sleep(wait)
+        finally:
+            self._dispatcher = None
+
+    def stats(self) -> Dict:
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": dict(self.rejected),
+            "queue_depth": sum(1 for entry in self._queue if not entry[3].done())
+        }
+
+    async def close(self):
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+        self.backend.close()
@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from models import ChatMessage
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, collapse whitespace and drop trailing punctuation"""
+    return re.sub(r"\s+", " ", message.lower()).strip().rstrip("?!. ")
+
+
+def make_cache_key(message: str, user_level: str, subject: Optional[str],
+                   history: List[ChatMessage]) -> str:
+    """Key on everything that changes the answer, including the trimmed history"""
+    history_hash = hashlib.sha256(
+        json.dumps([[msg.role, msg.content] for msg in history]).encode("utf-8")
+    ).hexdigest() if history else ""
+    raw = "\x1f".join([normalize_message(message), user_level or "", subject or "", history_hash])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheBackend:
+    """On-disk cache tier that survives restarts"""
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Dict, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at)
+            )
+            self._writes += 1
+            # Prune periodically rather than on every write
+            if self._writes % 100 == 0:
+                self._prune()
+
+    def recent(self, limit: int) -> List[tuple]:
+        """The newest unexpired (key, value, expires_at) rows, oldest of them first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value, expires_at FROM response_cache WHERE expires_at >= ? "
+                "ORDER BY expires_at DESC LIMIT ?", (time.time(), limit)
+            ).fetchall()
+        return [(key, json.loads(value), expires_at) for key, value, expires_at in reversed(rows)]
+
+    def _prune(self):
+        self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+        self._conn.execute(
+            "DELETE FROM response_cache WHERE key IN (SELECT key FROM response_cache "
+            "ORDER BY expires_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,)
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Bounded LRU + TTL cache of tutor answers, optionally backed by SQLite"""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600,
+                 backend: Optional[SQLiteCacheBackend] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.backend = backend
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ResponseCache"]:
+        """Build the cache from RESPONSE_CACHE_* settings; size 0 disables it"""
+        max_entries = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+        if max_entries <= 0:
+            return None
+        path = os.getenv("RESPONSE_CACHE_PATH")
+        backend = SQLiteCacheBackend(path) if path else None
+        return cls(max_entries, float(os.getenv("RESPONSE_CACHE_TTL", 3600)), backend)
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at >= time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(key, value)
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: Dict):
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value, time.time() + self.ttl)
+
+    def warm(self) -> int:
+        """Load the newest persisted answers into memory, e.g. before a worker takes traffic"""
+        if self.backend is None:
+            return 0
+        now = time.time()
+        rows = self.backend.recent(self.max_entries)
+        for key, value, expires_at in rows:
+            self._store(key, value, ttl=expires_at - now)
+        return len(rows)
+
+    def _store(self, key: str, value: Dict, ttl: Optional[float] = None):
+        self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "persistent": self.backend is not None
+        }
+
+    def close(self):
+        if self.backend is not None:
+            self.backend.close()
@@ -0,0 +1,244 @@
+import math
+import os
+import re
+import time
+import zlib
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+# Question framing words carry no meaning for matching paraphrases:
+# "how does photosynthesis work?" and "explain photosynthesis" both reduce to {photosynthesis}
+STOPWORDS = frozenset("""
+a about an and are as at be been being but by can could define definition describe
+did do does doing explain explanation for from give help how i in into is it its
+me mean meaning means my of on or please quick short simple simply so some tell than
+that the their them there these this those to understand was we what whats when where
+which who why will with work works would you your s t
+""".split())
+
+# ...but not for telling questions apart: the cache keeps these as terms and
+# also requires them to match, since "why did World War 2 end?" is not a
+# paraphrase of "when did World War 2 end?"
+QUESTION_WORDS = frozenset("how when where which who why".split())
+CACHE_STOPWORDS = STOPWORDS - QUESTION_WORDS
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Numbers and arithmetic operators, in order; a hyphen inside a word ("x-ray") is not a minus
+OPERAND_RE = re.compile(r"\d+(?:\.\d+)?|[-+*/^=<>%](?<![a-z]-(?=[a-z]))")
+
+DEFAULT_THRESHOLD = 0.9
+
+# Dense-ranked rows re-checked with the exact sparse cosine
+VERIFY_TOP_K = 8
+
+
+def tokenize(text: str, stopwords: FrozenSet[str] = STOPWORDS) -> List[str]:
+    """Lowercased content words with a light plural stemmer ("what's" leaves a stray "s")"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in stopwords:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def guard(text: str) -> Tuple[str, ...]:
+    """What two questions must share to match: their question words, then numbers and operators in order"""
+    text = text.lower()
+    words = sorted(QUESTION_WORDS.intersection(TOKEN_RE.findall(text)))
+    return tuple(words) + ("|",) + tuple(OPERAND_RE.findall(text))
+
+
+def parse_thresholds(spec: str) -> Dict[str, float]:
+    """Parse "beginner:0.85,advanced:0.95" into a per-level threshold map"""
+    thresholds = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        level, _, value = item.partition(":")
+        thresholds[level.strip()] = float(value)
+    return thresholds
+
+
+class SemanticCache:
+    """
+    Near-duplicate question cache over hashed term-frequency vectors.
+
+    Terms are not IDF weighted: in a cache of tutor questions the topic name
+    is always the rarest term, and IDF let it drown out the intent words, so
+    "uses of X" matched "what is X". Framing words are dropped as stopwords
+    instead, which is what makes paraphrases collapse to the same terms.
+    Term vectors ignore word order and one differing term barely moves the
+    cosine of a long question, so every row also keeps its guard (question
+    words, numbers and operators in order) and only rows with the query's
+    guard can match: "what is 3 - 10?" never gets the answer to "10 - 3".
+
+    Vectors live in one preallocated NumPy matrix. An inverted index on the
+    exact token ids narrows a lookup to rows that share a token from the
+    query's prefix (its rarest tokens, up to the point where the remaining
+    norm is below the threshold), which cannot drop any row above the
+    threshold. Only those rows are ranked, with one matrix-vector product,
+    and the top few are verified with the exact sparse cosine so hashing
+    collisions in the dense matrix can never produce a false hit.
+    """
+
+    def __init__(self, capacity: int = 10000, dim: int = 256, ttl: float = 3600,
+                 thresholds: Optional[Dict[str, float]] = None,
+                 default_threshold: float = DEFAULT_THRESHOLD):
+        self.capacity = capacity
+        self.dim = dim
+        self.ttl = ttl
+        self.thresholds = thresholds or {}
+        self.default_threshold = default_threshold
+
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.expires = np.full(capacity, -np.inf)
+        self.last_used = np.full(capacity, -np.inf)
+        self.partitions = np.full(capacity, -1, dtype=np.int32)
+        self.values: List[Optional[Dict]] = [None] * capacity
+        self.row_weights: List[Dict[int, float]] = [{}] * capacity
+        self.row_guards: List[Tuple[str, ...]] = [()] * capacity
+
+        self.postings: Dict[int, set] = {}
+        self.partition_ids: Dict[Tuple[str, str], int] = {}
+        self.free_rows = list(range(capacity - 1, -1, -1))
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["SemanticCache"]:
+        """Build the cache from SEMANTIC_CACHE_* settings; size 0 disables it"""
+        capacity = int(os.getenv("SEMANTIC_CACHE_SIZE", 10000))
+        if capacity <= 0:
+            return None
+        return cls(
+            capacity=capacity,
+            dim=int(os.getenv("SEMANTIC_CACHE_DIM", 256)),
+            ttl=float(os.getenv("SEMANTIC_CACHE_TTL", 3600)),
+            thresholds=parse_thresholds(os.getenv("SEMANTIC_CACHE_THRESHOLDS", "")),
+            default_threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+        )
+
+    def threshold_for(self, user_level: str) -> float:
+        return self.thresholds.get(user_level, self.default_threshold)
+
+    def _weights(self, text: str) -> Dict[int, float]:
+        """Unit-normalized sublinear TF weights keyed by exact token id"""
+        weights: Dict[int, float] = {}
+        for token in tokenize(text, CACHE_STOPWORDS):
+            token_id = zlib.crc32(token.encode("utf-8"))
+            weights[token_id] = weights.get(token_id, 0.0) + 1.0
+        for token_id, tf in weights.items():
+            weights[token_id] = 1.0 + math.log(tf)
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+        return {token_id: w / norm for token_id, w in weights.items()} if norm else {}
+
+    def _embed(self, weights: Dict[int, float]) -> np.ndarray:
+        """Signed feature hashing of the sparse weights into the dense matrix width"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token_id, weight in weights.items():
+            vector[token_id % self.dim] += weight if (token_id >> 16) & 1 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, message: str, user_level: str, subject: Optional[str]) -> Optional[Dict]:
+        """Return the stored answer of the most similar cached question, if similar enough"""
+        partition = self.partition_ids.get((user_level or "", subject or ""))
+        weights = self._weights(message)
+        if partition is None or not weights:
+            self.misses += 1
+            return None
+
+        threshold = self.threshold_for(user_level)
+        candidates = set()
+        remaining = 1.0
+        for token_id in sorted(weights, key=lambda token: len(self.postings.get(token, ()))):
+            if math.sqrt(max(remaining, 0.0)) < threshold:
+                break
+            candidates.update(self.postings.get(token_id, ()))
+            remaining -= weights[token_id] ** 2
+
+        if not candidates:
+            self.misses += 1
+            return None
+
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        now = time.monotonic()
+        rows = rows[(self.partitions[rows] == partition) & (self.expires[rows] > now)]
+        if rows.size == 0:
+            self.misses += 1
+            return None
+
+        scores = self.vectors[rows] @ self._embed(weights)
+        if rows.size > VERIFY_TOP_K:
+            top = np.argpartition(-scores, VERIFY_TOP_K)[:VERIFY_TOP_K]
+            rows, scores = rows[top], scores[top]
+
+        query_guard = guard(message)
+        row, best_score = -1, threshold - 1e-6
+        for candidate in rows.tolist():
+            if self.row_guards[candidate] != query_guard:
+                continue
+            row_weights = self.row_weights[candidate]
+            score = sum(weight * row_weights.get(token_id, 0.0) for token_id, weight in weights.items())
+            if score >= best_score:
+                row, best_score = candidate, score
+
+        if row < 0:
+            self.misses += 1
+            return None
+
+        self.last_used[row] = now
+        self.hits += 1
+        return self.values[row]
+
+    def add(self, message: str, user_level: str, subject: Optional[str], value: Dict):
+        weights = self._weights(message)
+        if not weights:
+            return
+
+        row = self.free_rows.pop() if self.free_rows else self._evict()
+        for token_id in weights:
+            self.postings.setdefault(token_id, set()).add(row)
+        self.size += 1
+
+        key = (user_level or "", subject or "")
+        partition = self.partition_ids.setdefault(key, len(self.partition_ids))
+        now = time.monotonic()
+        self.vectors[row] = self._embed(weights)
+        self.expires[row] = now + self.ttl
+        self.last_used[row] = now
+        self.partitions[row] = partition
+        self.values[row] = value
+        self.row_weights[row] = weights
+        self.row_guards[row] = guard(message)
+
+    def _evict(self) -> int:
+        """Free the least recently used row, preferring expired ones"""
+        now = time.monotonic()
+        row = int(np.argmin(np.where(self.expires < now, -np.inf, self.last_used)))
+        for token_id in self.row_weights[row]:
+            self.postings[token_id].discard(row)
+            if not self.postings[token_id]:
+                del self.postings[token_id]
+        self.size -= 1
+        self.values[row] = None
+        self.partitions[row] = -1
+        self.evictions += 1
+        return row
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": self.size,
+            "capacity": self.capacity,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
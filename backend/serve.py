@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the LearnMate AI Tutor backend
+
+Runs main:app under uvicorn with one worker process per CPU (SERVER_WORKERS),
+uvloop and httptools when they are installed, bounded keep-alive and listen
+backlog, and a graceful shutdown: on SIGTERM each worker stops accepting
+connections, lets in-flight requests finish within SERVER_GRACEFUL_TIMEOUT,
+then drains background batch jobs and upstream calls before exiting.
+`python main.py` stays the auto-reloading development server.
+"""
+import importlib.util
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+
+def installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def server_options() -> dict:
+    limit_concurrency = os.getenv("SERVER_LIMIT_CONCURRENCY")
+    return {
+        "host": os.getenv("HOST", "0.0.0.0"),
+        "port": int(os.getenv("PORT", 8000)),
+        "workers": int(os.getenv("SERVER_WORKERS") or os.cpu_count() or 1),
+        "loop": "uvloop" if installed("uvloop") else "asyncio",
+        "http": "httptools" if installed("httptools") else "h11",
+        "backlog": int(os.getenv("SERVER_BACKLOG", 2048)),
+        "timeout_keep_alive": int(os.getenv("SERVER_KEEPALIVE", 5)),
+        # permessage-deflate keeps ~90 KB of zlib state per WebSocket for frames of a few tokens each
+        "ws_per_message_deflate": os.getenv("SERVER_WS_DEFLATE", "false").lower() in ("1", "true", "yes"),
+        "limit_concurrency": int(limit_concurrency) if limit_concurrency else None,
+        "timeout_graceful_shutdown": int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 30)),
+        "proxy_headers": True,
+        "forwarded_allow_ips": os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "access_log": os.getenv("SERVER_ACCESS_LOG", "false").lower() in ("1", "true", "yes"),
+        "log_level": os.getenv("LOG_LEVEL", "info"),
+    }
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    options = server_options()
+
+    print(f"🚀 Starting LearnMate AI Tutor Backend on {options['host']}:{options['port']} "
+          f"with {options['workers']} workers ({options['loop']} loop, {options['http']} parser)")
+    if options["workers"] > 1:
+        print("ℹ️ Each worker keeps its own memory; set SESSION_STORE_PATH, RESPONSE_CACHE_PATH and "
+              "RATE_LIMIT_STORE_PATH to share sessions, cached answers and rate limits between them")
+
+    uvicorn.run("main:app", **options)
@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from models import ChatMessage
+
+
+class InMemorySessionBackend:
+    """Process-local session storage with an LRU cap on the number of sessions"""
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        data, expires_at = entry
+        if expires_at < time.time():
+            del self._sessions[session_id]
+            return None
+        self._sessions.move_to_end(session_id)
+        return data
+
+    def put(self, session_id: str, data: Dict, expires_at: float):
+        self._sessions[session_id] = (data, expires_at)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    def close(self):
+        self._sessions.clear()
+
+
+class SQLiteSessionBackend:
+    """Session storage shared by every worker on the host and kept across restarts"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tutor_sessions "
+            "(session_id TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM tutor_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or row[1] < time.time():
+            return None
+        return json.loads(row[0])
+
+    def put(self, session_id: str, data: Dict, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tutor_sessions (session_id, data, expires_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(data), expires_at)
+            )
+            self._writes += 1
+            if self._writes % 100 == 0:
+                self._conn.execute("DELETE FROM tutor_sessions WHERE expires_at < ?", (time.time(),))
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM tutor_sessions WHERE session_id = ?", (session_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SessionStore:
+    """
+    Conversation turns kept server-side, so clients only send the new message.
+
+    Each session holds its recent turns plus a rolling summary. When a
+    session passes its message or character cap, the oldest turns are
+    folded into the summary, which is handed to the model as a system note.
+    """
+
+    def __init__(self, backend, ttl: float = 1800, max_messages: int = 50,
+                 max_chars: int = 50000, summary_chars: int = 2000):
+        self.backend = backend
+        self.ttl = ttl
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.summary_chars = summary_chars
+
+    @classmethod
+    def from_env(cls) -> "SessionStore":
+        path = os.getenv("SESSION_STORE_PATH")
+        backend = SQLiteSessionBackend(path) if path else InMemorySessionBackend(
+            int(os.getenv("SESSION_MAX_SESSIONS", 10000)))
+        return cls(
+            backend,
+            ttl=float(os.getenv("SESSION_TTL", 1800)),
+            max_messages=int(os.getenv("SESSION_MAX_MESSAGES", 50)),
+            max_chars=int(os.getenv("SESSION_MAX_CHARS", 50000)),
+            summary_chars=int(os.getenv("SESSION_SUMMARY_CHARS", 2000))
+        )
+
+    def history(self, session_id: str) -> Optional[List[ChatMessage]]:
+        """Stored turns (summary first), or None for an unknown or expired session"""
+        data = self.backend.get(session_id)
+        if data is None:
+            return None
+        # Stored turns were validated when they were appended
+        history = [ChatMessage.model_construct(role="system", content=data["summary"])] if data["summary"] else []
+        history.extend(ChatMessage.model_construct(role=turn["role"], content=turn["content"]) for turn in data["turns"])
+        return history
+
+    def append(self, session_id: str, messages: List[ChatMessage]):
+        """Add turns to a session, creating it if needed and refreshing its TTL"""
+        data = self.backend.get(session_id) or {"turns": [], "summary": ""}
+        data["turns"].extend({"role": msg.role, "content": msg.content} for msg in messages)
+        self._enforce_cap(data)
+        self.backend.put(session_id, data, time.time() + self.ttl)
+
+    def seed(self, session_id: str, history: List[ChatMessage]):
+        """Start a session from history the client still holds (e.g. after a server restart)"""
+        if self.backend.get(session_id) is None:
+            self.append(session_id, [msg for msg in history if msg.role in ("user", "assistant")])
+
+    def delete(self, session_id: str):
+        self.backend.delete(session_id)
+
+    def _enforce_cap(self, data: Dict):
+        turns = data["turns"]
+        chars = sum(len(turn["content"]) for turn in turns)
+        folded = []
+        while turns and (len(turns) > self.max_messages or chars > self.max_chars):
+            turn = turns.pop(0)
+            chars -= len(turn["content"])
+            speaker = "Student asked" if turn["role"] == "user" else "Tutor explained"
+            folded.append(f"- {speaker}: {turn['content'].strip().split(chr(10), 1)[0][:160]}")
+        if folded:
+            lines = [line for line in data["summary"].split("\n")[1:] if line] + folded
+            # Keep the newest summary lines within the character cap
+            while lines and sum(len(line) + 1 for line in lines) > self.summary_chars:
+                lines.pop(0)
+            data["summary"] = "\n".join(["Summary of earlier turns in this session:", *lines])
+
+    def close(self):
+        self.backend.close()
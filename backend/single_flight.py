@@ -0,0 +1,114 @@
+import asyncio
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call between concurrent callers with the same key.
+
+    The first caller (the leader) starts the work as its own task and later
+    callers await that task until it finishes. The task is shielded, so a
+    caller that disconnects does not cancel the work for the others.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared), where shared is True for callers that joined an existing call"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task: asyncio.Future):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller went away
+
+    def stats(self) -> Dict[str, float]:
+        total = self.leaders + self.followers
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "in_flight": len(self._calls),
+            "coalescing_ratio": round(self.followers / total, 4) if total else 0.0
+        }
+
+
+class _Broadcast:
+    def __init__(self):
+        self.events: List[Any] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+
+class StreamFanout(SingleFlight):
+    """
+    Runs one async stream per key and fans its events out to every subscriber.
+
+    Subscribers that join late first replay the events already produced, so
+    each one sees the whole stream. The source is cancelled once the last
+    subscriber leaves, and a later subscriber starts a fresh one.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._calls: Dict[Hashable, _Broadcast] = {}
+
+    async def subscribe(self, key: Hashable, factory: Callable[[], AsyncGenerator]) -> AsyncGenerator:
+        broadcast = self._calls.get(key)
+        if broadcast is None:
+            self.leaders += 1
+            broadcast = self._calls[key] = _Broadcast()
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, factory()))
+        else:
+            self.followers += 1
+
+        broadcast.subscribers += 1
+        index = 0
+        try:
+            while True:
+                while index < len(broadcast.events):
+                    yield broadcast.events[index]
+                    index += 1
+                if broadcast.done:
+                    if broadcast.error is not None:
+                        raise broadcast.error
+                    return
+                # Nothing is awaited between the checks above and this wait, so no event is missed
+                broadcast.changed.clear()
+                await broadcast.changed.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # Forget it before the pump unwinds, so nobody joins a stream that will stop short
+                if self._calls.get(key) is broadcast:
+                    del self._calls[key]
+                broadcast.task.cancel()
+
+    async def _pump(self, key: Hashable, broadcast: _Broadcast, stream: AsyncGenerator):
+        try:
+            async for event in stream:
+                broadcast.events.append(event)
+                broadcast.changed.set()
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            await stream.aclose()
+            broadcast.done = True
+            broadcast.changed.set()
+            if self._calls.get(key) is broadcast:
+                del self._calls[key]
@@ -0,0 +1,102 @@
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+
+@lru_cache(maxsize=4096)
+def message_words(message: str) -> Tuple[str, ...]:
+    """Lowercased words of a message, split once and shared by subject detection and content filtering"""
+    return tuple(WORD_RE.findall(message.lower()))
+
+
+def load_subject_keywords(path: str) -> Dict[str, List[str]]:
+    """Read extra {"subject": ["keyword", ...]} entries from a JSON file"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def merge_subject_keywords(base: Dict[str, List[str]], extra: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    merged = {subject: list(keywords) for subject, keywords in base.items()}
+    for subject, keywords in extra.items():
+        known = merged.setdefault(subject, [])
+        known.extend(keyword for keyword in keywords if keyword not in known)
+    return merged
+
+
+class SubjectDetector:
+    """
+    Whole-word keyword matcher compiled once from the subject keyword map.
+
+    The message is split into words with one regex and every word (and
+    multi-word phrase up to the longest keyword) is looked up in a
+    keyword -> subjects table, so detection is a single pass whose cost does
+    not grow with the number of keywords or subjects. Matching whole words
+    means "base" no longer fires inside "database". Results are cached per
+    message.
+    """
+
+    def __init__(self, subject_keywords: Dict[str, List[str]], cache_size: int = 4096):
+        self.subjects = list(subject_keywords)
+        self.table: Dict[str, Tuple[int, ...]] = {}
+        # First words of multi-word keywords, so plain words skip the phrase lookups
+        self.phrase_starts = set()
+        self.max_words = 1
+
+        for index, (subject, keywords) in enumerate(subject_keywords.items()):
+            # The subject name itself is always a keyword ("computer_science" -> "computer science")
+            for keyword in [subject.replace("_", " "), *keywords]:
+                phrase = " ".join(WORD_RE.findall(keyword.lower()))
+                if not phrase:
+                    continue
+                if index not in self.table.get(phrase, ()):
+                    self.table[phrase] = self.table.get(phrase, ()) + (index,)
+                if " " in phrase:
+                    self.phrase_starts.add(phrase.split(" ", 1)[0])
+                    self.max_words = max(self.max_words, phrase.count(" ") + 1)
+
+        self.detect = lru_cache(maxsize=cache_size)(self._detect)
+
+    def _lookup(self, word: str) -> Tuple[str, Tuple[int, ...]]:
+        """Match a word or its simple plural ("equations" -> "equation")"""
+        table = self.table
+        if word in table:
+            return word, table[word]
+        if len(word) > 3 and word.endswith("s"):
+            for stem in (word[:-1], word[:-2] if word.endswith("es") else None):
+                if stem in table:
+                    return stem, table[stem]
+        return word, ()
+
+    def scores(self, message: str) -> Dict[str, int]:
+        """Number of distinct keywords matched per subject"""
+        words = message_words(message)
+        table, phrase_starts = self.table, self.phrase_starts
+        matched = {}
+        for i, word in enumerate(words):
+            if word in table:
+                keyword, indexes = word, table[word]
+            elif len(word) > 3 and word[-1] == "s":
+                keyword, indexes = self._lookup(word)
+            else:
+                indexes = ()
+            for index in indexes:
+                matched.setdefault(index, set()).add(keyword)
+            if word not in phrase_starts:
+                continue
+            for n in range(2, self.max_words + 1):
+                if i + n > len(words):
+                    break
+                phrase = " ".join(words[i:i + n])
+                for index in table.get(phrase, ()):
+                    matched.setdefault(index, set()).add(phrase)
+        return {self.subjects[index]: len(keywords) for index, keywords in matched.items()}
+
+    def _detect(self, message: str) -> Optional[str]:
+        subject_scores = self.scores(message)
+        if not subject_scores:
+            return None
+        # Ties go to the subject declared first, as before
+        return max(self.subjects, key=lambda subject: subject_scores.get(subject, 0))
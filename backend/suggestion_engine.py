@@ -0,0 +1,289 @@
+import json
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from semantic_cache import STOPWORDS
+
+DEFAULT_GRAPH_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "concept_graph.json")
+
+# Bold markers, words and the punctuation that ends a keyphrase
+TOKEN_RE = re.compile(r"\*\*|[a-z0-9+#]+|[.,;:!?()\[\]\"\n]")
+MARKS = frozenset(["**", ".", ",", ";", ":", "!", "?", "(", ")", "[", "]", '"', "\n"])
+# Trailing characters held back between streamed chunks: a word or bold marker that may continue
+_PARTIAL_CHARS = frozenset("abcdefghijklmnopqrstuvwxyz0123456789+#*")
+
+# Words that never start, end or make up a keyphrase, on top of the question framing words
+KEYPHRASE_STOPWORDS = STOPWORDS | frozenset("""
+all also always another any ask asked back because before both called different doesn each even
+every example examples feel first free get gets good great happy has have here if just keep know
+known let like look made make makes many may might more most much need needs new next not now
+often one only other others our out over question questions really remember same second see should
+step steps such sure take then they thing things think through time too try two up us use used
+uses using very way ways well were while whether yes yet
+""".split())
+
+# Streamed text is scanned once this much has arrived; model chunks are only a few characters
+SCAN_CHARS = 128
+
+# Early mentions usually name the topic of the answer
+EARLY_TOKENS = 60
+
+
+def _stem(word: str) -> str:
+    """Light plural stemmer, as in semantic matching ("equations" -> "equation")"""
+    if len(word) > 3 and word[-1] == "s" and word[-2] != "s":
+        return word[:-1]
+    return word
+
+
+def phrase_stems(phrase: str) -> Tuple[str, ...]:
+    # "s" and "t" are what apostrophes leave behind ("newton's", "don't")
+    return tuple(_stem(word) for word in TOKEN_RE.findall(phrase.lower()) if word.isalnum() and word not in ("s", "t"))
+
+
+@dataclass(frozen=True)
+class Concept:
+    name: str
+    subject: str
+    kind: str
+    related: Tuple[int, ...]
+
+
+class SuggestionEngine:
+    """
+    Builds follow-up suggestions from the concepts an answer covers.
+
+    Each subject's concepts, their phrasings and the concepts related to
+    them come from a bundled concept graph, compiled once into phrase
+    tables. An answer is scanned in a single pass with longest-match phrase
+    lookups; concepts are ranked by mentions, bold emphasis and how early
+    they appear, and the top ones fill templates chosen by concept kind
+    ("Should we go through photosynthesis one stage at a time?", "How does
+    photosynthesis connect to cellular respiration?"). Answers no concept
+    matches get a RAKE-style keyphrase instead, then the subject's generic
+    follow-ups. The scan also runs chunk by chunk on a streamed answer.
+    """
+
+    def __init__(self, graph: Dict, count: int = 3):
+        self.count = count
+        self.templates = graph["templates"]
+        self.fallback = list(graph.get("fallback", []))
+        self.subject_fallback: Dict[str, List[str]] = {}
+        self.concepts: List[Concept] = []
+        # Single words and multi-word phrases -> concept indexes
+        self.words: Dict[str, Tuple[int, ...]] = {}
+        self.phrases: Dict[Tuple[str, ...], Tuple[int, ...]] = {}
+        self.phrase_starts = set()
+        self.max_words = 1
+
+        for subject, spec in graph["subjects"].items():
+            self.subject_fallback[subject] = list(spec.get("fallback", []))
+            offset = len(self.concepts)
+            index_of = {concept["name"]: offset + i for i, concept in enumerate(spec["concepts"])}
+            for concept in spec["concepts"]:
+                if concept["kind"] not in self.templates["explore"]:
+                    raise ValueError(f"Concept {concept['name']!r} has unknown kind {concept['kind']!r}")
+                unknown = [name for name in concept.get("related", []) if name not in index_of]
+                if unknown:
+                    raise ValueError(f"Concept {concept['name']!r} is related to unknown concepts {unknown}")
+                index = index_of[concept["name"]]
+                self.concepts.append(Concept(
+                    name=concept["name"], subject=subject, kind=concept["kind"],
+                    related=tuple(index_of[name] for name in concept.get("related", []))
+                ))
+                for phrase in concept["phrases"]:
+                    self._add_phrase(phrase_stems(phrase), index)
+
+    def _add_phrase(self, stems: Tuple[str, ...], index: int):
+        if not stems:
+            return
+        if len(stems) == 1:
+            table, key = self.words, stems[0]
+        else:
+            table, key = self.phrases, stems
+            self.phrase_starts.add(stems[0])
+            self.max_words = max(self.max_words, len(stems))
+        if index not in table.get(key, ()):
+            table[key] = table.get(key, ()) + (index,)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "SuggestionEngine":
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f), **kwargs)
+
+    @classmethod
+    def from_env(cls) -> "SuggestionEngine":
+        """Compile CONCEPT_GRAPH_PATH, making up to SUGGESTION_COUNT suggestions per answer"""
+        return cls.load(os.getenv("CONCEPT_GRAPH_PATH") or DEFAULT_GRAPH_PATH,
+                        count=int(os.getenv("SUGGESTION_COUNT", 3)))
+
+    def extractor(self, subject: Optional[str]) -> "SuggestionExtractor":
+        """Incremental scanner for an answer that arrives in chunks"""
+        return SuggestionExtractor(self, subject)
+
+    def suggest(self, text: str, subject: Optional[str]) -> List[str]:
+        extractor = self.extractor(subject)
+        extractor.feed(text)
+        return extractor.suggestions()
+
+
+class SuggestionExtractor:
+    """Concept mentions of one answer, collected as its text is fed in"""
+
+    def __init__(self, engine: SuggestionEngine, subject: Optional[str]):
+        self.engine = engine
+        self.subject = subject
+        # Stem, word and bold flag per token; punctuation is kept (word None) to end keyphrases
+        self._stems: List[str] = []
+        self._words: List[Optional[str]] = []
+        self._bolds: List[bool] = []
+        self._pending = ""
+        self._bold = False
+        self._next = 0
+        # concept index -> [mentions, bold mentions, first token position]
+        self._hits: Dict[int, List[int]] = {}
+
+    def feed(self, text: str):
+        text = self._pending + text.lower()
+        if len(text) < SCAN_CHARS:
+            self._pending = text
+            return
+        cut = len(text)
+        while cut and text[cut - 1] in _PARTIAL_CHARS:
+            cut -= 1
+        self._pending = text[cut:]
+        self._tokenize(text[:cut])
+        self._match(final=False)
+
+    def _tokenize(self, text: str):
+        stems, words, bolds, bold = self._stems, self._words, self._bolds, self._bold
+        for token in TOKEN_RE.findall(text):
+            if token in MARKS:
+                if token == "**":
+                    bold = not bold
+                    continue
+                word = None
+            elif token == "s" or token == "t":
+                continue
+            else:
+                word = token
+                # _stem, inlined: this loop runs once per word of every answer
+                if len(token) > 3 and token[-1] == "s" and token[-2] != "s":
+                    token = token[:-1]
+            stems.append(token)
+            words.append(word)
+            bolds.append(bold and word is not None)
+        self._bold = bold
+
+    def _match(self, final: bool):
+        """Longest-match phrase lookups, stopping short of words whose phrases may not have arrived yet"""
+        engine, stems, bolds = self.engine, self._stems, self._bolds
+        words, phrases, phrase_starts, max_words = engine.words, engine.phrases, engine.phrase_starts, engine.max_words
+        total = len(stems)
+        end = total if final else total - max_words + 1
+        i = self._next
+        while i < end:
+            stem = stems[i]
+            length = 0
+            if stem in phrase_starts:
+                for n in range(min(max_words, total - i), 1, -1):
+                    indexes = phrases.get(tuple(stems[i:i + n]))
+                    if indexes:
+                        self._record(indexes, i, bolds[i])
+                        length = n
+                        break
+            if not length and stem in words:
+                self._record(words[stem], i, bolds[i])
+            i += length or 1
+        self._next = max(i, self._next)
+
+    def _record(self, indexes: Tuple[int, ...], position: int, bold: bool):
+        for index in indexes:
+            hit = self._hits.get(index)
+            if hit is None:
+                hit = self._hits[index] = [0, 0, position]
+            hit[0] += 1
+            hit[1] += bold
+
+    def ranked(self) -> List[int]:
+        """Mentioned concepts, most central first; concepts of other subjects count half"""
+        def score(index: int) -> float:
+            mentions, bold, first = self._hits[index]
+            value = mentions + 2 * bold + (1 if first < EARLY_TOKENS else 0)
+            if self.subject is not None and self.engine.concepts[index].subject != self.subject:
+                value /= 2
+            return value
+        return sorted(self._hits, key=lambda index: (-score(index), self._hits[index][2]))
+
+    def suggestions(self) -> List[str]:
+        """Finish the scan and build the follow-ups"""
+        self._tokenize(self._pending)
+        self._pending = ""
+        self._match(final=True)
+
+        engine, templates = self.engine, self.engine.templates
+        ranked = self.ranked()
+        suggestions = []
+        if ranked:
+            top = engine.concepts[ranked[0]]
+            suggestions.append(templates["explore"][top.kind].format(concept=top.name))
+            unexplored = [index for index in top.related if index not in self._hits]
+            if unexplored:
+                suggestions.append(templates["connect"].format(
+                    concept=top.name, related=engine.concepts[unexplored[0]].name))
+            if len(ranked) > 1:
+                second = engine.concepts[ranked[1]]
+                suggestions.append(templates["explore"][second.kind].format(concept=second.name))
+            elif len(unexplored) > 1:
+                suggestions.append(templates["next"].format(related=engine.concepts[unexplored[1]].name))
+
+        if len(suggestions) < 2:
+            phrase = self._keyphrase()
+            if phrase:
+                suggestions.append(templates["keyphrase"].format(phrase=phrase))
+
+        subject = self.subject or (engine.concepts[ranked[0]].subject if ranked else None)
+        for fallback in engine.subject_fallback.get(subject, []) + engine.fallback:
+            if len(suggestions) >= 2:
+                break
+            suggestions.append(fallback)
+        return suggestions[:engine.count]
+
+    def _keyphrase(self) -> Optional[str]:
+        """
+        Best RAKE keyphrase: runs of up to three content words between stopwords
+        and punctuation, scored by word degree over frequency. Only phrases that
+        are repeated or bold count, so one-off wording is not picked.
+        """
+        runs: List[List[Tuple[str, str, bool]]] = [[]]
+        for stem, word, bold in zip(self._stems, self._words, self._bolds):
+            if word is None or word in KEYPHRASE_STOPWORDS or len(word) < 3 or word.isdigit():
+                if runs[-1]:
+                    runs.append([])
+            else:
+                runs[-1].append((stem, word, bold))
+
+        frequency, degree, phrases = {}, {}, {}
+        for run in runs:
+            if not run or len(run) > 3:
+                continue
+            for stem, _, _ in run:
+                frequency[stem] = frequency.get(stem, 0) + 1
+                degree[stem] = degree.get(stem, 0) + len(run)
+            key = tuple(stem for stem, _, _ in run)
+            entry = phrases.get(key)
+            if entry is None:
+                entry = phrases[key] = [0, False, " ".join(word for _, word, _ in run)]
+            entry[0] += 1
+            entry[1] = entry[1] or any(bold for _, _, bold in run)
+
+        best, best_score = None, 0.0
+        for key, (count, bold, text) in phrases.items():
+            if count < 2 and not bold:
+                continue
+            score = sum(degree[stem] / frequency[stem] for stem in key) + (1 if bold else 0)
+            if score > best_score:
+                best, best_score = text, score
+        return best
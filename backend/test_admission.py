@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Regression test: only requests that reach the model spend the upstream quota
+
+The global buckets allow one upstream request. The first question spends
+it; repeats of it are cache hits and must still be answered, and an empty
+message must be refused before it costs anything. Runs offline: the
+upstream call is replaced by a canned answer. Run with pytest or directly.
+"""
+import os
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.update(LOCAL_ANSWER_THRESHOLD="2", TRANSCRIPT_LOG_PATH="", WARMUP_CONNECTIONS="0")
+
+import main  # noqa: E402
+from rate_limiter import AdmissionController, InMemoryBucketBackend  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+
+QUESTION = "How do volcanoes form along plate boundaries?"
+
+
+async def canned_upstream(messages, route=None):
+    return "Volcanoes form where plates pull apart or one plate sinks beneath another."
+
+
+def test_cache_hits_and_invalid_requests_skip_the_upstream_quota():
+    admission, response_cache = main.admission, main.ai_tutor.response_cache
+    with TestClient(main.app) as http:
+        main.admission = AdmissionController(InMemoryBucketBackend(), user_rpm=0, global_rpm=1, global_tpm=0,
+                                             max_wait=0.1)
+        main.ai_tutor.response_cache = ResponseCache()
+        main.ai_tutor._call_openai = canned_upstream
+        try:
+            assert http.post("/api/tutor/chat", json={"message": "   "}).status_code == 400
+            first = http.post("/api/tutor/chat", json={"message": QUESTION})
+            repeats = [http.post("/api/tutor/chat", json={"message": QUESTION}).status_code for _ in range(5)]
+            fresh = http.post("/api/tutor/chat", json={"message": "Why do earthquakes happen near volcanoes?"})
+            streamed = http.post("/api/tutor/chat/stream", json={"message": QUESTION})
+            stats = main.admission.stats()
+        finally:
+            main.admission, main.ai_tutor.response_cache = admission, response_cache
+    assert first.status_code == 200, first.text
+    assert repeats == [200] * 5, repeats
+    assert "event: done" in streamed.text, streamed.text
+    # The quota is spent: a question that needs the model waits, then gets a 429
+    assert fresh.status_code == 429 and fresh.headers.get("Retry-After"), fresh.text
+    assert stats["admitted"] == 1, stats
+
+
+if __name__ == "__main__":
+    test_cache_hits_and_invalid_requests_skip_the_upstream_quota()
+    print("✅ only upstream calls spend the upstream quota")
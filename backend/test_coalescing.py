@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Regression test: coalesced answers must not leak one caller's session to another
+
+Two identical questions asked at once share one upstream call. The caller
+with a server-side session must get its session id back; the caller
+without one must not get it. Runs offline: the upstream call is replaced
+by a short sleep. Run with pytest or directly.
+"""
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.update(RESPONSE_CACHE_SIZE="0", SEMANTIC_CACHE_SIZE="0", LOCAL_ANSWER_THRESHOLD="2",
+                  PREFETCH_SUGGESTIONS="0", TRANSCRIPT_LOG_PATH="")
+
+import main  # noqa: E402
+from models import TutorRequest  # noqa: E402
+
+
+async def slow_upstream(messages, route=None):
+    await asyncio.sleep(0.05)
+    return "Photosynthesis turns light into chemical energy stored in glucose."
+
+
+async def ask_together():
+    main.ai_tutor._call_openai = slow_upstream
+    question = "How does photosynthesis turn sunlight into food for the plant?"
+    with_session = TutorRequest(message=question, session_id="alice-secret")
+    without_session = TutorRequest(message=question)
+    try:
+        return await asyncio.gather(main.answer_request(with_session, "ip:alice"),
+                                    main.answer_request(without_session, "ip:bob"))
+    finally:
+        main.session_store.delete("alice-secret")
+
+
+def test_coalesced_answers_keep_their_own_session():
+    followers = main.ai_tutor.inflight.followers
+    alice, bob = asyncio.run(ask_together())
+    assert main.ai_tutor.inflight.followers == followers + 1, "the two questions were not coalesced"
+    assert alice.session_id == "alice-secret"
+    assert bob.session_id is None
+    assert alice is not bob
+
+
+if __name__ == "__main__":
+    test_coalesced_answers_keep_their_own_session()
+    print("✅ coalesced answers keep their own session")
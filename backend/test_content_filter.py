@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+The content filter must let through what the tutor itself asks students to send
+
+Every follow-up SuggestionEngine can produce (each concept's explore
+template, each connection and next-topic suggestion, every fallback) is a
+message a student sends by clicking it, so all of them must pass the
+filter, as must the short replies students give mid-lesson. Clear
+off-topic requests must still be redirected. Run with pytest or directly.
+"""
+from content_filter import ContentFilter
+from suggestion_engine import SuggestionEngine
+
+REPLIES = ["I dont understand", "I don't get it", "ok thanks", "yes please", "go on", "what do you mean?",
+           "can you explain that again?", "Can you give me another example?"]
+
+OFF_TOPIC = ["What's the weather like tomorrow?", "Who won the game last night?", "Tell me a joke",
+             "Recommend me a video game", "ok bye"]
+
+
+def suggestion_templates(engine: SuggestionEngine):
+    templates = engine.templates
+    messages = set(engine.fallback)
+    for fallback in engine.subject_fallback.values():
+        messages.update(fallback)
+    for concept in engine.concepts:
+        messages.add(templates["explore"][concept.kind].format(concept=concept.name))
+        for related in concept.related:
+            name = engine.concepts[related].name
+            messages.add(templates["connect"].format(concept=concept.name, related=name))
+            messages.add(templates["next"].format(related=name))
+        messages.add(templates["keyphrase"].format(phrase=concept.name))
+    return sorted(messages)
+
+
+def test_suggestions_pass_the_filter():
+    content_filter = ContentFilter.from_env()
+    rejected = [message for message in suggestion_templates(SuggestionEngine.from_env())
+                if not content_filter.is_educational(message)]
+    assert not rejected, f"{len(rejected)} suggestions rejected, e.g. {rejected[:5]}"
+
+
+def test_replies_pass_and_off_topic_is_redirected():
+    content_filter = ContentFilter.from_env()
+    assert [message for message in REPLIES if not content_filter.is_educational(message)] == []
+    assert [message for message in OFF_TOPIC if content_filter.is_educational(message)] == []
+
+
+if __name__ == "__main__":
+    test_suggestions_pass_the_filter()
+    test_replies_pass_and_off_topic_is_redirected()
+    print("✅ suggestions and replies pass the content filter")
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Regression test: an abandoned speculation stops its upstream call
+
+A follow-up answered ahead of time is cancelled when the student asks
+something else. The cancellation must reach the upstream call itself, and
+a call that never finished must not count as speculative spend. Runs
+offline: the upstream call is replaced by a long sleep. Run with pytest or
+directly.
+"""
+import asyncio
+import os
+from datetime import datetime
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.update(RESPONSE_CACHE_SIZE="0", SEMANTIC_CACHE_SIZE="0", LOCAL_ANSWER_THRESHOLD="2",
+                  PREFETCH_SUGGESTIONS="0", TRANSCRIPT_LOG_PATH="")
+
+import main  # noqa: E402
+from models import TutorRequest, TutorResponse  # noqa: E402
+
+
+async def speculate_and_abandon():
+    """What the upstream call saw, read before asyncio.run cancels whatever is left"""
+    upstream = {"started": False, "cancelled": False}
+
+    async def slow_upstream(messages, route=None):
+        upstream["started"] = True
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            upstream["cancelled"] = True
+            raise
+        return "The Treaty of Westphalia ended the Thirty Years' War."
+
+    main.ai_tutor._call_openai = slow_upstream
+    request = TutorRequest(message="What caused the Thirty Years' War?", session_id="prefetch-test")
+    response = TutorResponse(response="Religious and political rivalries in the Holy Roman Empire.",
+                             suggestions=["Shall we look at the Treaty of Westphalia next?"],
+                             route="default", timestamp=datetime.now())
+    main.prefetcher.schedule(request, response, [], "ip:prefetch-test")
+    await asyncio.sleep(0.05)
+    main.prefetcher.discard("prefetch-test")
+    await asyncio.sleep(0.05)
+    return dict(upstream)
+
+
+def test_abandoned_speculation_stops_upstream_call():
+    prefetcher = main.prefetcher
+    before = prefetcher.stats()
+    prefetcher.suggestions = 1
+    try:
+        upstream = asyncio.run(speculate_and_abandon())
+    finally:
+        prefetcher.suggestions = 0
+    after = prefetcher.stats()
+    assert after["started"] == before["started"] + 1, "the follow-up was not speculated"
+    assert upstream["started"]
+    assert upstream["cancelled"], "the upstream call kept running after the speculation was cancelled"
+    assert after["results"]["cancelled"] == before["results"]["cancelled"] + 1
+    assert after["upstream_calls"] == before["upstream_calls"]
+    assert after["spent_tokens"] == before["spent_tokens"]
+    assert after["in_flight"] == 0
+
+
+if __name__ == "__main__":
+    test_abandoned_speculation_stops_upstream_call()
+    print("✅ abandoned speculations stop their upstream call")
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Regression test: spare-capacity work pays both its budgets or neither
+
+A speculative answer needs room in the client's own token budget and in
+the global buckets. When the global buckets refuse, the client's budget
+must be left as it was, so that a busy moment does not eat into the
+follow-ups the client may still be offered later. Run with pytest or
+directly.
+"""
+from rate_limiter import AdmissionController, InMemoryBucketBackend
+
+
+def test_refused_spare_capacity_does_not_spend_the_budget():
+    now = [1000.0]
+    admission = AdmissionController(InMemoryBucketBackend(), user_rpm=0, global_rpm=0, global_tpm=1000,
+                                    clock=lambda: now[0])
+    # The global buckets cannot keep half their capacity after paying 600 tokens
+    refused = [admission.try_acquire_spare("ip:student", 600, client_tokens_per_hour=1000) for _ in range(3)]
+    assert refused == ["capacity"] * 3, refused
+    # The budget is still whole: 400 + 400 fit in it, with the global buckets refilled in between
+    assert admission.try_acquire_spare("ip:student", 400, client_tokens_per_hour=1000) is None
+    now[0] += 60
+    assert admission.try_acquire_spare("ip:student", 400, client_tokens_per_hour=1000) is None
+    now[0] += 60
+    assert admission.try_acquire_spare("ip:student", 400, client_tokens_per_hour=1000) == "budget"
+
+
+if __name__ == "__main__":
+    test_refused_spare_capacity_does_not_spend_the_budget()
+    print("✅ refused spare capacity leaves the budget alone")
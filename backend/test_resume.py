@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Regression test: a lost session resumes from the client's copy of the conversation
+
+After a restart or an eviction the server no longer knows the session. The
+client's recent turns, sent along with the question, must reach the model
+and start the session again, over HTTP and over the WebSocket. Runs
+offline: the upstream call is replaced by a canned answer. Run with pytest
+or directly.
+"""
+import os
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.update(RESPONSE_CACHE_SIZE="0", SEMANTIC_CACHE_SIZE="0", LOCAL_ANSWER_THRESHOLD="2",
+                  PREFETCH_SUGGESTIONS="0", TRANSCRIPT_LOG_PATH="", WARMUP_CONNECTIONS="0")
+
+import main  # noqa: E402
+from test_streaming import chunk  # noqa: E402
+
+EARLIER = [{"role": "user", "content": "What is a prime number?"},
+           {"role": "assistant", "content": "A number whose only divisors are 1 and itself."}]
+FOLLOW_UP = "Is 91 one of them?"
+
+
+class CannedStream:
+    """Completions that stream a canned answer and keep every prompt they were sent"""
+
+    def __init__(self):
+        self.prompts = []
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, messages, **kwargs):
+        self.prompts.append(" ".join(str(message["content"]) for message in messages))
+        return self._stream()
+
+    async def _stream(self):
+        yield chunk("No: 91 is 7 times 13.")
+
+
+def test_lost_session_resumes_from_the_client_history():
+    upstream = CannedStream()
+    with TestClient(main.app) as http:
+        client = main.ai_tutor.client
+        main.ai_tutor.client = upstream
+        try:
+            http.post("/api/tutor/chat/stream", json={"message": FOLLOW_UP, "session_id": "resume-sse",
+                                                      "conversation_history": EARLIER})
+            with http.websocket_connect("/ws/tutor?session_id=resume-ws") as socket:
+                assert socket.receive_json()["history"] == 0
+                socket.send_json({"type": "ask", "id": "q1", "message": "Is 57 one of them?",
+                                  "conversation_history": EARLIER})
+                while socket.receive_json()["type"] == "token":
+                    pass
+                # Later questions on the connection keep the resumed conversation without resending it
+                socket.send_json({"type": "ask", "id": "q2", "message": "And 97?"})
+                while socket.receive_json()["type"] == "token":
+                    pass
+            sessions = {session_id: main.session_store.history(session_id) or []
+                        for session_id in ("resume-sse", "resume-ws")}
+        finally:
+            main.ai_tutor.client = client
+    prompts = upstream.prompts
+    assert len(prompts) == 3 and all(EARLIER[0]["content"] in prompt for prompt in prompts), prompts
+    assert len(sessions["resume-sse"]) == 4 and len(sessions["resume-ws"]) == 6, sessions
+
+
+if __name__ == "__main__":
+    test_lost_session_resumes_from_the_client_history()
+    print("✅ lost sessions resume from the client's history")
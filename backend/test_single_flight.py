@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Regression test: a stream abandoned by its last subscriber is not joined
+
+Once the only subscriber leaves, the shared stream is cancelled. A
+subscriber arriving before the cancellation has unwound must start a
+fresh stream and see it to the end, not replay the abandoned one and stop
+short. Run with pytest or directly.
+"""
+import asyncio
+
+from single_flight import StreamFanout
+
+
+async def count_to_three():
+    for n in ("one", "two", "three"):
+        await asyncio.sleep(0)
+        yield n
+
+
+async def leave_then_rejoin():
+    fanout = StreamFanout()
+    first = fanout.subscribe("key", count_to_three)
+    assert await first.__anext__() == "one"
+    await first.aclose()  # the last subscriber leaves: the pump is cancelled but has not unwound yet
+    events = [event async for event in fanout.subscribe("key", count_to_three)]
+    return fanout, events
+
+
+def test_subscriber_after_cancel_gets_a_whole_stream():
+    fanout, events = asyncio.run(leave_then_rejoin())
+    assert events == ["one", "two", "three"], events
+    assert fanout.leaders == 2 and fanout.followers == 0, fanout.stats()
+
+
+if __name__ == "__main__":
+    test_subscriber_after_cancel_gets_a_whole_stream()
+    print("✅ an abandoned stream is never joined")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Regression test: an answer cut off mid-stream is never kept
+
+The upstream sends three chunks and then drops the connection. The stream
+must end in an error, and neither the exact nor the semantic cache may
+hold the partial answer afterwards. Over SSE and the WebSocket the turn
+ends in an error instead of done and is not written to the session. Runs
+offline against a fake OpenAI client. Run with pytest or directly.
+"""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import httpx
+import openai
+from fastapi.testclient import TestClient
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.update(LOCAL_ANSWER_THRESHOLD="2", TRANSCRIPT_LOG_PATH="", WARMUP_CONNECTIONS="0")
+
+import main  # noqa: E402
+from ai_tutor_service import AITutorService, StreamInterrupted  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from semantic_cache import SemanticCache  # noqa: E402
+
+QUESTION = "How do glaciers carve U-shaped valleys?"
+PARAPHRASE = "Explain how glaciers carve U-shaped valleys"
+
+
+def chunk(text: str):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+class BrokenStream:
+    """Completions that send a few chunks, then fail like a dropped connection"""
+
+    def __init__(self, parts=("part1 ", "part2 ", "part3")):
+        self.parts = parts
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, **kwargs):
+        return self._stream()
+
+    async def _stream(self):
+        for part in self.parts:
+            yield chunk(part)
+        raise openai.APIConnectionError(request=httpx.Request("POST", "http://upstream/v1/chat/completions"))
+
+
+async def stream_cut_off(service: AITutorService):
+    """The tokens seen and the exception the stream ended with"""
+    tokens = []
+    try:
+        async for kind, value in service.stream_response(QUESTION, [], user_level="beginner"):
+            if kind == "token":
+                tokens.append(value)
+            else:
+                return tokens, None
+    except Exception as e:
+        return tokens, e
+
+
+def test_cut_off_stream_raises_and_is_not_cached():
+    service = AITutorService()
+    service.client = BrokenStream()
+    service.response_cache = ResponseCache()
+    service.semantic_cache = SemanticCache(capacity=100)
+    tokens, error = asyncio.run(stream_cut_off(service))
+    assert tokens == ["part1 ", "part2 ", "part3"]
+    assert isinstance(error, StreamInterrupted), f"the stream ended with {error!r}"
+    for message in (QUESTION, PARAPHRASE):
+        _, cached = service._cache_lookup(message, [], None, "beginner")
+        assert cached is None, f"{message!r} was served the partial answer {cached.response!r}"
+
+
+
+def sse_events(body: str):
+    return [line[7:] for line in body.splitlines() if line.startswith("event: ")]
+
+
+def test_cut_off_stream_is_an_error_and_not_recorded():
+    with TestClient(main.app) as http:
+        client = main.ai_tutor.client
+        main.ai_tutor.client = BrokenStream()
+        try:
+            response = http.post("/api/tutor/chat/stream",
+                                 json={"message": QUESTION + " (sse)", "session_id": "cut-off-sse"})
+            events = sse_events(response.text)
+            with http.websocket_connect("/ws/tutor?session_id=cut-off-ws") as socket:
+                socket.send_json({"type": "ask", "id": "q1", "message": QUESTION + " (ws)"})
+                assert socket.receive_json()["type"] == "ready"
+                frames = []
+                while not frames or frames[-1]["type"] == "token":
+                    frames.append(socket.receive_json())
+        finally:
+            main.ai_tutor.client = client
+    assert events[-1] == "error" and "done" not in events, events
+    assert frames[-1]["type"] == "error" and frames[-1]["status"] == 502, frames[-1]
+    for session_id in ("cut-off-sse", "cut-off-ws"):
+        assert not main.session_store.history(session_id), f"{session_id} recorded the partial answer"
+
+
+if __name__ == "__main__":
+    test_cut_off_stream_raises_and_is_not_cached()
+    test_cut_off_stream_is_an_error_and_not_recorded()
+    print("✅ cut-off streams are reported as errors and never kept")
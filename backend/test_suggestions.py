@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Suggested follow-ups must not be routed to the heavy model tier by their wording
+
+A beginner who clicks a follow-up (and the prefetcher that answers it
+ahead of time) should pay for the question, not for a phrase in the
+template: "step by step" is a keyword of the proof route. Every follow-up
+SuggestionEngine can produce is routed as a beginner's second turn, with
+and without its subject. Run with pytest or directly.
+"""
+from model_router import ModelRouter
+from suggestion_engine import SuggestionEngine
+from test_content_filter import suggestion_templates
+
+
+def test_suggestions_stay_off_the_keyword_routes():
+    engine, router = SuggestionEngine.from_env(), ModelRouter.from_env("gpt-3.5-turbo")
+    keyword_routes = {rule.route.name for rule in router.rules if rule.keywords}
+    subjects = {concept.subject for concept in engine.concepts}
+    routed = [(message, subject, router.route(message, subject, "beginner", 2).name)
+              for message in suggestion_templates(engine) for subject in (None, *sorted(subjects))]
+    heavy = [(message, subject, route) for message, subject, route in routed if route in keyword_routes]
+    assert not heavy, f"{len(heavy)} suggestions hit a keyword route, e.g. {heavy[:3]}"
+
+
+if __name__ == "__main__":
+    test_suggestions_stay_off_the_keyword_routes()
+    print("✅ suggestions stay off the keyword routes")
@@ -0,0 +1,187 @@
+import asyncio
+import os
+import sqlite3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Deque, Dict, List, Optional
+
+import orjson
+
+OVERFLOW_POLICIES = ("drop_newest", "drop_oldest", "block")
+
+COLUMNS = ("created_at", "session_id", "client", "subject", "user_level", "route",
+           "message", "response", "context_tokens", "confidence")
+
+
+class SQLiteTranscriptSink:
+    """Transcripts as rows of one SQLite table, each batch committed in a single transaction"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tutor_transcripts (id INTEGER PRIMARY KEY, created_at TEXT NOT NULL, "
+            "session_id TEXT, client TEXT, subject TEXT, user_level TEXT, route TEXT, "
+            "message TEXT NOT NULL, response TEXT NOT NULL, context_tokens INTEGER, confidence REAL)"
+        )
+        self._insert = (f"INSERT INTO tutor_transcripts ({', '.join(COLUMNS)}) "
+                        f"VALUES ({', '.join(':' + column for column in COLUMNS)})")
+
+    def write(self, records: List[Dict]):
+        with self._conn:
+            self._conn.executemany(self._insert, records)
+
+    def close(self):
+        self._conn.close()
+
+
+class JSONLTranscriptSink:
+    """Transcripts appended to a file as one JSON object per line"""
+
+    def __init__(self, path: str):
+        # Unbuffered: each batch is a single append, so workers sharing the file never interleave lines
+        self._file = open(path, "ab", buffering=0)
+
+    def write(self, records: List[Dict]):
+        self._file.write(b"".join(orjson.dumps(record) + b"\n" for record in records))
+
+    def close(self):
+        self._file.close()
+
+
+def open_sink(path: str):
+    """SQLite for .db/.sqlite/.sqlite3 paths, JSON lines for anything else"""
+    if os.path.splitext(path)[1].lower() in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteTranscriptSink(path)
+    return JSONLTranscriptSink(path)
+
+
+class TranscriptLog:
+    """
+    Write-behind persistence of tutor exchanges for analytics.
+
+    Handlers only append a record to a bounded in-memory queue; a
+    background task writes the queue to the sink in batches on a single
+    writer thread, every `flush_interval` seconds or as soon as a full
+    batch is waiting. When the queue is full the overflow policy decides:
+    drop the new record, drop the oldest queued one, or make the handler
+    wait (up to `block_timeout`) for the writer to catch up. Whatever is
+    still queued is written on close.
+    """
+
+    def __init__(self, sink, max_queue: int = 10000, batch_size: int = 500,
+                 flush_interval: float = 1.0, overflow: str = "drop_newest", block_timeout: float = 1.0):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown transcript overflow policy {overflow!r}, expected one of {OVERFLOW_POLICIES}")
+        self.sink = sink
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self._queue: Deque[Dict] = deque()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcripts")
+        # Created in start(), on the serving event loop
+        self._wake: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["TranscriptLog"]:
+        """A log writing to TRANSCRIPT_LOG_PATH, or None when transcripts are not kept"""
+        path = os.getenv("TRANSCRIPT_LOG_PATH")
+        if not path:
+            return None
+        return cls(
+            open_sink(path),
+            max_queue=int(os.getenv("TRANSCRIPT_QUEUE_SIZE", 10000)),
+            batch_size=int(os.getenv("TRANSCRIPT_BATCH_SIZE", 500)),
+            flush_interval=float(os.getenv("TRANSCRIPT_FLUSH_INTERVAL", 1.0)),
+            overflow=os.getenv("TRANSCRIPT_OVERFLOW", "drop_newest"),
+            block_timeout=float(os.getenv("TRANSCRIPT_BLOCK_TIMEOUT", 1.0))
+        )
+
+    def start(self):
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    def record(self, record: Dict) -> bool:
+        """Queue one record without waiting; False if the overflow policy dropped it"""
+        if len(self._queue) >= self.max_queue:
+            if self.overflow == "drop_oldest":
+                self._queue.popleft()
+                self.dropped += 1
+            else:
+                self.dropped += 1
+                return False
+        self._queue.append(record)
+        if len(self._queue) >= self.batch_size and self._wake is not None:
+            self._wake.set()
+        return True
+
+    async def put(self, record: Dict) -> bool:
+        """Queue one record, waiting for room first under the "block" policy"""
+        if self.overflow == "block" and len(self._queue) >= self.max_queue and self._space is not None:
+            deadline = asyncio.get_running_loop().time() + self.block_timeout
+            while len(self._queue) >= self.max_queue:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                self._space.clear()
+                self._wake.set()
+                try:
+                    await asyncio.wait_for(self._space.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        return self.record(record)
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Write everything queued so far, one batch at a time"""
+        loop = asyncio.get_running_loop()
+        while self._queue:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            if self._space is not None:
+                self._space.set()
+            try:
+                await loop.run_in_executor(self._executor, self.sink.write, batch)
+                self.written += len(batch)
+                self.batches += 1
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"⚠️ Failed to write {len(batch)} transcripts: {e}")
+
+    async def close(self):
+        """Stop the background writer, write what is still queued and close the sink"""
+        self._closing = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+        await self.flush()
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.sink.close)
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> Dict:
+        return {
+            "queued": len(self._queue),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "batches": self.batches,
+            "overflow": self.overflow
+        }
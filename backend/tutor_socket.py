@@ -0,0 +1,283 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+
+from fastapi import HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from fast_json import dumps, loads
+from models import ChatMessage, TutorRequest, TutorResponse
+
+# ("token", text) chunks, then ("done", response) for an answered turn or ("off_topic", response) for a redirect
+TurnHandler = Callable[[TutorRequest, List[ChatMessage], str], AsyncIterator[Tuple[str, Union[str, TutorResponse]]]]
+
+CLOSE_NORMAL = 1000
+CLOSE_GOING_AWAY = 1001
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class TutorSocketHub:
+    """
+    Persistent chat connections for /ws/tutor.
+
+    A student opens one WebSocket and asks every question over it, so turns
+    skip the CORS preflight, header parsing and connection setup of a new
+    POST, and the conversation stays on the connection instead of being
+    re-sent or looked up per turn (answered turns are still written to the
+    session store, so a reconnect resumes them). Frames are JSON objects:
+
+        -> {"type": "ask", "id": "q1", "message": "...", "subject": ..., "user_level": ...}
+           (plus "conversation_history" when "ready" reported no history but the client has some)
+        -> {"type": "cancel", "id": "q1"}           <- {"type": "cancelled", "id": "q1"}
+        <- {"type": "token", "id": "q1", "token": "..."}
+        <- {"type": "done", "id": "q1", "response": {TutorResponse}}
+        <- {"type": "error", "id": "q1", "status": 429, "message": "...", "retry_after": 3}
+
+    Several questions may be in flight at once, told apart by their id. The
+    server sends {"type": "ping"} after `heartbeat_interval` seconds without
+    traffic and the client answers {"type": "pong"}; a client silent for
+    `heartbeat_timeout` seconds is disconnected. Token frames not yet sent
+    to a slow client are merged, so its backlog stays one frame per question
+    and never holds up the shared upstream stream; a client that takes
+    longer than `send_timeout` to accept a frame is disconnected.
+    """
+
+    def __init__(self, handler: TurnHandler, heartbeat_interval: float = 20.0, heartbeat_timeout: float = 60.0,
+                 max_in_flight: int = 4, send_timeout: float = 10.0, max_connections: int = 10000):
+        self.handler = handler
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_in_flight = max_in_flight
+        self.send_timeout = send_timeout
+        self.max_connections = max_connections
+        self.connections: Set["TutorSocket"] = set()
+        self.questions = {"answered": 0, "failed": 0, "cancelled": 0, "rejected": 0}
+        self.closed = {"client": 0, "heartbeat_timeout": 0, "slow_consumer": 0, "shutdown": 0}
+        self.merged_tokens = 0
+
+    @classmethod
+    def from_env(cls, handler: TurnHandler) -> "TutorSocketHub":
+        return cls(
+            handler,
+            heartbeat_interval=float(os.getenv("WS_HEARTBEAT_INTERVAL", 20)),
+            heartbeat_timeout=float(os.getenv("WS_HEARTBEAT_TIMEOUT", 60)),
+            max_in_flight=int(os.getenv("WS_MAX_IN_FLIGHT", 4)),
+            send_timeout=float(os.getenv("WS_SEND_TIMEOUT", 10)),
+            max_connections=int(os.getenv("WS_MAX_CONNECTIONS", 10000))
+        )
+
+    async def serve(self, websocket: WebSocket, client: str, session_id: Optional[str],
+                    history: List[ChatMessage], user_level: str = "beginner", subject: Optional[str] = None):
+        """Run one connection until the client leaves, stops answering heartbeats or the server shuts down"""
+        if len(self.connections) >= self.max_connections:
+            # Before accept, this refuses the handshake
+            await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+            return
+        await websocket.accept()
+        connection = TutorSocket(self, websocket, client, session_id, history, user_level, subject)
+        self.connections.add(connection)
+        try:
+            await connection.run()
+        finally:
+            self.connections.discard(connection)
+            self.closed[connection.close_reason] += 1
+
+    async def close(self):
+        """Disconnect every client (1001), so they reconnect to a worker that is not shutting down"""
+        await asyncio.gather(*(connection.shutdown() for connection in list(self.connections)),
+                             return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "connections": len(self.connections),
+            "in_flight": sum(len(connection.tasks) for connection in self.connections),
+            "questions": dict(self.questions),
+            "closed": dict(self.closed),
+            "merged_tokens": self.merged_tokens
+        }
+
+
+class TutorSocket:
+    """One student's connection: its conversation, in-flight questions and outgoing frames"""
+
+    def __init__(self, hub: TutorSocketHub, websocket: WebSocket, client: str, session_id: Optional[str],
+                 history: List[ChatMessage], user_level: str, subject: Optional[str]):
+        self.hub = hub
+        self.websocket = websocket
+        self.client = client
+        self.session_id = session_id
+        # Replaced, never mutated, so a question in flight keeps the history it was asked with
+        self.history = list(history)
+        self.user_level = user_level
+        self.subject = subject
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.last_seen = time.monotonic()
+        self.close_reason = "client"
+        # Frames waiting to be sent: token frames stay dicts so later tokens can join them
+        self._outbox: Deque[Union[Dict, str]] = deque()
+        self._open_tokens: Dict[str, Dict] = {}
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    async def run(self):
+        self._send(dumps({"type": "ready", "session_id": self.session_id, "history": len(self.history),
+                          "heartbeat_interval": self.hub.heartbeat_interval}).decode("utf-8"))
+        reader = asyncio.ensure_future(self._read())
+        self._writer = asyncio.ensure_future(self._write())
+        try:
+            await asyncio.wait({reader, self._writer}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (reader, self._writer, *self.tasks.values()):
+                task.cancel()
+
+    async def shutdown(self):
+        self.close_reason = "shutdown"
+        await self._close(CLOSE_GOING_AWAY, "server shutting down")
+
+    async def _read(self):
+        try:
+            while True:
+                text = await self.websocket.receive_text()
+                self.last_seen = time.monotonic()
+                self._dispatch(text)
+        except WebSocketDisconnect:
+            pass
+
+    def _dispatch(self, text: str):
+        try:
+            frame = loads(text)
+        except ValueError:
+            frame = None
+        if not isinstance(frame, dict):
+            self._error(None, 400, "Frames must be JSON objects")
+            return
+        kind = frame.get("type")
+        if kind == "ask":
+            self._ask(frame)
+        elif kind == "cancel":
+            self._cancel(str(frame.get("id")))
+        elif kind == "ping":
+            self._send('{"type":"pong"}')
+        elif kind != "pong":
+            self._error(frame.get("id"), 400, f"Unknown frame type: {kind!r}")
+
+    def _ask(self, frame: Dict):
+        question_id = frame.get("id")
+        if not isinstance(question_id, (str, int)) or isinstance(question_id, bool):
+            self._error(None, 400, "Questions need an id")
+            return
+        question_id = str(question_id)
+        if question_id in self.tasks:
+            self._error(question_id, 409, f"Question {question_id} is already in flight")
+            return
+        if len(self.tasks) >= self.hub.max_in_flight:
+            self.hub.questions["rejected"] += 1
+            self._error(question_id, 429, f"At most {self.hub.max_in_flight} questions can be in flight at once")
+            return
+        try:
+            request = TutorRequest(
+                message=frame.get("message", ""),
+                subject=frame.get("subject", self.subject),
+                user_level=frame.get("user_level", self.user_level),
+                conversation_history=frame.get("conversation_history") or [],
+                session_id=self.session_id
+            )
+        except ValidationError as e:
+            self._error(question_id, 422, str(e))
+            return
+        if request.conversation_history and not self.history:
+            # The session was lost (restart or eviction): carry on from the client's copy
+            self.history = list(request.conversation_history)
+        task = self.tasks[question_id] = asyncio.ensure_future(self._answer(question_id, request))
+        task.add_done_callback(lambda _: self.tasks.pop(question_id, None))
+
+    def _cancel(self, question_id: str):
+        task = self.tasks.get(question_id)
+        # Acknowledged here: a task cancelled before it starts never runs its own handlers
+        if task is not None and task.cancel():
+            self.hub.questions["cancelled"] += 1
+            self._send(dumps({"type": "cancelled", "id": question_id}).decode("utf-8"), question_id)
+
+    async def _answer(self, question_id: str, request: TutorRequest):
+        try:
+            async for kind, payload in self.hub.handler(request, self.history, self.client):
+                if kind == "token":
+                    self._send_token(question_id, payload)
+                    continue
+                if kind == "done":
+                    self.history = self.history + [ChatMessage(role="user", content=request.message),
+                                                   ChatMessage(role="assistant", content=payload.response)]
+                self._send(f'{{"type":"done","id":{dumps(question_id).decode("utf-8")},'
+                           f'"response":{payload.model_dump_json()}}}', question_id)
+            self.hub.questions["answered"] += 1
+        except HTTPException as e:
+            self.hub.questions["failed"] += 1
+            retry_after = (e.headers or {}).get("Retry-After")
+            self._error(question_id, e.status_code, str(e.detail), retry_after)
+        except Exception as e:
+            self.hub.questions["failed"] += 1
+            self._error(question_id, 500, f"Internal server error: {str(e)}")
+
+    def _error(self, question_id, status: int, message: str, retry_after: Optional[str] = None):
+        frame = {"type": "error", "id": question_id, "status": status, "message": message}
+        if retry_after is not None:
+            frame["retry_after"] = int(retry_after)
+        self._send(dumps(frame).decode("utf-8"), question_id)
+
+    def _send(self, text: str, question_id: Optional[str] = None):
+        if question_id is not None:
+            # Later tokens of this question must not jump ahead of the frame
+            self._open_tokens.pop(question_id, None)
+        self._outbox.append(text)
+        self._ready.set()
+
+    def _send_token(self, question_id: str, token: str):
+        frame = self._open_tokens.get(question_id)
+        if frame is not None:
+            # The client has not taken the previous chunk yet: send both in one frame
+            frame["token"] += token
+            self.hub.merged_tokens += 1
+            return
+        frame = self._open_tokens[question_id] = {"type": "token", "id": question_id, "token": token}
+        self._outbox.append(frame)
+        self._ready.set()
+
+    async def _write(self):
+        """Send queued frames in order, with heartbeats while the connection is quiet"""
+        while True:
+            if not self._outbox:
+                self._ready.clear()
+                try:
+                    await asyncio.wait_for(self._ready.wait(), self.hub.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    if time.monotonic() - self.last_seen > self.hub.heartbeat_timeout:
+                        self.close_reason = "heartbeat_timeout"
+                        await self._close(CLOSE_NORMAL, "heartbeat timeout")
+                        return
+                    self._outbox.append('{"type":"ping"}')
+                continue
+
+            frame = self._outbox.popleft()
+            if isinstance(frame, dict):
+                if self._open_tokens.get(frame["id"]) is frame:
+                    del self._open_tokens[frame["id"]]
+                frame = dumps(frame).decode("utf-8")
+            try:
+                await asyncio.wait_for(self.websocket.send_text(frame), self.hub.send_timeout)
+            except asyncio.TimeoutError:
+                self.close_reason = "slow_consumer"
+                await self._close(CLOSE_TRY_AGAIN_LATER, "client too slow")
+                return
+            except (WebSocketDisconnect, RuntimeError):
+                # The client went away mid-send
+                return
+
+    async def _close(self, code: int, reason: str):
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code, reason=reason), self.hub.send_timeout)
+        except Exception:
+            pass
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
@@ -13,6 +13,7 @@ export interface TutorRequest {
   conversation_history?: ChatMessage[];
   subject?: string;
   user_level?: 'beginner' | 'intermediate' | 'advanced';
+  session_id?: string;
 }
 
 export interface TutorResponse {
@@ -20,6 +21,8 @@ export interface TutorResponse {
   suggestions?: string[];
   subject_detected?: string;
   confidence?: number;
+  context_tokens?: number;
+  session_id?: string;
   timestamp: Date;
 }
 
@@ -29,6 +32,23 @@ export interface Subject {
   icon: string;
 }
 
+// Frames the backend sends over /ws/tutor
+interface SocketFrame {
+  type: 'ready' | 'token' | 'done' | 'error' | 'cancelled' | 'ping' | 'pong';
+  id?: string | null;
+  token?: string;
+  response?: TutorResponse;
+  history?: number;
+  status?: number;
+  message?: string;
+}
+
+interface PendingQuestion {
+  onToken: (token: string) => void;
+  resolve: (response: TutorResponse) => void;
+  reject: (error: Error) => void;
+}
+
 export interface StudyTip {
   category: string;
   tip: string;
@@ -40,10 +60,24 @@ export interface StudyTip {
 })
 export class AiTutorService {
   private baseUrl = 'http://localhost:8000/api/tutor';
+  private socketUrl = 'ws://localhost:8000/ws/tutor';
   private conversationHistory: ChatMessage[] = [];
+  // The backend keeps the conversation for this id, so only new messages are sent
+  private sessionId = this.createSessionId();
+  // Answered exchanges, newest last: a session the backend lost starts again from the most recent
+  private answeredTurns: ChatMessage[] = [];
+  private readonly resumeMessages = 20;
   private conversationSubject = new BehaviorSubject<ChatMessage[]>([]);
   private isTypingSubject = new BehaviorSubject<boolean>(false);
   private connectionStatusSubject = new BehaviorSubject<'online' | 'offline'>('online');
+  // One WebSocket per conversation carries every question; SSE over HTTP is the fallback
+  private socket?: Promise<WebSocket>;
+  // Questions in flight on the current connection, by id
+  private pendingQuestions = new Map<string, PendingQuestion>();
+  private nextQuestionId = 0;
+  private socketUnavailable = false;
+  // The open connection found no session, so its next question carries the recent history
+  private socketNeedsHistory = false;
 
   // Observables for components to subscribe to
   conversation$ = this.conversationSubject.asObservable();
@@ -80,6 +114,7 @@ What would you like to learn about today?`,
     subject?: string, 
     userLevel: 'beginner' | 'intermediate' | 'advanced' = 'intermediate'
   ): Promise<TutorResponse> {
+    let assistantMessage: ChatMessage | undefined;
     try {
       // Add user message to conversation
       const userMessage: ChatMessage = {
@@ -94,38 +129,49 @@ What would you like to learn about today?`,
       // Show typing indicator
       this.isTypingSubject.next(true);
 
-      // Prepare request with conversation history in the correct format
-      const conversationHistory = this.conversationHistory
-        .slice(-10) // Last 10 messages for context
-        .filter(msg => msg.role === 'user' || msg.role === 'assistant')
-        .map(msg => ({
-          role: msg.role,
-          content: msg.content
-        }));
-
+      // History lives in the server-side session; the recent turns only restart one it lost
       const request: TutorRequest = {
         message,
-        conversation_history: conversationHistory,
+        conversation_history: this.answeredTurns.slice(-this.resumeMessages),
+        session_id: this.sessionId,
         subject,
         user_level: userLevel
       };
 
-      // Send to backend
-      const response = await this.http.post<TutorResponse>(`${this.baseUrl}/chat`, request).toPromise();
+      // Stream the answer into a placeholder message as tokens arrive
+      assistantMessage = {
+        role: 'assistant',
+        content: '',
+        timestamp: new Date()
+      };
+      const streamingMessage = assistantMessage;
+
+      const response = await this.streamChat(request, token => {
+        if (!streamingMessage.content) {
+          // First token: swap the typing indicator for the live message
+          this.isTypingSubject.next(false);
+          this.conversationHistory.push(streamingMessage);
+        }
+        streamingMessage.content += token;
+        this.conversationSubject.next([...this.conversationHistory]);
+      });
       
       if (response) {
         // Update connection status if successful
         this.connectionStatusSubject.next('online');
         
-        // Add assistant response to conversation
-        const assistantMessage: ChatMessage = {
-          role: 'assistant',
-          content: response.response,
-          timestamp: new Date(response.timestamp)
-        };
-        
-        this.conversationHistory.push(assistantMessage);
+        // Replace the streamed text with the final, trimmed response
+        streamingMessage.content = response.response;
+        streamingMessage.timestamp = new Date(response.timestamp);
+        if (!this.conversationHistory.includes(streamingMessage)) {
+          this.conversationHistory.push(streamingMessage);
+        }
         this.conversationSubject.next([...this.conversationHistory]);
+        this.answeredTurns.push(
+          { role: 'user', content: message },
+          { role: 'assistant', content: response.response }
+        );
+        this.answeredTurns = this.answeredTurns.slice(-this.resumeMessages);
         
         return response;
       }
@@ -137,6 +183,11 @@ What would you like to learn about today?`,
       
       // Update connection status
       this.connectionStatusSubject.next('offline');
+
+      // Drop any partially streamed answer
+      if (assistantMessage) {
+        this.conversationHistory = this.conversationHistory.filter(msg => msg !== assistantMessage);
+      }
       
       // Add error message to conversation
       const errorMessage: ChatMessage = {
@@ -155,6 +206,159 @@ What would you like to learn about today?`,
     }
   }
 
+  // Ask over the conversation's WebSocket, or over SSE when WebSockets are unavailable
+  private async streamChat(request: TutorRequest, onToken: (token: string) => void): Promise<TutorResponse> {
+    if (typeof WebSocket === 'undefined' || this.socketUnavailable) {
+      return this.streamChatOverHttp(request, onToken);
+    }
+    let socket: WebSocket;
+    try {
+      socket = await this.openSocket();
+    } catch {
+      // Blocked by a proxy or not supported by the backend: keep using HTTP
+      this.socketUnavailable = true;
+      return this.streamChatOverHttp(request, onToken);
+    }
+    const id = String(++this.nextQuestionId);
+    const history = this.socketNeedsHistory ? request.conversation_history : undefined;
+    this.socketNeedsHistory = false;
+    return new Promise<TutorResponse>((resolve, reject) => {
+      if (socket.readyState !== WebSocket.OPEN) {
+        // Closed since it opened: its close handler has already run and would never settle this
+        reject(new Error('Chat connection closed'));
+        return;
+      }
+      this.pendingQuestions.set(id, { onToken, resolve, reject });
+      socket.send(JSON.stringify({
+        type: 'ask',
+        id,
+        message: request.message,
+        subject: request.subject,
+        user_level: request.user_level,
+        conversation_history: history
+      }));
+    });
+  }
+
+  // The connection holds the session's history, so it is opened once per conversation
+  private openSocket(): Promise<WebSocket> {
+    if (!this.socket) {
+      const url = `${this.socketUrl}?session_id=${encodeURIComponent(this.sessionId)}`;
+      const pending = this.pendingQuestions = new Map<string, PendingQuestion>();
+      this.socket = new Promise<WebSocket>((resolve, reject) => {
+        const socket = new WebSocket(url);
+        let opened = false;
+        socket.onmessage = event => {
+          const frame: SocketFrame = JSON.parse(event.data);
+          if (frame.type === 'ready') {
+            opened = true;
+            this.socketNeedsHistory = !frame.history;
+            resolve(socket);
+          } else {
+            this.handleSocketFrame(socket, pending, frame);
+          }
+        };
+        socket.onclose = () => {
+          if (!opened) {
+            reject(new Error('Chat connection could not be opened'));
+          }
+          // Fail the questions still waiting on this connection; the next question reconnects
+          for (const question of pending.values()) {
+            question.reject(new Error('Chat connection closed'));
+          }
+          pending.clear();
+          if (this.pendingQuestions === pending) {
+            this.socket = undefined;
+          }
+        };
+      });
+    }
+    return this.socket;
+  }
+
+  private handleSocketFrame(socket: WebSocket, pending: Map<string, PendingQuestion>, frame: SocketFrame): void {
+    if (frame.type === 'ping') {
+      // Heartbeat: the server closes connections that stop answering
+      socket.send('{"type":"pong"}');
+      return;
+    }
+    const question = frame.id != null ? pending.get(frame.id) : undefined;
+    if (!question) {
+      return;
+    }
+    if (frame.type === 'token') {
+      question.onToken(frame.token ?? '');
+      return;
+    }
+    pending.delete(frame.id!);
+    if (frame.type === 'done' && frame.response) {
+      question.resolve(frame.response);
+    } else {
+      question.reject(new Error(frame.message ?? `Question ${frame.type}`));
+    }
+  }
+
+  // POST to the SSE endpoint and hand each token to onToken as it arrives.
+  // fetch is used because HttpClient buffers the body until it completes.
+  private async streamChatOverHttp(request: TutorRequest, onToken: (token: string) => void): Promise<TutorResponse> {
+    const response = await fetch(`${this.baseUrl}/chat/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', 'Accept': 'text/event-stream' },
+      body: JSON.stringify(request)
+    });
+
+    if (!response.ok || !response.body) {
+      throw new Error(`Chat stream failed with status ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finalResponse: TutorResponse | undefined;
+
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) {
+        break;
+      }
+      buffer += decoder.decode(value, { stream: true });
+
+      // Events are separated by a blank line
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const { event, data } = this.parseSseEvent(buffer.slice(0, boundary));
+        buffer = buffer.slice(boundary + 2);
+
+        if (event === 'token') {
+          onToken(JSON.parse(data).token);
+        } else if (event === 'done') {
+          finalResponse = JSON.parse(data);
+        } else if (event === 'error') {
+          throw new Error(JSON.parse(data).message);
+        }
+        boundary = buffer.indexOf('\n\n');
+      }
+    }
+
+    if (!finalResponse) {
+      throw new Error('Chat stream ended before the final response');
+    }
+    return finalResponse;
+  }
+
+  private parseSseEvent(rawEvent: string): { event: string; data: string } {
+    let event = 'message';
+    const dataLines: string[] = [];
+    for (const line of rawEvent.split('\n')) {
+      if (line.startsWith('event:')) {
+        event = line.slice(6).trim();
+      } else if (line.startsWith('data:')) {
+        dataLines.push(line.slice(5).trimStart());
+      }
+    }
+    return { event, data: dataLines.join('\n') };
+  }
+
   async getAvailableSubjects(): Promise<{ subjects: Record<string, Subject> }> {
     try {
       const response = await this.http.get<{ subjects: Record<string, Subject> }>(`${this.baseUrl}/subjects`).toPromise();
@@ -178,11 +382,26 @@ What would you like to learn about today?`,
   }
 
   clearConversation(): void {
+    // Drop the server-side session and start a fresh one
+    this.http.delete(`${this.baseUrl}/sessions/${this.sessionId}`).subscribe({ error: () => {} });
+    // The open connection belongs to the old conversation
+    this.socket?.then(socket => socket.close(1000), () => {});
+    this.socket = undefined;
+    this.socketUnavailable = false;
+    this.sessionId = this.createSessionId();
+    this.answeredTurns = [];
     this.conversationHistory = [];
     this.conversationSubject.next([]);
     this.addWelcomeMessage();
   }
 
+  private createSessionId(): string {
+    if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+      return crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+  }
+
   getConversationHistory(): ChatMessage[] {
     return [...this.conversationHistory];
   }